@@ -0,0 +1,420 @@
+from __future__ import annotations
+
+from typing import Callable, Mapping
+
+import numpy as np
+import pandas as pd
+
+from ..common.config import TRADING_DAYS
+from .optimizer import (
+    REBALANCE_FREQUENCIES,
+    PortfolioConstructionError,
+    _attached,
+    _best_capped_return,
+    _decision_rows,
+    _map_over_returns,
+    _requested_tickers,
+    _select_training_returns,
+    _validate_parameters,
+)
+from .qp import solve_qp
+from .rolling import RollingMoments
+
+FRONTIER_POINTS = 50
+
+
+class FrontierResult:
+    def __init__(
+        self,
+        date: str,
+        frontier: pd.DataFrame,
+        weights: pd.DataFrame,
+        min_variance: pd.Series,
+        equal_risk_contribution: pd.Series,
+        info: dict[str, object],
+    ) -> None:
+        self.date = date
+        self.frontier = frontier
+        self.weights = weights
+        self.min_variance = min_variance
+        self.equal_risk_contribution = equal_risk_contribution
+        self.info = info
+
+
+def _bounded_problem(covariance: np.ndarray, max_weight: float, equality: np.ndarray):
+    count = len(covariance)
+    inequality = np.vstack([-np.eye(count), np.eye(count)])
+    bounds = np.concatenate([np.zeros(count), np.full(count, max_weight)])
+    return covariance, np.zeros(count), equality, inequality, bounds
+
+
+def _free_segment(
+    covariance: np.ndarray,
+    means: np.ndarray,
+    max_weight: float,
+    free: np.ndarray,
+    capped: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """活動集合を固定したとき、w(λ) = w0 + λw1と境界乗数g(λ) = g0 + λg1を返す。
+
+    `min ½w'Σw - λμ'w s.t. 1'w = 1`を自由銘柄だけの小さなKKT系で解く。
+    下限の銘柄はg >= 0、上限の銘柄はg <= 0のとき最適。
+    """
+    inside = np.flatnonzero(free)
+    size = len(inside)
+    if size == 0:
+        raise np.linalg.LinAlgError("no free assets")
+    system = np.zeros((size + 1, size + 1))
+    system[:size, :size] = covariance[np.ix_(inside, inside)]
+    system[:size, size] = -1.0
+    system[size, :size] = 1.0
+    rhs = np.zeros((size + 1, 2))
+    rhs[:size, 0] = -max_weight * covariance[np.ix_(inside, np.flatnonzero(capped))].sum(axis=1)
+    rhs[size, 0] = 1.0 - max_weight * np.count_nonzero(capped)
+    rhs[:size, 1] = means[inside]
+    solution = np.linalg.solve(system, rhs)
+
+    base = np.where(capped, max_weight, 0.0)
+    base[inside] = solution[:size, 0]
+    slope = np.zeros(len(means))
+    slope[inside] = solution[:size, 1]
+    return (
+        base,
+        slope,
+        covariance @ base - solution[size, 0],
+        covariance @ slope - means - solution[size, 1],
+    )
+
+
+def _min_variance_qp(covariance: np.ndarray, max_weight: float):
+    quadratic, linear, equality, inequality, bounds = _bounded_problem(
+        covariance, max_weight, np.ones((1, len(covariance)))
+    )
+    result = solve_qp(quadratic, linear, equality, np.ones(1), inequality, bounds)
+    if not result.converged:
+        raise PortfolioConstructionError(
+            f"minimum-variance solve failed: {result.message}"
+        )
+    return result
+
+
+def _min_variance_state(
+    covariance: np.ndarray, means: np.ndarray, max_weight: float
+) -> tuple[np.ndarray, np.ndarray, int]:
+    """最小分散解を内点法で求め、その活動集合をKKT条件で検算して確定する。"""
+    count = len(means)
+    result = _min_variance_qp(covariance, max_weight)
+    weights = result.x
+    tolerance = 1e-9
+    capped = weights >= max_weight - tolerance
+    free = (weights > tolerance) & ~capped
+    for _ in range(2 * count):
+        base, _, gradient, _ = _free_segment(covariance, means, max_weight, free, capped)
+        below = free & (base < -tolerance)
+        above = free & (base > max_weight + tolerance)
+        released = (~free & ~capped & (gradient < -tolerance)) | (
+            capped & (gradient > tolerance)
+        )
+        if not (below.any() or above.any() or released.any()):
+            return free, capped, result.iterations
+        # 内点解の境界判定がずれていたら、違反の最も大きい1銘柄だけ直す。
+        violation = np.where(below, -base, 0.0) + np.where(above, base - max_weight, 0.0)
+        violation += np.where(released, np.abs(gradient), 0.0)
+        worst = int(np.argmax(violation))
+        if released[worst]:
+            free[worst], capped[worst] = True, False
+        else:
+            free[worst] = False
+            capped[worst] = bool(above[worst])
+    raise PortfolioConstructionError("minimum-variance active set did not settle")
+
+
+def _critical_line(
+    covariance: np.ndarray, means: np.ndarray, max_weight: float
+) -> tuple[np.ndarray, np.ndarray, dict[str, object]]:
+    """上限付きロングオンリーの有効フロンティアを角点の列としてたどる。
+
+    λ = 0（最小分散）から、区間ごとに前の角点の活動集合を引き継いで
+    λを増やし、自由な重みが境界に達するか境界の乗数の符号が変わる点で
+    1銘柄だけ出入りさせる。角点の間では重みも期待リターンもλの一次式になる。
+    """
+    count = len(means)
+    free, capped, iterations = _min_variance_state(covariance, means, max_weight)
+    scale = max(1.0, float(np.abs(means).max()))
+    tolerance = 1e-12
+    level = 0.0
+    levels = [0.0]
+    corners = []
+    changed = -1
+    for _ in range(4 * count + 2):
+        base, slope, gradient, gradient_slope = _free_segment(
+            covariance, means, max_weight, free, capped
+        )
+        weights = np.clip(base + level * slope, 0.0, max_weight)
+        if not corners:
+            corners.append(weights)
+        bounded = ~free & ~capped
+        with np.errstate(divide="ignore", invalid="ignore"):
+            events = np.full(count, np.inf)
+            falling = free & (slope < -tolerance * scale)
+            events[falling] = -base[falling] / slope[falling]
+            rising = free & (slope > tolerance * scale)
+            events[rising] = (max_weight - base[rising]) / slope[rising]
+            leaving = (bounded & (gradient_slope < -tolerance * scale)) | (
+                capped & (gradient_slope > tolerance * scale)
+            )
+            events[leaving] = -gradient[leaving] / gradient_slope[leaving]
+        if 0 <= changed < count:
+            # 直前に出入りした銘柄が同じλで逆戻りして循環するのを防ぐ。
+            events[changed] = np.where(events[changed] <= level, np.inf, events[changed])
+        events[events < level - 1e-9 * max(1.0, level)] = np.inf
+        asset = int(np.argmin(events))
+        if not np.isfinite(events[asset]):
+            if np.abs(slope).max() > 1e-9:
+                raise np.linalg.LinAlgError("frontier segment is unbounded")
+            break
+        level = max(level, float(events[asset]))
+        levels.append(level)
+        corners.append(np.clip(base + level * slope, 0.0, max_weight))
+        if free[asset]:
+            free[asset] = False
+            capped[asset] = bool(rising[asset])
+        else:
+            free[asset], capped[asset] = True, False
+        changed = asset
+        if not free.any():
+            break
+    else:
+        raise np.linalg.LinAlgError("frontier did not reach the maximum-return end")
+    return (
+        np.asarray(levels),
+        np.vstack(corners),
+        {"method": "critical_line", "corners": len(corners), "qp_iterations": iterations},
+    )
+
+
+def _qp_points(
+    covariance: np.ndarray,
+    means: np.ndarray,
+    max_weight: float,
+    targets: np.ndarray,
+) -> tuple[np.ndarray, dict[str, object]]:
+    """目標リターンごとの最小分散問題を、隣の点の解から暖機して順に解く。"""
+    count = len(means)
+    # 期待リターンの行は大きさをそろえてから制約に入れる。
+    scale = max(1.0, float(np.abs(means).max()))
+    quadratic, linear, equality, inequality, bounds = _bounded_problem(
+        covariance, max_weight, np.vstack([np.ones(count), means / scale])
+    )
+    weights = np.zeros((len(targets), count))
+    initial = None
+    iterations = 0
+    for position, target in enumerate(targets):
+        result = solve_qp(
+            quadratic,
+            linear,
+            equality,
+            np.array([1.0, target / scale]),
+            inequality,
+            bounds,
+            initial=initial,
+        )
+        if not result.converged:
+            raise PortfolioConstructionError(
+                f"frontier solve failed at return {target:.6g}: {result.message}"
+            )
+        weights[position] = np.clip(result.x, 0.0, max_weight)
+        initial = np.clip(result.x, 1e-6, max_weight - 1e-6)
+        iterations += result.iterations
+    return weights, {"method": "qp", "qp_iterations": iterations}
+
+
+def equal_risk_contribution(
+    covariance: np.ndarray,
+    initial: np.ndarray | None = None,
+    tolerance: float = 1e-12,
+    max_iterations: int = 100,
+) -> tuple[np.ndarray, int]:
+    """ロングオンリーのリスク寄与均等ウェイトと反復回数を返す。
+
+    `min ½y'Σy - Σ log(y_i)/n (y > 0)`を減衰ニュートン法で解き、和が1になるよう
+    正規化する。`initial`（前回の決定日の解など）があればそこから始める。
+    上限制約は課さない。
+    """
+    count = len(covariance)
+    volatility = np.sqrt(np.diag(covariance))
+    start = 1.0 / volatility if initial is None else np.maximum(initial, 1e-12)
+    # 最適点ではy'Σy = 1になるので、初期値をその尺度へ合わせる。
+    y = start / np.sqrt(start @ covariance @ start)
+    budget = np.full(count, 1.0 / count)
+    for iteration in range(1, max_iterations + 1):
+        gradient = covariance @ y - budget / y
+        hessian = covariance + np.diag(budget / y**2)
+        step = np.linalg.solve(hessian, gradient)
+        decrement = float(np.sqrt(max(gradient @ step, 0.0)))
+        y = y - step / (1.0 + decrement) if decrement > 0.25 else y - step
+        if decrement**2 / 2 <= tolerance:
+            break
+    else:
+        raise PortfolioConstructionError("equal-risk-contribution solve did not converge")
+    return y / y.sum(), iteration
+
+
+def trace_frontier(
+    means: np.ndarray,
+    covariance: np.ndarray,
+    tickers: list[str],
+    max_weight: float,
+    points: int = FRONTIER_POINTS,
+    initial: np.ndarray | None = None,
+) -> FrontierResult:
+    """日次の平均と共分散から、上限付き有効フロンティアを`points`点で返す。
+
+    目標リターンは最小分散点から上限付き最大リターン点まで等間隔に取る。
+    角点をたどる方法で解けない退化した場合は、目標ごとの二次計画を
+    隣の点から暖機して解く。リスク寄与均等は`initial`から始める。
+    """
+    count = len(tickers)
+    if points < 2:
+        raise ValueError("points must be at least 2")
+    if count * max_weight < 1 - 1e-10:
+        raise PortfolioConstructionError(
+            "max_weight constraint is infeasible for the eligible asset count"
+        )
+    if not np.isfinite(means).all() or not np.isfinite(covariance).all():
+        raise PortfolioConstructionError("training statistics contain non-finite values")
+    annual_means = means * TRADING_DAYS
+    annual_covariance = covariance * TRADING_DAYS
+
+    try:
+        _, corners, info = _critical_line(annual_covariance, annual_means, max_weight)
+        corner_returns = np.maximum.accumulate(corners @ annual_means)
+        targets = np.linspace(corner_returns[0], corner_returns[-1], points)
+        # 角点の間は重みが目標リターンの一次式なので、線形補間が厳密解になる。
+        right = np.clip(np.searchsorted(corner_returns, targets, side="left"), 1, len(corners) - 1)
+        left = right - 1
+        span = corner_returns[right] - corner_returns[left]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = np.where(span > 0, (targets - corner_returns[left]) / span, 0.0)
+        share = np.clip(share, 0.0, 1.0)[:, None]
+        weights = (1 - share) * corners[left] + share * corners[right]
+        minimum = corners[0]
+    except np.linalg.LinAlgError:
+        minimum = np.clip(_min_variance_qp(annual_covariance, max_weight).x, 0.0, max_weight)
+        targets = np.linspace(
+            float(minimum @ annual_means),
+            _best_capped_return(annual_means, max_weight),
+            points,
+        )
+        weights, info = _qp_points(annual_covariance, annual_means, max_weight, targets)
+
+    risk, erc_iterations = equal_risk_contribution(covariance, initial)
+    volatility = np.sqrt(np.maximum(np.einsum("kn,nm,km->k", weights, annual_covariance, weights), 0.0))
+    portfolio_returns = weights @ annual_means
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(volatility > 0, portfolio_returns / volatility, np.nan)
+    return FrontierResult(
+        "",
+        pd.DataFrame(
+            {
+                "annual_return": portfolio_returns,
+                "volatility": volatility,
+                "sharpe_ratio": sharpe,
+            }
+        ),
+        pd.DataFrame(weights, columns=tickers),
+        pd.Series(minimum, index=tickers, dtype=float),
+        pd.Series(risk, index=tickers, dtype=float),
+        {
+            **info,
+            "points": points,
+            "erc_iterations": erc_iterations,
+            "erc_within_max_weight": bool(risk.max() <= max_weight + 1e-12),
+        },
+    )
+
+
+def _frontier_year(
+    returns: pd.DataFrame,
+    membership: pd.DataFrame | None,
+    settings: tuple[float, int, int, int, str],
+    task: tuple[int, dict[str, str]],
+) -> list[FrontierResult]:
+    """1年分の各決定日について、訓練窓の平均と共分散からフロンティアを作る。"""
+    returns = _attached(returns)
+    membership = _attached(membership)
+    max_weight, lookback_days, min_training_observations, points, frequency = settings
+    year, universe = task
+    timezone = returns.index.tz
+    start = pd.Timestamp(year=year, month=1, day=1, tz=timezone)
+    end = pd.Timestamp(year=year, month=12, day=31, tz=timezone)
+    if frequency == "annual":
+        decisions = [(int(returns.index.searchsorted(start, side="left")), start, year)]
+    else:
+        decisions = [
+            (row, returns.index[row], returns.index[row].date())
+            for row in _decision_rows(returns.index, start, end, frequency)
+        ]
+    if not decisions:
+        raise PortfolioConstructionError(f"{year}: no decision dates")
+
+    positions = {ticker: column for column, ticker in enumerate(returns.columns)}
+    engine = RollingMoments(returns.to_numpy(dtype=float))
+    frontiers = []
+    previous: pd.Series | None = None
+    for row, when, label in decisions:
+        requested_tickers = _requested_tickers(returns, membership, universe, when, label)
+        window_start = max(0, row - lookback_days)
+        selected, _ = _select_training_returns(
+            returns.iloc[window_start:row][requested_tickers],
+            min_training_observations,
+            max_weight,
+        )
+        tickers = list(selected.columns)
+        engine.advance([positions[ticker] for ticker in tickers], window_start, row)
+        means, covariance = engine.moments()
+        initial = (
+            None
+            if previous is None
+            else previous.reindex(tickers).fillna(1.0 / len(tickers)).to_numpy()
+        )
+        result = trace_frontier(means, covariance, tickers, max_weight, points, initial)
+        result.date = pd.Timestamp(when).date().isoformat()
+        result.info["training_observations"] = int(len(selected))
+        previous = result.equal_risk_contribution
+        frontiers.append(result)
+    return frontiers
+
+
+def build_frontiers(
+    returns: pd.DataFrame,
+    years,
+    max_weight: float,
+    lookback_days: int,
+    min_training_observations: int,
+    universe_resolver: Callable[[int], Mapping[str, str]],
+    membership: pd.DataFrame | None = None,
+    points: int = FRONTIER_POINTS,
+    rebalance: str = "annual",
+    executor: str = "serial",
+    jobs: int | None = None,
+) -> dict[int, list[FrontierResult]]:
+    """年ごと・決定日ごとに有効フロンティア、最小分散、リスク寄与均等を求める。
+
+    決定日と訓練窓の選び方は`build_yearly_portfolios_from_returns`と同じ。
+    年の中では平均と共分散を差分更新し、リスク寄与均等は前の決定日の解から
+    始める。年ごとの計算は`executor`と`jobs`で並列化する。
+    """
+    _validate_parameters(max_weight, lookback_days, min_training_observations)
+    if rebalance not in REBALANCE_FREQUENCIES:
+        raise ValueError(f"unknown rebalance frequency: {rebalance!r}")
+    if returns.empty:
+        raise PortfolioConstructionError("no close-price series were supplied")
+    if membership is not None and not membership.index.equals(returns.index):
+        membership = membership.reindex(index=returns.index, fill_value=False)
+    tasks = [(year, dict(universe_resolver(year))) for year in years]
+    settings = (max_weight, lookback_days, min_training_observations, points, rebalance)
+    built = _map_over_returns(
+        _frontier_year, returns, membership, (settings,), tasks, jobs, executor
+    )
+    return {year: frontiers for (year, _), frontiers in zip(tasks, built)}
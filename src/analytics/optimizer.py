@@ -1,13 +1,21 @@
 from __future__ import annotations
 
 import math
+from contextlib import ExitStack
+from functools import partial
 from typing import Callable, Mapping
 
 import numpy as np
 import pandas as pd
 from scipy.optimize import minimize
 
-from ..common.config import TRADING_DAYS
+from ..common.config import REBALANCE_FREQUENCY, SOLVER, TRADING_DAYS
+from ..common.parallel import SharedFrame, parallel_map, resolve_jobs
+from ..common.profiling import profiled
+from ..data_io.price_matrix import align_closes
+from ..data_io.result_cache import ResultCache, content_key
+from .qp import solve_qp
+from .rolling import RollingMoments
 
 
 class PortfolioConstructionError(RuntimeError):
@@ -35,6 +43,20 @@ def _validate_parameters(max_weight: float, lookback_days: int, minimum: int) ->
         )
 
 
+def history_bounds(years, lookback_days: int, timezone) -> tuple[pd.Timestamp, pd.Timestamp]:
+    """年次評価に必要な価格期間を暦日で返す。
+
+    開始は最初の意思決定日から取引観測の2倍の暦日だけ遡り、休場が続いても
+    `lookback_days`個の訓練リターンと、その直前の終値を必ず含める。
+    """
+
+    years = list(years)
+    first = pd.Timestamp(year=min(years), month=1, day=1, tz=timezone)
+    last = pd.Timestamp(year=max(years), month=12, day=31, tz=timezone)
+    return first - pd.Timedelta(days=2 * lookback_days), last
+
+
+@profiled("optimizer.select_training_returns")
 def _select_training_returns(
     returns: pd.DataFrame,
     min_observations: int,
@@ -49,15 +71,18 @@ def _select_training_returns(
     if returns.empty:
         raise PortfolioConstructionError("training return window is empty")
 
+    missing_mask = returns.isna().to_numpy()
+    missing = missing_mask.sum(axis=0)
+    counts = len(returns) - missing
+    tickers = list(returns.columns)
     excluded: dict[str, str] = {}
-    counts = returns.notna().sum()
-    candidates = [
-        ticker for ticker in returns.columns if counts[ticker] >= min_observations
-    ]
-    for ticker in returns.columns:
-        if ticker not in candidates:
+    candidates = []
+    for position, ticker in enumerate(tickers):
+        if counts[position] >= min_observations:
+            candidates.append(position)
+        else:
             excluded[ticker] = (
-                f"insufficient_training_observations:{int(counts[ticker])}"
+                f"insufficient_training_observations:{int(counts[position])}"
             )
 
     minimum_assets = math.ceil(1 / max_weight - 1e-12)
@@ -67,70 +92,262 @@ def _select_training_returns(
             f"eligible={len(candidates)}, required={minimum_assets}"
         )
 
-    while len(candidates) >= minimum_assets:
-        selected = returns.loc[:, candidates].dropna(how="any")
-        if len(selected) >= min_observations:
-            return selected, excluded
-
-        missing = returns.loc[:, candidates].isna().sum()
-        worst_missing = int(missing.max())
-        worst = sorted(
-            ticker for ticker in candidates if int(missing[ticker]) == worst_missing
-        )[0]
-        excluded[worst] = (
+    # 列の欠損数は窓全体で数えるため他の候補に依存せず、除外順（欠損最多、
+    # 同数なら銘柄コード順）は最初に決まる。列を外すたびに行ごとの欠損数を
+    # 減らし、共通取引日の数だけを更新する。
+    removal_order = sorted(
+        candidates, key=lambda position: (-missing[position], tickers[position])
+    )
+    row_missing = missing_mask[:, candidates].sum(axis=1)
+    for worst in removal_order:
+        if len(candidates) < minimum_assets:
+            break
+        complete_rows = row_missing == 0
+        if int(complete_rows.sum()) >= min_observations:
+            return returns.iloc[np.flatnonzero(complete_rows), candidates], excluded
+
+        excluded[tickers[worst]] = (
             "removed_to_restore_common_training_window:"
-            f"missing={worst_missing}"
+            f"missing={int(missing[worst])}"
         )
         candidates.remove(worst)
+        row_missing -= missing_mask[:, worst]
 
     raise PortfolioConstructionError(
         "unable to form a complete training matrix without violating max_weight"
     )
 
 
-def _weight_sharpe(returns: pd.DataFrame, max_weight: float) -> pd.Series:
-    if returns.empty or returns.isna().any().any():
-        raise PortfolioConstructionError(
-            "optimizer requires a non-empty complete return matrix"
-        )
-
-    tickers = list(returns.columns)
-    count = len(tickers)
-    if count * max_weight < 1 - 1e-10:
-        raise PortfolioConstructionError(
-            "max_weight constraint is infeasible for the eligible asset count"
-        )
-
-    means = returns.mean().to_numpy(dtype=float)
-    covariance = returns.cov().to_numpy(dtype=float)
-    if not np.isfinite(means).all() or not np.isfinite(covariance).all():
-        raise PortfolioConstructionError("training statistics contain non-finite values")
-
-    def objective(weights: np.ndarray) -> float:
-        portfolio_return = float(np.dot(weights, means) * TRADING_DAYS)
-        variance = float(np.dot(weights, covariance).dot(weights) * TRADING_DAYS)
+def _sharpe_ratio_slsqp(
+    annual_means: np.ndarray, annual_covariance: np.ndarray, max_weight: float
+):
+    """シャープ比の比のままSLSQPで最大化する。期待リターンが正にならず凸化できないときに使う。"""
+    count = len(annual_means)
+    # ftolは目的関数の絶対値で効くため、単一銘柄のシャープ比の最大で割って桁をそろえる。
+    volatilities = np.sqrt(np.maximum(np.diag(annual_covariance), 1e-18))
+    scale = float(np.max(np.abs(annual_means) / volatilities)) or 1.0
+
+    def objective(weights: np.ndarray) -> tuple[float, np.ndarray]:
+        portfolio_return = float(np.dot(weights, annual_means))
+        projected = annual_covariance @ weights
+        variance = float(np.dot(weights, projected))
         if variance <= 1e-18:
-            return 1e12
-        return -portfolio_return / math.sqrt(variance)
+            return 1e12, np.zeros(count)
+        volatility = math.sqrt(variance)
+        gradient = -annual_means / volatility + portfolio_return * projected / (
+            volatility**3
+        )
+        return -portfolio_return / volatility / scale, gradient / scale
 
     bounds = [(0.0, max_weight)] * count
-    constraints = ({"type": "eq", "fun": lambda weights: np.sum(weights) - 1},)
+    constraints = (
+        {
+            "type": "eq",
+            "fun": lambda weights: np.sum(weights) - 1,
+            "jac": lambda weights: np.ones(count),
+        },
+    )
     initial = np.full(count, 1 / count, dtype=float)
-    result = minimize(
+    return minimize(
         objective,
         initial,
+        jac=True,
         method="SLSQP",
         bounds=bounds,
         constraints=constraints,
         options={"maxiter": 2_000, "ftol": 1e-12},
     )
 
-    if not result.success:
+
+def _sharpe_convex_slsqp(
+    annual_means: np.ndarray, annual_covariance: np.ndarray, max_weight: float
+):
+    """QPと同じ凸二次計画をSLSQPで解く。
+
+    比のままでは、平均や分散が桁外れの銘柄があると直線探索が丸め誤差で止まる
+    （status 8）か、最適でない点で収束扱いになる。最適な重みは平均と共分散の
+    正の定数倍で変わらないので、それぞれの中央値で割ってから解く。最大や平均で
+    割ると、桁外れの銘柄に合わせて残りの係数が小さくなりすぎる。
+    """
+    count = len(annual_means)
+    mean_scale = float(np.median(np.abs(annual_means))) or 1.0
+    variance_scale = float(np.median(np.diag(annual_covariance))) or 1.0
+    quadratic, _, equality, equality_rhs, inequality, _ = _sharpe_problem(
+        annual_means / mean_scale, annual_covariance / variance_scale, max_weight
+    )
+    scaled_means = equality[0, :count]
+    # 相関を無視した接点ポートフォリオ（y ∝ μ/σ²）から始め、そこでの値が1になるように
+    # 目的関数を割る。ftolは目的関数の絶対値で効き、等ウェイトから始めると分散の
+    # 桁外れな銘柄のせいで最適点の値が極端に小さくなって早く止まる。
+    start = np.maximum(scaled_means, 0.0) / np.maximum(np.diag(quadratic)[:count], 1e-18)
+    start /= float(start @ scaled_means)
+    initial = np.append(start, start.sum())
+    quadratic = quadratic / (float(initial @ quadratic @ initial) / 2 or 1.0)
+    # y >= 0とκ >= 0は境界で、y <= κ·max_weightだけを不等式制約で渡す。
+    upper = -inequality[count:]
+    return minimize(
+        lambda x: (float(x @ quadratic @ x) / 2, quadratic @ x),
+        initial,
+        jac=True,
+        method="SLSQP",
+        bounds=[(0.0, None)] * (count + 1),
+        constraints=(
+            {
+                "type": "eq",
+                "fun": lambda x: equality @ x - equality_rhs,
+                "jac": lambda x: equality,
+            },
+            {"type": "ineq", "fun": lambda x: upper @ x, "jac": lambda x: upper},
+        ),
+        # 1e-12では最適点に着いた後も丸め誤差の中で直線探索を続け、status 8で止まることがある。
+        options={"maxiter": 2_000, "ftol": 1e-11},
+    )
+
+
+def _sharpe_slsqp(
+    means: np.ndarray, covariance: np.ndarray, max_weight: float
+) -> tuple[np.ndarray, dict[str, object]]:
+    count = len(means)
+    annual_means = means * TRADING_DAYS
+    annual_covariance = covariance * TRADING_DAYS
+    convex = _best_capped_return(annual_means, max_weight) > 0
+    if convex:
+        result = _sharpe_convex_slsqp(annual_means, annual_covariance, max_weight)
+    else:
+        result = _sharpe_ratio_slsqp(annual_means, annual_covariance, max_weight)
+
+    if not result.success or (convex and result.x[count] <= 0):
         raise PortfolioConstructionError(
             f"optimizer failed: status={result.status}, message={result.message}"
         )
-
     weights = np.asarray(result.x, dtype=float)
+    if convex:
+        weights = _snap_weights(weights[:count] / weights[count], max_weight)
+    return weights, {
+        "solver": "slsqp",
+        "iterations": int(result.nit),
+        "function_evaluations": int(result.nfev),
+        "converged": True,
+    }
+
+
+def _best_capped_return(means: np.ndarray, max_weight: float) -> float:
+    remaining = 1.0
+    total = 0.0
+    for value in np.sort(means)[::-1]:
+        take = min(max_weight, remaining)
+        total += take * value
+        remaining -= take
+        if remaining <= 1e-15:
+            break
+    return total
+
+
+def _snap_weights(weights: np.ndarray, max_weight: float) -> np.ndarray:
+    # 内点法の解は境界へ漸近するだけなので、境界近傍の値を境界へ寄せる。
+    weights = np.clip(weights, 0.0, max_weight)
+    weights[weights < 1e-9] = 0.0
+    capped = weights > max_weight - 1e-9
+    weights[capped] = max_weight
+    free = (weights > 0) & ~capped
+    if free.any():
+        weights[free] += (1.0 - weights.sum()) * weights[free] / weights[free].sum()
+    return weights
+
+
+def _sharpe_problem(
+    annual_means: np.ndarray, annual_covariance: np.ndarray, max_weight: float
+):
+    """最大シャープ比を凸二次計画へ変換した係数を返す。
+
+    y = κw（κ > 0）と置くと、μ'y = 1, 1'y = κ, 0 <= y <= κ·max_weightの下で
+    y'Σyを最小化する問題になる。変数は(y, κ)。
+    """
+    count = len(annual_means)
+    quadratic = np.zeros((count + 1, count + 1))
+    quadratic[:count, :count] = 2 * annual_covariance
+    equality = np.zeros((2, count + 1))
+    equality[0, :count] = annual_means
+    equality[1, :count] = 1.0
+    equality[1, count] = -1.0
+    inequality = np.zeros((2 * count, count + 1))
+    inequality[:count, :count] = -np.eye(count)
+    inequality[count:, :count] = np.eye(count)
+    inequality[count:, count] = -max_weight
+    return (
+        quadratic,
+        np.zeros(count + 1),
+        equality,
+        np.array([1.0, 0.0]),
+        inequality,
+        np.zeros(2 * count),
+    )
+
+
+def _sharpe_qp(
+    means: np.ndarray, covariance: np.ndarray, max_weight: float
+) -> tuple[np.ndarray, dict[str, object]]:
+    annual_means = means * TRADING_DAYS
+    if _best_capped_return(annual_means, max_weight) <= 0:
+        # 期待リターンが正の実行可能ポートフォリオがなければ凸化できない。
+        weights, info = _sharpe_slsqp(means, covariance, max_weight)
+        return weights, {**info, "solver": "qp", "fallback": "slsqp"}
+
+    count = len(means)
+    # 最適な重みは平均と共分散の正の定数倍で変わらない。桁をそろえて内点法の精度を保つ。
+    annual_covariance = covariance * TRADING_DAYS
+    variance_scale = float(np.mean(np.diag(annual_covariance))) or 1.0
+    result = solve_qp(
+        *_sharpe_problem(
+            annual_means / np.abs(annual_means).max(),
+            annual_covariance / variance_scale,
+            max_weight,
+        )
+    )
+    kappa = float(result.x[count]) if result.converged else 0.0
+    if not result.converged or kappa <= 0:
+        raise PortfolioConstructionError(
+            f"optimizer failed: solver=qp, message={result.message}"
+        )
+    weights = _snap_weights(result.x[:count] / kappa, max_weight)
+    return weights, {
+        "solver": "qp",
+        "iterations": result.iterations,
+        "function_evaluations": 0,
+        "converged": True,
+    }
+
+
+_SOLVER_BACKENDS = {"slsqp": _sharpe_slsqp, "qp": _sharpe_qp}
+SOLVERS = tuple(_SOLVER_BACKENDS)
+# 同じ入力から異なる重みを返すように解法を変えたら上げる（結果キャッシュのキー）。
+SOLVER_VERSION = 2
+
+
+@profiled("optimizer.weight_sharpe")
+def _weight_sharpe_from_moments(
+    means: np.ndarray,
+    covariance: np.ndarray,
+    tickers: list[str],
+    max_weight: float,
+    solver: str = SOLVER,
+) -> pd.Series:
+    """平均と共分散から上限付き最大シャープ比ウェイトを求め、制約を検査する。
+
+    解法の診断情報（反復回数など）は戻り値の`attrs["solver"]`に入る。
+    """
+    if solver not in _SOLVER_BACKENDS:
+        raise ValueError(f"unknown solver: {solver!r}")
+    count = len(tickers)
+    if count * max_weight < 1 - 1e-10:
+        raise PortfolioConstructionError(
+            "max_weight constraint is infeasible for the eligible asset count"
+        )
+    if not np.isfinite(means).all() or not np.isfinite(covariance).all():
+        raise PortfolioConstructionError("training statistics contain non-finite values")
+
+    weights, info = _SOLVER_BACKENDS[solver](means, covariance, max_weight)
+    weights = np.asarray(weights, dtype=float)
     weights[np.abs(weights) < 1e-12] = 0.0
     if not np.isfinite(weights).all():
         raise PortfolioConstructionError("optimizer returned non-finite weights")
@@ -143,40 +360,146 @@ def _weight_sharpe(returns: pd.DataFrame, max_weight: float) -> pd.Series:
             "optimizer result violates long-only or max_weight constraints"
         )
 
-    return pd.Series(weights, index=tickers, dtype=float)
+    series = pd.Series(weights, index=tickers, dtype=float)
+    series.attrs["solver"] = info
+    return series
 
 
-def _metrics(returns: pd.DataFrame, weights: pd.Series) -> dict[str, float | str | int]:
-    active = weights[weights > 1e-10]
-    if active.empty:
-        raise PortfolioConstructionError("portfolio has no active positions")
+def _weight_sharpe(
+    returns: pd.DataFrame, max_weight: float, solver: str = SOLVER
+) -> pd.Series:
+    if returns.empty or returns.isna().any().any():
+        raise PortfolioConstructionError(
+            "optimizer requires a non-empty complete return matrix"
+        )
+    return _weight_sharpe_from_moments(
+        returns.mean().to_numpy(dtype=float),
+        returns.cov().to_numpy(dtype=float),
+        list(returns.columns),
+        max_weight,
+        solver,
+    )
+
+
+def _cached_weights(
+    cache: ResultCache | None, key_parts: tuple, compute: Callable[[], pd.Series]
+) -> pd.Series:
+    """`key_parts`の内容アドレスで重みを引き、なければ`compute()`して保存する。"""
+    if cache is None:
+        return compute()
+    key = content_key(SOLVER_VERSION, *key_parts)
+    payload = cache.get(key)
+    if payload is not None:
+        weights = pd.Series(payload["weights"], index=payload["tickers"], dtype=float)
+        weights.attrs["solver"] = payload["solver"]
+        return weights
+    weights = compute()
+    cache.put(
+        key,
+        {
+            "tickers": list(weights.index),
+            "weights": weights.tolist(),
+            "solver": dict(weights.attrs.get("solver", {})),
+        },
+    )
+    return weights
 
-    available = returns.loc[:, active.index].dropna(how="any")
-    if available.empty:
-        raise PortfolioConstructionError("evaluation window has no complete observations")
 
-    daily = available.mul(active, axis=1).sum(axis=1)
-    annual_return = _annualize_return(float(daily.mean()))
-    volatility = _annualize_volatility(float(daily.std(ddof=0)))
-    sharpe_ratio = 0.0 if volatility == 0 else annual_return / volatility
-    curve = (1 + daily).cumprod()
-    drawdown = (curve / curve.cummax()) - 1
-    max_drawdown = float(drawdown.min())
+METRIC_FIELDS = (
+    "annual_return",
+    "volatility",
+    "sharpe_ratio",
+    "max_drawdown",
+    "evaluation_observations",
+)
 
-    values = [annual_return, volatility, sharpe_ratio, max_drawdown]
+
+def _score_paths(daily: np.ndarray, valid: np.ndarray) -> dict[str, np.ndarray]:
+    """T×Kの日次リターンを、`valid`が真の行だけで列ごとに評価する。
+
+    有効な行が1つもない列の指標はNaNになる。
+    """
+    count = valid.sum(axis=0)
+    daily = np.where(valid, daily, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = daily.sum(axis=0) / count
+        variance = (np.where(valid, daily - mean, 0.0) ** 2).sum(axis=0) / count
+        # 無効な行は成長率1として複利をつなぎ、高値更新の判定からは外す。
+        curve = np.cumprod(1 + daily, axis=0)
+        peak = np.maximum.accumulate(np.where(valid, curve, -np.inf), axis=0)
+        drawdown = np.where(valid, curve / peak - 1, np.inf).min(axis=0)
+    annual_return = mean * TRADING_DAYS
+    volatility = np.sqrt(variance) * np.sqrt(TRADING_DAYS)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sharpe_ratio = np.where(volatility == 0, 0.0, annual_return / volatility)
+    empty = count == 0
+    return {
+        "annual_return": annual_return,
+        "volatility": volatility,
+        "sharpe_ratio": np.where(empty, np.nan, sharpe_ratio),
+        "max_drawdown": np.where(empty, np.nan, drawdown),
+        "evaluation_observations": count,
+    }
+
+
+@profiled("optimizer.portfolio_metrics")
+def portfolio_metrics(returns: pd.DataFrame, weights: pd.DataFrame) -> pd.DataFrame:
+    """K×Nの重み行列（行がポートフォリオ、列が銘柄）を一括で評価する。
+
+    各ポートフォリオは保有銘柄（重み>1e-10）がすべて観測された日だけで評価する。
+    この有効日の判定も欠損マスクと保有マスクの行列積で求め、ポートフォリオ
+    ごとのループを持たない。保有銘柄がない行と有効日がない行の指標はNaN。
+    """
+    unknown = weights.columns.difference(returns.columns)
+    if len(unknown) and (weights.loc[:, unknown].to_numpy() > 1e-10).any():
+        raise ValueError(
+            f"weights reference tickers without returns: {', '.join(map(str, unknown))}"
+        )
+    matrix = weights.reindex(columns=returns.columns, fill_value=0.0).to_numpy(
+        dtype=float
+    )
+    active = matrix > 1e-10
+    # 行列積の加算順はメモリ配置で変わるため、共有メモリ経由でも同じ値になるよう
+    # C順へそろえる。
+    values = np.ascontiguousarray(returns.to_numpy(dtype=float))
+    missing = np.isnan(values)
+
+    daily = np.where(missing, 0.0, values) @ np.where(active, matrix, 0.0).T
+    valid = (missing.astype(float) @ active.T.astype(float)) == 0
+    valid &= active.any(axis=1)
+    scores = _score_paths(daily, valid)
+    return pd.DataFrame(scores, index=weights.index, columns=list(METRIC_FIELDS))
+
+
+def _metric_entry(scores: Mapping[str, float]) -> dict[str, float | str | int]:
+    if int(scores["evaluation_observations"]) == 0:
+        raise PortfolioConstructionError("evaluation window has no complete observations")
+    values = [float(scores[field]) for field in METRIC_FIELDS[:-1]]
     if not all(math.isfinite(value) for value in values):
         raise PortfolioConstructionError("evaluation metrics contain non-finite values")
-
+    annual_return, volatility, sharpe_ratio, max_drawdown = values
     return {
         "annual_return": annual_return,
         "annual_return_method": "arithmetic_daily_mean_x_252",
         "volatility": volatility,
         "sharpe_ratio": sharpe_ratio,
         "max_drawdown": max_drawdown,
-        "evaluation_observations": int(len(available)),
+        "evaluation_observations": int(scores["evaluation_observations"]),
     }
 
 
+def _metrics(returns: pd.DataFrame, weights: pd.Series) -> dict[str, float | str | int]:
+    if not (weights > 1e-10).any():
+        raise PortfolioConstructionError("portfolio has no active positions")
+    return _metric_entry(portfolio_metrics(returns, weights.to_frame().T).iloc[0])
+
+
+def _path_metrics(daily: pd.Series) -> dict[str, float | str | int]:
+    values = daily.to_numpy(dtype=float)[:, None]
+    scores = _score_paths(values, np.isfinite(values))
+    return _metric_entry({field: scores[field][0] for field in METRIC_FIELDS})
+
+
 def _weight_entries(
     weights: pd.Series,
     names: Mapping[str, str],
@@ -199,6 +522,12 @@ def build_yearly_portfolios(
     min_training_observations: int,
     universe_resolver: Callable[[int], Mapping[str, str]],
     fallback_names: Mapping[str, str],
+    membership: pd.DataFrame | None = None,
+    solver: str = SOLVER,
+    executor: str = "serial",
+    jobs: int | None = None,
+    rebalance: str = REBALANCE_FREQUENCY,
+    cache: ResultCache | None = None,
 ):
     """前年までの取引日だけで重みを決め、当年をOOS評価する。"""
 
@@ -206,92 +535,401 @@ def build_yearly_portfolios(
     if not frames:
         raise PortfolioConstructionError("no price frames were supplied")
 
-    closes = pd.DataFrame(
-        {
-            ticker: frame["close"]
-            for ticker, frame in frames.items()
-            if "close" in frame.columns
-        }
-    ).sort_index()
+    closes = align_closes(frames)
     if closes.empty:
         raise PortfolioConstructionError("no close-price series were supplied")
 
-    returns = closes.pct_change(fill_method=None)
-    results = {}
+    return build_yearly_portfolios_from_returns(
+        closes.pct_change(fill_method=None),
+        years,
+        max_weight,
+        lookback_days,
+        min_training_observations,
+        universe_resolver,
+        fallback_names,
+        membership,
+        solver,
+        executor,
+        jobs,
+        rebalance,
+        cache,
+    )
+
+
+def _members_at(
+    membership: pd.DataFrame, columns: pd.Index, when: pd.Timestamp
+) -> list[str]:
+    row = int(membership.index.searchsorted(when, side="left"))
+    if row >= len(membership.index):
+        return []
+    flags = membership.iloc[row].reindex(columns, fill_value=False)
+    return list(columns[flags.to_numpy(dtype=bool)])
+
+
+def _requested_tickers(
+    returns: pd.DataFrame,
+    membership: pd.DataFrame | None,
+    universe: Mapping[str, str],
+    when: pd.Timestamp,
+    label,
+) -> list[str]:
+    if membership is None:
+        requested = [ticker for ticker in universe if ticker in returns.columns]
+    else:
+        requested = _members_at(membership, returns.columns, when)
+    if not requested:
+        raise PortfolioConstructionError(
+            f"{label}: no universe members have price columns"
+        )
+    return requested
+
+
+def _attached(frame: pd.DataFrame | SharedFrame | None) -> pd.DataFrame | None:
+    return frame.frame() if isinstance(frame, SharedFrame) else frame
+
+
+def _year_result(
+    year: int,
+    universe: Mapping[str, str],
+    fallback_names: Mapping[str, str],
+    requested_tickers: list[str],
+    weights: pd.Series,
+    excluded: Mapping[str, str],
+    training_window: pd.DataFrame,
+    complete_training_observations: int,
+    training_bounds: tuple[pd.Timestamp, pd.Timestamp],
+    departed: list[str],
+    risk_metrics: Mapping[str, float | str | int],
+    evaluation_bounds: tuple[pd.Timestamp, pd.Timestamp],
+    rebalance: Mapping[str, object] | None = None,
+    rebalances: list[dict] | None = None,
+) -> dict:
+    """1年分の結果を組み立てる。リバランスした年だけ`rebalance`と`rebalances`が加わる。"""
+    data_quality = {
+        "requested_assets": len(requested_tickers),
+        "eligible_assets": len(weights),
+        "excluded_assets": excluded,
+        "lookback_unit": "trading_observations",
+        "lookback_observations": int(len(training_window)),
+        "complete_training_observations": complete_training_observations,
+        "members_left_during_evaluation": departed,
+        "optimizer": dict(weights.attrs.get("solver", {})),
+    }
+    if rebalance is not None:
+        data_quality["rebalance"] = rebalance
+    data_quality["snapshot_provenance_verified"] = False
+    data_quality["snapshot_warning"] = (
+        "Membership YAML must be independently verified against an "
+        "as-of source; price availability alone cannot prove index membership."
+    )
+    portfolio = {
+        "weights": _weight_entries(
+            weights,
+            {**fallback_names, **universe},
+            requested_tickers,
+        ),
+        "risk_metrics": risk_metrics,
+    }
+    if rebalances is not None:
+        portfolio["rebalances"] = rebalances
+    portfolio["training_window"] = {
+        "start": training_bounds[0].isoformat(),
+        "end": training_bounds[1].isoformat(),
+    }
+    portfolio["evaluation_window"] = {
+        "start": evaluation_bounds[0].isoformat(),
+        "end": evaluation_bounds[1].isoformat(),
+    }
+    return {
+        "status": "accepted",
+        "period": {"start": f"{year}-01-01", "end": f"{year}-12-31"},
+        "universe": [
+            {
+                "ticker": ticker,
+                "name": universe.get(ticker, fallback_names.get(ticker, "")),
+            }
+            for ticker in requested_tickers
+        ],
+        "data_quality": data_quality,
+        "portfolio": portfolio,
+    }
+
+
+def _year_portfolio(
+    returns: pd.DataFrame | SharedFrame,
+    membership: pd.DataFrame | SharedFrame | None,
+    settings: tuple[float, int, int, str, str],
+    fallback_names: Mapping[str, str],
+    cache: ResultCache | None,
+    task: tuple[int, dict[str, str]],
+) -> dict:
+    """1年分の訓練・最適化・OOS評価を行う。他の年とは独立に実行できる。"""
+
+    returns = _attached(returns)
+    membership = _attached(membership)
+    max_weight, lookback_days, min_training_observations, solver, frequency = settings
+    year, universe = task
+    if frequency != "annual":
+        return _rebalanced_year(
+            returns, membership, settings, fallback_names, cache, task
+        )
     timezone = returns.index.tz
+    start = pd.Timestamp(year=year, month=1, day=1, tz=timezone)
+    end = pd.Timestamp(year=year, month=12, day=31, tz=timezone)
+
+    requested_tickers = _requested_tickers(returns, membership, universe, start, year)
+
+    # 252は暦日ではなく、startより前に実在する252取引観測を意味する。
+    prior_returns = returns.loc[returns.index < start, requested_tickers]
+    training_window = prior_returns.tail(lookback_days)
+    selected_training, excluded = _select_training_returns(
+        training_window,
+        min_training_observations,
+        max_weight,
+    )
+    weights = _cached_weights(
+        cache,
+        ("sample", selected_training, max_weight, solver),
+        lambda: _weight_sharpe(selected_training, max_weight, solver),
+    )
 
-    for year in years:
-        universe = dict(universe_resolver(year))
-        requested_tickers = [
-            ticker for ticker in universe if ticker in returns.columns
-        ]
-        if not requested_tickers:
-            raise PortfolioConstructionError(
-                f"{year}: no universe members have price columns"
-            )
+    year_mask = (returns.index >= start) & (returns.index <= end)
+    year_returns = returns.loc[year_mask, requested_tickers]
+    metrics = _metrics(year_returns, weights)
+
+    active_evaluation = year_returns.loc[:, weights.index].dropna(how="any")
+    departed: list[str] = []
+    if membership is not None:
+        retained = membership.loc[year_mask, requested_tickers].all()
+        departed = sorted(retained.index[~retained.to_numpy(dtype=bool)])
+
+    return _year_result(
+        year,
+        universe,
+        fallback_names,
+        requested_tickers,
+        weights,
+        excluded,
+        training_window,
+        int(len(selected_training)),
+        (selected_training.index.min(), selected_training.index.max()),
+        departed,
+        metrics,
+        (active_evaluation.index.min(), active_evaluation.index.max()),
+    )
 
-        start = pd.Timestamp(year=year, month=1, day=1, tz=timezone)
-        end = pd.Timestamp(year=year, month=12, day=31, tz=timezone)
 
-        # 252は暦日ではなく、startより前に実在する252取引観測を意味する。
-        prior_returns = returns.loc[returns.index < start, requested_tickers]
-        training_window = prior_returns.tail(lookback_days)
+REBALANCE_FREQUENCIES = ("annual", "monthly", "weekly", "daily")
+
+
+def _decision_rows(
+    index: pd.DatetimeIndex, start: pd.Timestamp, end: pd.Timestamp, frequency: str
+) -> list[int]:
+    """期間内の各月・各週（ISO週）・各取引日の最初の行番号を返す。"""
+    first = int(index.searchsorted(start, side="left"))
+    days = index[first : int(index.searchsorted(end, side="right"))]
+    if frequency == "daily":
+        keys = np.arange(len(days))
+    elif frequency == "monthly":
+        keys = days.year.to_numpy() * 100 + days.month.to_numpy()
+    else:
+        calendar = days.isocalendar()
+        keys = calendar["year"].to_numpy() * 100 + calendar["week"].to_numpy()
+    _, positions = np.unique(keys, return_index=True)
+    return [first + int(position) for position in sorted(positions)]
+
+
+def _rebalanced_year(
+    returns: pd.DataFrame,
+    membership: pd.DataFrame | None,
+    settings: tuple[float, int, int, str, str],
+    fallback_names: Mapping[str, str],
+    cache: ResultCache | None,
+    task: tuple[int, dict[str, str]],
+) -> dict:
+    """年内の決定日ごとに重みを更新し、保有期間をつないだ日次リターンで評価する。"""
+
+    max_weight, lookback_days, min_training_observations, solver, frequency = settings
+    year, universe = task
+    timezone = returns.index.tz
+    start = pd.Timestamp(year=year, month=1, day=1, tz=timezone)
+    end = pd.Timestamp(year=year, month=12, day=31, tz=timezone)
+    decisions = _decision_rows(returns.index, start, end, frequency)
+    if not decisions:
+        raise PortfolioConstructionError(f"{year}: no trading days to rebalance on")
+    stops = decisions[1:] + [int(returns.index.searchsorted(end, side="right"))]
+
+    positions = {ticker: column for column, ticker in enumerate(returns.columns)}
+    engine = RollingMoments(returns.to_numpy(dtype=float))
+    rebalances = []
+    paths = []
+    departed: set[str] = set()
+    first = None
+    for row, stop in zip(decisions, stops):
+        when = returns.index[row]
+        requested_tickers = _requested_tickers(
+            returns, membership, universe, when, when.date()
+        )
+
+        window_start = max(0, row - lookback_days)
+        training_window = returns.iloc[window_start:row][requested_tickers]
         selected_training, excluded = _select_training_returns(
             training_window,
             min_training_observations,
             max_weight,
         )
-        weights = _weight_sharpe(selected_training, max_weight)
-
-        year_mask = (returns.index >= start) & (returns.index <= end)
-        year_returns = returns.loc[year_mask, requested_tickers]
-        metrics = _metrics(year_returns, weights)
+        columns = [positions[ticker] for ticker in selected_training.columns]
+        engine.advance(columns, window_start, row)
+        # 差分更新の値は丸め誤差の範囲で最後の作り直しからの移動に依存するので、
+        # 窓の中身に作り直し位置からのずれを添えてキーにする。
+        weights = _cached_weights(
+            cache,
+            (
+                "rolling",
+                frequency,
+                lookback_days,
+                returns.iloc[window_start:row, columns],
+                window_start - engine.origin,
+                max_weight,
+                solver,
+            ),
+            lambda: _weight_sharpe_from_moments(
+                *engine.moments(),
+                list(selected_training.columns),
+                max_weight,
+                solver,
+            ),
+        )
 
-        training_start = selected_training.index.min()
-        training_end = selected_training.index.max()
-        active_evaluation = year_returns.loc[:, weights.index].dropna(how="any")
-        evaluation_start = active_evaluation.index.min()
-        evaluation_end = active_evaluation.index.max()
-
-        results[year] = {
-            "status": "accepted",
-            "period": {"start": f"{year}-01-01", "end": f"{year}-12-31"},
-            "universe": [
-                {
-                    "ticker": ticker,
-                    "name": universe.get(ticker, fallback_names.get(ticker, "")),
-                }
-                for ticker in requested_tickers
-            ],
-            "data_quality": {
-                "requested_assets": len(requested_tickers),
+        active = weights[weights > 1e-10]
+        if active.empty:
+            raise PortfolioConstructionError("portfolio has no active positions")
+        held = returns.iloc[row:stop][list(active.index)].dropna(how="any")
+        paths.append(held.mul(active, axis=1).sum(axis=1))
+        if membership is not None:
+            retained = membership.iloc[row:stop][requested_tickers].all()
+            departed.update(retained.index[~retained.to_numpy(dtype=bool)])
+
+        rebalances.append(
+            {
+                "date": when.date().isoformat(),
                 "eligible_assets": len(weights),
-                "excluded_assets": excluded,
-                "lookback_unit": "trading_observations",
-                "lookback_observations": int(len(training_window)),
-                "complete_training_observations": int(len(selected_training)),
-                "snapshot_provenance_verified": False,
-                "snapshot_warning": (
-                    "Membership YAML must be independently verified against an "
-                    "as-of source; price availability alone cannot prove index membership."
-                ),
-            },
-            "portfolio": {
-                "weights": _weight_entries(
-                    weights,
-                    {**fallback_names, **universe},
-                    requested_tickers,
-                ),
-                "risk_metrics": metrics,
-                "training_window": {
-                    "start": training_start.isoformat(),
-                    "end": training_end.isoformat(),
-                },
-                "evaluation_window": {
-                    "start": evaluation_start.isoformat(),
-                    "end": evaluation_end.isoformat(),
-                },
-            },
-        }
+                "training_observations": int(len(selected_training)),
+                "weights": {ticker: float(weight) for ticker, weight in active.items()},
+            }
+        )
+        if first is None:
+            first = (
+                requested_tickers,
+                weights,
+                training_window,
+                excluded,
+                selected_training.index.min(),
+            )
+        training_end = selected_training.index.max()
+
+    daily = pd.concat(paths)
+    if daily.empty:
+        raise PortfolioConstructionError("evaluation window has no complete observations")
+    requested_tickers, weights, training_window, excluded, training_start = first
+
+    return _year_result(
+        year,
+        universe,
+        fallback_names,
+        requested_tickers,
+        weights,
+        excluded,
+        training_window,
+        rebalances[0]["training_observations"],
+        (training_start, training_end),
+        sorted(departed),
+        _path_metrics(daily),
+        (daily.index.min(), daily.index.max()),
+        rebalance={
+            "frequency": frequency,
+            "decisions": len(rebalances),
+            "moment_resets": engine.resets,
+            "moment_updates": engine.updates,
+        },
+        rebalances=rebalances,
+    )
+
 
-    return results
+def _map_over_returns(
+    function: Callable,
+    returns: pd.DataFrame,
+    membership: pd.DataFrame | None,
+    arguments: tuple,
+    tasks: list,
+    jobs: int | None,
+    executor: str,
+) -> list:
+    """`function(returns, membership, *arguments, task)`を各タスクへ順序どおり適用する。"""
+    # プロセス間では行列をpickleせず、共有メモリ上の同じ値を各タスクが参照する。
+    shared = executor == "processes" and min(resolve_jobs(jobs), len(tasks)) > 1
+    with ExitStack() as stack:
+        if shared:
+            returns = stack.enter_context(SharedFrame(returns))
+            if membership is not None:
+                membership = stack.enter_context(SharedFrame(membership))
+        return parallel_map(
+            partial(function, returns, membership, *arguments), tasks, jobs, executor
+        )
+
+
+def build_yearly_portfolios_from_returns(
+    returns: pd.DataFrame,
+    years,
+    max_weight: float,
+    lookback_days: int,
+    min_training_observations: int,
+    universe_resolver: Callable[[int], Mapping[str, str]],
+    fallback_names: Mapping[str, str],
+    membership: pd.DataFrame | None = None,
+    solver: str = SOLVER,
+    executor: str = "serial",
+    jobs: int | None = None,
+    rebalance: str = REBALANCE_FREQUENCY,
+    cache: ResultCache | None = None,
+):
+    """整列済みリターン行列（例: `PriceMatrix.frame()`）から年次ポートフォリオを作る。
+
+    `membership`は`returns`と同じ日付軸の構成銘柄ブール行列。指定すると、
+    各年の対象銘柄を年初以降最初の取引日の行から選び、評価期間中に構成から
+    外れた銘柄を`data_quality`へ記録する。銘柄名は引き続き`universe_resolver`から得る。
+
+    `rebalance`が"annual"以外のときは、年内の各月・各週・各取引日の初日に
+    直前`lookback_days`観測で重みを決め直し、次の決定日まで保有する。平均と
+    共分散は`RollingMoments`で差分更新する。
+
+    各年は独立なので`executor`（serial/threads/processes）と`jobs`で並列に
+    組み立てる。結果は並列度によらず`years`の順に並ぶ。
+
+    `cache`を渡すと、選ばれた訓練行列・上限・解法とその版が同じ決定の重みを
+    再計算せずに読み出す。評価指標は毎回計算し直す。構築後にキャッシュを
+    上限の大きさまで削る。
+    """
+
+    _validate_parameters(max_weight, lookback_days, min_training_observations)
+    if returns.empty:
+        raise PortfolioConstructionError("no close-price series were supplied")
+    if membership is not None and not membership.index.equals(returns.index):
+        membership = membership.reindex(index=returns.index, fill_value=False)
+
+    if rebalance not in REBALANCE_FREQUENCIES:
+        raise ValueError(f"unknown rebalance frequency: {rebalance!r}")
+    settings = (max_weight, lookback_days, min_training_observations, solver, rebalance)
+    tasks = [(year, dict(universe_resolver(year))) for year in years]
+    built = _map_over_returns(
+        _year_portfolio,
+        returns,
+        membership,
+        (settings, fallback_names, cache),
+        tasks,
+        jobs,
+        executor,
+    )
+    if cache is not None:
+        cache.prune()
+    return {year: result for (year, _), result in zip(tasks, built)}
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import numpy as np
+from scipy.linalg import lu_factor, lu_solve
+from scipy.sparse import csr_array
+
+
+class QPResult:
+    def __init__(
+        self,
+        x: np.ndarray,
+        slack: np.ndarray,
+        multipliers: np.ndarray,
+        iterations: int,
+        converged: bool,
+        message: str,
+    ) -> None:
+        self.x = x
+        self.slack = slack
+        self.multipliers = multipliers
+        self.iterations = iterations
+        self.converged = converged
+        self.message = message
+
+
+def _step_length(values: np.ndarray, steps: np.ndarray) -> float:
+    negative = steps < 0
+    if not negative.any():
+        return 1.0
+    return float(min(1.0, np.min(-values[negative] / steps[negative])))
+
+
+def _inequality_operator(inequality: np.ndarray):
+    """不等式制約の行列を積に使う形で返す。
+
+    箱制約のように非零が1割以下なら疎行列にする。G'diag(w)Gの密な積は
+    反復ごとにO(mn²)かかるが、疎なら非零の組の数で済む。
+    """
+    if np.count_nonzero(inequality) <= 0.1 * inequality.size:
+        return csr_array(inequality)
+    return inequality
+
+
+def _add_weighted_gram(target: np.ndarray, inequality, weight: np.ndarray) -> None:
+    """`target`へG'diag(weight)Gをその場で足す。"""
+    if isinstance(inequality, np.ndarray):
+        target += (inequality.T * weight) @ inequality
+        return
+    gram = (inequality.T @ (inequality * weight[:, None])).tocoo()
+    np.add.at(target, (gram.row, gram.col), gram.data)
+
+
+def solve_qp(
+    quadratic: np.ndarray,
+    linear: np.ndarray,
+    equality: np.ndarray,
+    equality_rhs: np.ndarray,
+    inequality: np.ndarray,
+    inequality_rhs: np.ndarray,
+    initial: np.ndarray | None = None,
+    tolerance: float = 1e-10,
+    max_iterations: int = 100,
+) -> QPResult:
+    """`min ½x'Qx + c'x s.t. Ax = b, Gx <= h`を主双対内点法で解く。
+
+    Mehrotraの予測子・修正子法。各反復でKKT行列を一度だけLU分解し、
+    予測と修正の両方に使う。`initial`を渡すと近傍解からの暖機開始になる。
+    """
+    Q, c = quadratic, linear
+    A, b = equality, equality_rhs
+    G, h = _inequality_operator(inequality), inequality_rhs
+    n, p, m = len(c), len(b), len(h)
+
+    x = np.zeros(n) if initial is None else np.asarray(initial, dtype=float).copy()
+    s = np.maximum(h - G @ x, 1.0 if initial is None else 1e-4)
+    z = np.ones(m)
+    y = np.zeros(p)
+    scale = 1.0 + max(np.abs(Q).max(initial=0.0), np.abs(c).max(initial=0.0))
+    kkt = np.zeros((n + p, n + p))
+    kkt[:n, n:] = A.T
+    kkt[n:, :n] = A
+
+    for iteration in range(1, max_iterations + 1):
+        residual_dual = Q @ x + c + A.T @ y + G.T @ z
+        residual_eq = A @ x - b
+        residual_ineq = G @ x + s - h
+        gap = float(s @ z)
+        if (
+            np.abs(residual_dual).max(initial=0.0) <= tolerance * scale
+            and np.abs(residual_eq).max(initial=0.0) <= tolerance * (1 + np.abs(b).max(initial=0.0))
+            and np.abs(residual_ineq).max(initial=0.0) <= tolerance * (1 + np.abs(h).max(initial=0.0))
+            and gap <= tolerance * scale
+        ):
+            return QPResult(x, s, z, iteration - 1, True, "optimal")
+
+        weight = z / s
+        kkt[:n, :n] = Q
+        _add_weighted_gram(kkt[:n, :n], G, weight)
+        factor = lu_factor(kkt, check_finite=False)
+
+        def direction(complementarity: np.ndarray):
+            rhs = np.concatenate(
+                [
+                    -residual_dual - G.T @ (weight * residual_ineq + complementarity / s),
+                    -residual_eq,
+                ]
+            )
+            solution = lu_solve(factor, rhs, check_finite=False)
+            dx, dy = solution[:n], solution[n:]
+            dz = weight * (G @ dx + residual_ineq) + complementarity / s
+            ds = (complementarity - s * dz) / z
+            return dx, dy, dz, ds
+
+        mu = gap / m
+        dx, dy, dz, ds = direction(-s * z)
+        alpha = min(_step_length(s, ds), _step_length(z, dz))
+        affine_mu = float((s + alpha * ds) @ (z + alpha * dz)) / m
+        sigma = (affine_mu / mu) ** 3 if mu > 0 else 0.0
+        dx, dy, dz, ds = direction(-s * z - ds * dz + sigma * mu)
+        alpha = min(1.0, 0.99 * min(_step_length(s, ds), _step_length(z, dz)))
+
+        x = x + alpha * dx
+        y = y + alpha * dy
+        z = z + alpha * dz
+        s = s + alpha * ds
+        if not (np.isfinite(x).all() and np.isfinite(z).all()):
+            return QPResult(x, s, z, iteration, False, "non-finite iterate")
+
+    return QPResult(x, s, z, max_iterations, False, "iteration limit reached")
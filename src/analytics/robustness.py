@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import math
+from typing import Mapping
+
+import numpy as np
+import pandas as pd
+
+from ..common.config import (
+    ROBUSTNESS_BLOCK_LENGTH,
+    ROBUSTNESS_CONFIDENCE,
+    ROBUSTNESS_RESAMPLES,
+    ROBUSTNESS_SEED,
+)
+from ..common.parallel import parallel_map
+from .optimizer import METRIC_FIELDS, PortfolioConstructionError, _score_paths
+
+SCORED = METRIC_FIELDS[:-1]
+
+
+def _holding_periods(payload: Mapping, timezone) -> list[tuple[pd.Timestamp, dict[str, float]]]:
+    portfolio = payload["portfolio"]
+    if "rebalances" in portfolio:
+        return [
+            (pd.Timestamp(item["date"], tz=timezone), dict(item["weights"]))
+            for item in portfolio["rebalances"]
+        ]
+    start = pd.Timestamp(payload["period"]["start"], tz=timezone)
+    weights = {
+        ticker: entry["weight"]
+        for ticker, entry in portfolio["weights"].items()
+        if entry["weight"] > 1e-10
+    }
+    return [(start, weights)]
+
+
+def evaluation_path(returns: pd.DataFrame, payload: Mapping) -> pd.Series:
+    """年次結果の重みを保有期間ごとに当て、評価に使った日次リターンを再現する。
+
+    `_metrics`と同じく、保有銘柄がすべて観測された日だけを残す。
+    """
+    timezone = returns.index.tz
+    end = pd.Timestamp(payload["period"]["end"], tz=timezone)
+    periods = _holding_periods(payload, timezone)
+    stops = [start for start, _ in periods[1:]] + [None]
+    paths = []
+    for (start, weights), stop in zip(periods, stops):
+        active = pd.Series(weights, dtype=float)
+        rows = (returns.index >= start) & (
+            returns.index <= end if stop is None else returns.index < stop
+        )
+        held = returns.loc[rows, list(active.index)].dropna(how="any")
+        paths.append(held.mul(active, axis=1).sum(axis=1))
+    return pd.concat(paths)
+
+
+def _block_indices(
+    rng: np.random.Generator, length: int, resamples: int, block_length: int
+) -> np.ndarray:
+    """循環ブロックブートストラップの添字（resamples×length）を作る。"""
+    blocks = math.ceil(length / block_length)
+    starts = rng.integers(0, length, size=(resamples, blocks, 1))
+    indices = (starts + np.arange(block_length)) % length
+    return indices.reshape(resamples, blocks * block_length)[:, :length]
+
+
+def _interval(
+    estimate: float, samples: np.ndarray, confidence: float
+) -> dict[str, float]:
+    tail = (1 - confidence) / 2
+    finite = samples[np.isfinite(samples)]
+    lower, upper = np.quantile(finite, [tail, 1 - tail])
+    return {
+        "estimate": float(estimate),
+        "mean": float(finite.mean()),
+        "standard_error": float(finite.std(ddof=1)),
+        "lower": float(lower),
+        "upper": float(upper),
+    }
+
+
+def _resample_year(task: tuple) -> dict:
+    year, daily, resamples, block_length, confidence, seed = task
+    length = len(daily)
+    if length < 2:
+        raise PortfolioConstructionError(
+            f"{year}: at least two evaluation observations are required to resample"
+        )
+    block_length = min(block_length, length)
+    observed = _score_paths(daily[:, None], np.ones((length, 1), dtype=bool))
+    valid = np.ones((length, resamples), dtype=bool)
+
+    # 年と手法ごとに独立な乱数列を使い、並列度や実行順によらず同じ結果にする。
+    bootstrap_rng = np.random.default_rng([seed, year, 0])
+    indices = _block_indices(bootstrap_rng, length, resamples, block_length)
+    bootstrap = _score_paths(daily[indices].T, valid)
+
+    monte_carlo_rng = np.random.default_rng([seed, year, 1])
+    simulated = monte_carlo_rng.normal(
+        daily.mean(), daily.std(ddof=1), size=(length, resamples)
+    )
+    monte_carlo = _score_paths(simulated, valid)
+
+    return {
+        "evaluation_observations": length,
+        "resamples": resamples,
+        "confidence_level": confidence,
+        "seed": seed,
+        "block_bootstrap": {
+            "method": "circular_block_bootstrap",
+            "block_length": block_length,
+            **{
+                field: _interval(observed[field][0], bootstrap[field], confidence)
+                for field in SCORED
+            },
+        },
+        "monte_carlo": {
+            "method": "iid_normal_daily_returns",
+            **{
+                field: _interval(observed[field][0], monte_carlo[field], confidence)
+                for field in SCORED
+            },
+        },
+    }
+
+
+def resample_portfolios(
+    results: Mapping[int, Mapping],
+    returns: pd.DataFrame,
+    resamples: int = ROBUSTNESS_RESAMPLES,
+    block_length: int = ROBUSTNESS_BLOCK_LENGTH,
+    confidence: float = ROBUSTNESS_CONFIDENCE,
+    seed: int = ROBUSTNESS_SEED,
+    executor: str = "serial",
+    jobs: int | None = None,
+) -> dict[int, dict]:
+    """年次ポートフォリオのOOS指標について信頼区間を求める。
+
+    資産数によらず、先に各年の日次ポートフォリオリターンへ縮約してから、
+    循環ブロックブートストラップと正規分布のモンテカルロで`resamples`本の
+    経路をまとめて作り評価する。年ごとの計算は`executor`と`jobs`で並列化する。
+    """
+    if resamples < 2:
+        raise ValueError("resamples must be at least 2")
+    if block_length < 1:
+        raise ValueError("block_length must be at least 1")
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be in (0, 1)")
+    years = list(results)
+    tasks = [
+        (
+            year,
+            evaluation_path(returns, results[year]).to_numpy(dtype=float),
+            resamples,
+            block_length,
+            confidence,
+            seed,
+        )
+        for year in years
+    ]
+    return dict(zip(years, parallel_map(_resample_year, tasks, jobs, executor)))
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+
+class RollingMoments:
+    """リターン行列の行区間`[start, stop)`について、指定列がすべて観測された
+    行だけの平均と共分散を保持する。
+
+    窓を前へずらすと、入った行と出た行の和・積和だけを加減する（1行あたりO(N²)）。
+    列集合が変わったとき、窓が重ならないとき、累積した加減が窓長を超えたときは
+    作り直す。値は作り直し時の平均を引いてから積み上げ、桁落ちを抑える。
+    `origin`は最後に作り直したときの窓の先頭行で、現在の値はその行以降の値と
+    移動の履歴だけで決まる。
+    """
+
+    def __init__(self, values: np.ndarray) -> None:
+        self._values = values
+        self.columns: tuple[int, ...] | None = None
+        self.start = 0
+        self.stop = 0
+        self.count = 0
+        self.origin = 0
+        self.resets = 0
+        self.updates = 0
+        self._index = np.zeros(0, dtype=np.intp)
+        self._shift = np.zeros(0)
+        self._sum = np.zeros(0)
+        self._cross = np.zeros((0, 0))
+        self._moved = 0
+
+    def _complete(self, start: int, stop: int) -> np.ndarray:
+        block = self._values[start:stop, self._index]
+        return block[~np.isnan(block).any(axis=1)]
+
+    def reset(self, columns: Sequence[int], start: int, stop: int) -> None:
+        self.columns = tuple(columns)
+        self._index = np.asarray(self.columns, dtype=np.intp)
+        self.start, self.stop = start, stop
+        self.origin = start
+        block = self._complete(start, stop)
+        self._shift = (
+            block.mean(axis=0) if len(block) else np.zeros(len(self.columns))
+        )
+        block = block - self._shift
+        self.count = len(block)
+        self._sum = block.sum(axis=0)
+        self._cross = block.T @ block
+        self._moved = 0
+        self.resets += 1
+
+    def _accumulate(self, start: int, stop: int, sign: float) -> None:
+        block = self._complete(start, stop) - self._shift
+        self.count += int(sign) * len(block)
+        self._sum += sign * block.sum(axis=0)
+        self._cross += sign * (block.T @ block)
+        self._moved += stop - start
+
+    def advance(self, columns: Sequence[int], start: int, stop: int) -> None:
+        """窓を`[start, stop)`へ移す。前方への移動だけを差分更新する。"""
+        columns = tuple(columns)
+        if (
+            columns != self.columns
+            or start < self.start
+            or stop < self.stop
+            or start >= self.stop
+            or self._moved + (stop - self.stop) > stop - start
+        ):
+            self.reset(columns, start, stop)
+            return
+        self._accumulate(self.stop, stop, 1.0)
+        self._accumulate(self.start, start, -1.0)
+        self.start, self.stop = start, stop
+        self.updates += 1
+
+    def moments(self) -> tuple[np.ndarray, np.ndarray]:
+        """平均と標本共分散（ddof=1）を返す。"""
+        if self.count < 2:
+            raise ValueError("at least two complete observations are required")
+        mean = self._sum / self.count
+        covariance = (self._cross - np.outer(self._sum, mean)) / (self.count - 1)
+        return self._shift + mean, (covariance + covariance.T) / 2
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+from typing import Mapping
+
+import numpy as np
+import pandas as pd
+
+from ..common.config import TRANSACTION_COST_BPS
+from .optimizer import METRIC_FIELDS, _score_paths
+
+
+class SimulationResult:
+    def __init__(
+        self,
+        equity: pd.Series,
+        returns: pd.Series,
+        trades: pd.DataFrame,
+        yearly: dict[int, dict[str, float]],
+    ) -> None:
+        self.equity = equity
+        self.returns = returns
+        self.trades = trades
+        self.yearly = yearly
+
+
+def holding_schedule(
+    results: Mapping[int, Mapping], timezone
+) -> list[tuple[int, pd.Timestamp, dict[str, float]]]:
+    """年次結果から(年, 決定日, 目標重み)を決定日順に並べる。
+
+    年次リバランスでは年初、それ以外では`portfolio.rebalances`の各日を使う。
+    """
+    schedule = []
+    for year in sorted(results):
+        payload = results[year]
+        portfolio = payload["portfolio"]
+        if "rebalances" in portfolio:
+            schedule.extend(
+                (year, pd.Timestamp(item["date"], tz=timezone), dict(item["weights"]))
+                for item in portfolio["rebalances"]
+            )
+        else:
+            weights = {
+                ticker: entry["weight"]
+                for ticker, entry in portfolio["weights"].items()
+                if entry["weight"] > 1e-10
+            }
+            schedule.append(
+                (year, pd.Timestamp(payload["period"]["start"], tz=timezone), weights)
+            )
+    return schedule
+
+
+def drift_kernel(
+    returns: np.ndarray,
+    decisions: np.ndarray,
+    targets: np.ndarray,
+    from_cash: np.ndarray,
+    cost_rate: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """決定日に目標重みへ売買し、次の決定日まで価格どおりに保有を漂流させる。
+
+    `returns`はT×N（欠損は0とみなす）、`decisions`は昇順の行番号で先頭は0、
+    `targets`はD×Nの目標重み、`from_cash`は現金から建てる決定日。決定日の行の
+    リターンから新しい重みで保有する。売買代金は売買前の資産額×回転率で、
+    `cost_rate`を掛けた額を売買時に差し引く。
+
+    戻り値は各行末の資産額（初期1）、各決定日の回転率、費用率。
+    日数や決定日数についてPythonのループを持たない。
+    """
+    rows, _ = returns.shape
+    cumulative = np.vstack(
+        [np.zeros((1, returns.shape[1])), np.cumsum(np.log1p(returns), axis=0)]
+    )
+    period = np.searchsorted(decisions, np.arange(rows), side="right") - 1
+    growth = np.exp(cumulative[1:] - cumulative[decisions[period]])
+    value = np.einsum("tn,tn->t", targets[period], growth)
+
+    # 各保有期間の末尾（次の決定日の前日）での価値と、漂流後の重み。
+    ends = decisions[1:]
+    end_growth = np.exp(cumulative[ends] - cumulative[decisions[:-1]])
+    end_holdings = targets[:-1] * end_growth
+    end_value = end_holdings.sum(axis=1)
+    drifted = np.zeros_like(targets)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        drifted[1:] = np.where(
+            end_value[:, None] > 0, end_holdings / end_value[:, None], 0.0
+        )
+    drifted[from_cash] = 0.0
+
+    turnover = np.abs(targets - drifted).sum(axis=1)
+    costs = cost_rate * turnover
+    carried = np.concatenate([[1.0], end_value])
+    wealth = np.cumprod(carried * (1 - costs))
+    return wealth[period] * value, turnover, costs
+
+
+def simulate_results(
+    results: Mapping[int, Mapping],
+    returns: pd.DataFrame,
+    cost_bps: float = TRANSACTION_COST_BPS,
+) -> SimulationResult:
+    """年次結果の売買を、保有の漂流と回転率比例の取引費用込みで再現する。
+
+    連続する年は前年末の漂流後の保有から売買し、最初の年と間の空いた年だけ
+    現金から建てる。評価対象外の期間は価値を据え置く。各年の指標は連続した
+    資産曲線の当年部分から計算する。欠損リターンは価格据え置き（0）として扱う。
+    """
+    if cost_bps < 0:
+        raise ValueError("cost_bps must be non-negative")
+    timezone = returns.index.tz
+    schedule = holding_schedule(results, timezone)
+    if not schedule:
+        raise ValueError("no portfolios to simulate")
+    last_year = max(results)
+    end = pd.Timestamp(results[last_year]["period"]["end"], tz=timezone)
+    first_row = int(returns.index.searchsorted(schedule[0][1], side="left"))
+    window = returns.iloc[first_row : int(returns.index.searchsorted(end, side="right"))]
+
+    tickers = sorted({ticker for _, _, weights in schedule for ticker in weights})
+    columns = window.columns.get_indexer(tickers)
+    if (columns < 0).any():
+        raise ValueError("scheduled weights reference tickers without returns")
+    targets = np.zeros((len(schedule), len(tickers)))
+    for position, (_, _, weights) in enumerate(schedule):
+        targets[position] = [weights.get(ticker, 0.0) for ticker in tickers]
+    decisions = window.index.searchsorted([when for _, when, _ in schedule], side="left")
+    years = [year for year, _, _ in schedule]
+    from_cash = np.array(
+        [
+            position == 0
+            or (years[position] != years[position - 1] and years[position] - 1 not in results)
+            for position in range(len(schedule))
+        ]
+    )
+
+    values = np.nan_to_num(window.to_numpy(dtype=float)[:, columns], nan=0.0)
+    evaluated = np.zeros(len(window), dtype=bool)
+    for year in results:
+        evaluated |= (
+            (window.index >= pd.Timestamp(results[year]["period"]["start"], tz=timezone))
+            & (window.index <= pd.Timestamp(results[year]["period"]["end"], tz=timezone))
+        )
+    values[~evaluated] = 0.0
+    wealth, turnover, costs = drift_kernel(
+        values, np.asarray(decisions), targets, from_cash, cost_bps / 10_000
+    )
+    equity = pd.Series(wealth, index=window.index, name="equity")
+    daily = equity.pct_change()
+    daily.iloc[0] = wealth[0] - 1
+    trades = pd.DataFrame(
+        {"year": years, "turnover": turnover, "cost": costs, "from_cash": from_cash},
+        index=window.index[decisions],
+    )
+
+    yearly = {}
+    for year in sorted(results):
+        start = pd.Timestamp(results[year]["period"]["start"], tz=timezone)
+        stop = pd.Timestamp(results[year]["period"]["end"], tz=timezone)
+        path = daily[(daily.index >= start) & (daily.index <= stop)].to_numpy()[:, None]
+        scores = _score_paths(path, np.ones(path.shape, dtype=bool))
+        traded = trades[trades["year"] == year]
+        yearly[year] = {
+            **{field: float(scores[field][0]) for field in METRIC_FIELDS[:-1]},
+            "evaluation_observations": int(scores["evaluation_observations"][0]),
+            "rebalances": int(len(traded)),
+            "turnover": float(traded["turnover"].sum()),
+            "transaction_cost": float(traded["cost"].sum()),
+        }
+    return SimulationResult(equity, daily, trades, yearly)
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import itertools
+import math
+from typing import Callable, Iterable, Mapping
+
+import pandas as pd
+
+from ..common.config import SOLVER
+from .optimizer import (
+    PortfolioConstructionError,
+    _attached,
+    _map_over_returns,
+    _metric_entry,
+    _requested_tickers,
+    _select_training_returns,
+    _validate_parameters,
+    _weight_sharpe_from_moments,
+    portfolio_metrics,
+)
+
+PARAMETERS = ("max_weight", "lookback_days", "min_training_observations")
+METRICS = (
+    "annual_return",
+    "annual_return_method",
+    "volatility",
+    "sharpe_ratio",
+    "max_drawdown",
+    "evaluation_observations",
+)
+COLUMNS = (
+    *PARAMETERS,
+    "year",
+    "status",
+    "eligible_assets",
+    "complete_training_observations",
+    *METRICS,
+    "error",
+)
+
+
+def parameter_grid(
+    max_weights: Iterable[float],
+    lookbacks: Iterable[int],
+    min_observations: Iterable[int],
+) -> list[tuple[float, int, int]]:
+    """3つの候補の直積を返す。最低観測数が窓長を超える組は除く。"""
+    grid = []
+    for max_weight, lookback_days, minimum in itertools.product(
+        max_weights, lookbacks, min_observations
+    ):
+        if minimum > lookback_days:
+            continue
+        _validate_parameters(max_weight, lookback_days, minimum)
+        grid.append((float(max_weight), int(lookback_days), int(minimum)))
+    if not grid:
+        raise ValueError("parameter grid is empty")
+    return grid
+
+
+def _sweep_group(
+    returns,
+    membership,
+    solver: str,
+    task: tuple[int, dict[str, str], int, list[tuple[float, int]]],
+) -> list[dict]:
+    """同じ年・同じ窓長の組をまとめて評価する。
+
+    訓練窓と評価期間は1度だけ切り出し、銘柄選択は(最低観測数, 必要銘柄数)ごと、
+    平均と共分散は選ばれた列集合ごと、重みは(列集合, 上限)ごとに使い回し、
+    得られた重みは`portfolio_metrics`でまとめて評価する。
+    """
+    returns = _attached(returns)
+    membership = _attached(membership)
+    year, universe, lookback_days, combinations = task
+    timezone = returns.index.tz
+    start = pd.Timestamp(year=year, month=1, day=1, tz=timezone)
+    end = pd.Timestamp(year=year, month=12, day=31, tz=timezone)
+
+    rows = [
+        {
+            "max_weight": max_weight,
+            "lookback_days": lookback_days,
+            "min_training_observations": minimum,
+            "year": year,
+        }
+        for max_weight, minimum in combinations
+    ]
+    try:
+        requested_tickers = _requested_tickers(returns, membership, universe, start, year)
+    except PortfolioConstructionError as exc:
+        # 対象銘柄がなければ、どの組も同じ理由で構築できない。
+        for row in rows:
+            row.update(status="rejected", error=str(exc))
+        return rows
+    training_window = returns.loc[returns.index < start, requested_tickers].tail(
+        lookback_days
+    )
+    year_returns = returns.loc[
+        (returns.index >= start) & (returns.index <= end), requested_tickers
+    ]
+
+    selections: dict[tuple[int, int], pd.DataFrame | PortfolioConstructionError] = {}
+    moments: dict[tuple[str, ...], tuple] = {}
+    solutions: dict[tuple[tuple[str, ...], float], pd.Series] = {}
+    for row, (max_weight, minimum) in zip(rows, combinations):
+        try:
+            key = (minimum, math.ceil(1 / max_weight - 1e-12))
+            if key not in selections:
+                try:
+                    selections[key] = _select_training_returns(
+                        training_window, minimum, max_weight
+                    )[0]
+                except PortfolioConstructionError as exc:
+                    selections[key] = exc
+            selected = selections[key]
+            if isinstance(selected, PortfolioConstructionError):
+                raise selected
+            columns = tuple(selected.columns)
+            if columns not in moments:
+                moments[columns] = (
+                    selected.mean().to_numpy(dtype=float),
+                    selected.cov().to_numpy(dtype=float),
+                )
+            if (columns, max_weight) not in solutions:
+                solutions[columns, max_weight] = _weight_sharpe_from_moments(
+                    *moments[columns], list(columns), max_weight, solver
+                )
+            weights = solutions[columns, max_weight]
+        except PortfolioConstructionError as exc:
+            row.update(status="rejected", error=str(exc))
+        else:
+            row.update(
+                solution=(columns, max_weight),
+                eligible_assets=len(weights),
+                complete_training_observations=int(len(selected)),
+            )
+
+    # 異なる解だけを1つの重み行列にして一括評価する。
+    keys = list(solutions)
+    scores = portfolio_metrics(
+        year_returns, pd.DataFrame([solutions[key] for key in keys]).fillna(0.0)
+    )
+    scores.index = range(len(keys))
+    positions = {key: position for position, key in enumerate(keys)}
+    for row in rows:
+        if "solution" not in row:
+            continue
+        try:
+            row.update(_metric_entry(scores.loc[positions[row.pop("solution")]]))
+        except PortfolioConstructionError as exc:
+            row.update(status="rejected", error=str(exc))
+        else:
+            row["status"] = "accepted"
+    return rows
+
+
+def sweep_parameters(
+    returns: pd.DataFrame,
+    years,
+    grid: Iterable[tuple[float, int, int]],
+    universe_resolver: Callable[[int], Mapping[str, str]],
+    membership: pd.DataFrame | None = None,
+    solver: str = SOLVER,
+    executor: str = "serial",
+    jobs: int | None = None,
+) -> pd.DataFrame:
+    """パラメータの組ごと・年ごとの評価指標を1行1観測の表で返す。
+
+    構築できない組は例外にせず`status="rejected"`と`error`を記録する。
+    作業単位は(年, 窓長)で、`build_yearly_portfolios_from_returns`と同じく
+    `executor`と`jobs`で並列に実行する。行の順序は`grid`と`years`の順。
+    """
+    grid = list(grid)
+    if returns.empty:
+        raise PortfolioConstructionError("no close-price series were supplied")
+    if membership is not None and not membership.index.equals(returns.index):
+        membership = membership.reindex(index=returns.index, fill_value=False)
+
+    groups: dict[int, list[tuple[float, int]]] = {}
+    for max_weight, lookback_days, minimum in grid:
+        groups.setdefault(lookback_days, []).append((max_weight, minimum))
+    universes = {year: dict(universe_resolver(year)) for year in years}
+    tasks = [
+        (year, universe, lookback_days, combinations)
+        for year, universe in universes.items()
+        for lookback_days, combinations in groups.items()
+    ]
+    built = _map_over_returns(
+        _sweep_group, returns, membership, (solver,), tasks, jobs, executor
+    )
+
+    results = {
+        tuple(row[name] for name in (*PARAMETERS, "year")): row
+        for rows in built
+        for row in rows
+    }
+    return pd.DataFrame(
+        [results[(*parameters, year)] for parameters in grid for year in universes],
+        columns=list(COLUMNS),
+    )
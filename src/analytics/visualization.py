@@ -5,42 +5,52 @@ import matplotlib.pyplot as plt
 from matplotlib.axes import Axes
 import pandas as pd
 import yaml
-import yfinance as yf
-from ..common.config import DATA_RAW, REPORT_DIR, TICKER_NAMES_FILE, ABENOMICS_START, ABENOMICS_END, TIMELINE_START
-from ..data_io.yaml_store import load_frames
+from ..common.config import DATA_RAW, PRICE_MATRIX_DIR, REPORT_DIR, TICKER_NAMES_FILE, ABENOMICS_START, ABENOMICS_END, TIMELINE_START
+from ..data_io.price_store import exists, load_frames
+from ..data_io.price_matrix import open_price_matrix
 from ..common.viz import apply_design_system
+from ..reporting.results_file import RESULTS_FILE_NAME, read_results, top_holdings
 def _load_ticker_names():
     return yaml.safe_load(TICKER_NAMES_FILE.read_text(encoding="utf-8"))
+def _portfolio_entry(holdings, evaluation_window, ticker_names):
+    ordered = sorted(holdings, key=lambda item: float(item.get("weight", 0.0)), reverse=True)[:10]
+    parsed_holdings = [
+        {
+            "ticker": item["ticker"],
+            "weight": float(item.get("weight", 0.0)),
+            "name": ticker_names.get(item["ticker"], item.get("name", item["ticker"])),
+        }
+        for item in ordered
+    ]
+    start_ts = pd.Timestamp(evaluation_window["start"])
+    end_ts = pd.Timestamp(evaluation_window["end"])
+    return {"holdings": parsed_holdings, "start": start_ts, "end": end_ts}
 def _load_portfolios(ticker_names):
+    """レポーターの結果ファイルを1回で読む。古いレポートしかなければ年ごとのYAMLを読む。"""
+    results_path = REPORT_DIR / RESULTS_FILE_NAME
+    if results_path.exists():
+        return {
+            year: _portfolio_entry(top_holdings(record), record["evaluation_window"], ticker_names)
+            for year, record in read_results(results_path).items()
+        }
     portfolios = {}
     for path in sorted(REPORT_DIR.glob("*.yaml")):
-        if path.name == "summary.yaml":
+        # summary.yamlや頑健性・シミュレーションのレポートは年次レポートではない。
+        if not path.stem.isdigit():
             continue
         payload = yaml.safe_load(path.read_text(encoding="utf-8"))
         year = int(payload["year"])
-        allocation = payload["portfolio"]["allocations"]
-        holdings = allocation["top_holdings"]
-        ordered = sorted(holdings, key=lambda item: float(item.get("weight", 0.0)), reverse=True)[:10]
-        parsed_holdings = [
-            {
-                "ticker": item["ticker"],
-                "weight": float(item.get("weight", 0.0)),
-                "name": ticker_names.get(item["ticker"], item.get("name", item["ticker"])),
-            }
-            for item in ordered
-        ]
-        evaluation_window = payload["conditions"]["evaluation_window"]
-        start = evaluation_window["start"]
-        end = evaluation_window["end"]
-        start_ts = pd.Timestamp(start)
-        end_ts = pd.Timestamp(end)
-        portfolios[year] = {"holdings": parsed_holdings, "start": start_ts, "end": end_ts}
+        holdings = payload["portfolio"]["allocations"]["top_holdings"]
+        portfolios[year] = _portfolio_entry(holdings, payload["conditions"]["evaluation_window"], ticker_names)
     return portfolios
 def _load_closes(tickers, start=None, end=None, allow_downloads=None):
     tickers = sorted(set(tickers))
-    available_locally = [ticker for ticker in tickers if (DATA_RAW / f"{ticker}.yaml").exists()]
+    matrix = open_price_matrix(PRICE_MATRIX_DIR)
+    if matrix is not None and set(tickers) <= set(matrix.columns) and matrix.is_current(DATA_RAW):
+        return matrix.frame("closes", start, end, tickers).dropna(how="all")
+    available_locally = [ticker for ticker in tickers if exists(ticker, DATA_RAW)]
     series_map = {}
-    frames = load_frames(available_locally, DATA_RAW)
+    frames = load_frames(available_locally, DATA_RAW, start, end, ["close"])
     for ticker, frame in frames.items():
         close_series = frame["close"].copy()
         close_series.index = pd.to_datetime(close_series.index)
@@ -56,7 +66,7 @@ def _plot_no_data_message(ax, year, message, global_start, global_end):
         ha="center",
         va="center",
         fontsize=18,
-        color="
+        color="#333333",
     )
     ax.set_xticks([])
     ax.set_yticks([])
@@ -90,7 +100,7 @@ def create_yearly_portfolio_panels(output_path: Path) -> Path:
         _plot_no_data_message(ax, year, message, global_start, global_end)
         _finalize_axis(ax, index)
     for i, (ax, year) in enumerate(zip(axes, full_year_range)):
-        ax.set_facecolor("
+        ax.set_facecolor("#FFFFFF")
         ax.set_xlim(global_start, global_end)
         ax.set_ylim(0.1, 10)
         ax.set_yscale("log")
@@ -112,14 +122,14 @@ def create_yearly_portfolio_panels(output_path: Path) -> Path:
         weights = (weights.loc[frame.columns] / weights.loc[frame.columns].sum()).astype(float)
         scaled = frame.divide(frame.iloc[0])
         portfolio_curve = scaled.mul(weights, axis=1).sum(axis=1)
-        abenomics_patch = ax.axvspan(abenomics_start_ts, abenomics_end_ts, color="
+        abenomics_patch = ax.axvspan(abenomics_start_ts, abenomics_end_ts, color="#FDE68A", alpha=0.3)
         lines = [
             ax.plot(
                 scaled.index,
                 scaled[ticker],
                 linewidth=1.5,
                 alpha=0.7,
-                color=colors.get(ticker, "
+                color=colors.get(ticker, "#999999"),
                 label=f"{ticker_names.get(ticker, ticker)} ({weights[ticker]:.1%})",
             )[0]
             for ticker in scaled.columns
@@ -128,7 +138,7 @@ def create_yearly_portfolio_panels(output_path: Path) -> Path:
             portfolio_curve.index,
             portfolio_curve,
             linewidth=3.0,
-            color="
+            color="#111111",
             label="Portfolio",
         )[0]
         legend_entries = sorted(
@@ -141,16 +151,16 @@ def create_yearly_portfolio_panels(output_path: Path) -> Path:
         labels = [entry[2] for entry in legend_entries] + ["Abenomics Period"]
         ax.set_title(str(year), fontsize=20, fontweight="bold")
         ax.set_ylabel("Indexed performance (base = 1)", fontsize=16)
-        ax.grid(True, which="both", ls="-", alpha=0.1, color="
+        ax.grid(True, which="both", ls="-", alpha=0.1, color="#CCCCCC")
         ax.xaxis.set_major_locator(mdates.YearLocator())
         ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y"))
         ax.tick_params(axis="x", rotation=30, labelsize=15)
         ax.tick_params(axis="y", labelsize=15)
-        ax.legend(handles, labels, fontsize=16, ncol=1, frameon=True, loc="center left", bbox_to_anchor=(1, 0.5), facecolor="
+        ax.legend(handles, labels, fontsize=16, ncol=1, frameon=True, loc="center left", bbox_to_anchor=(1, 0.5), facecolor="#FFFFFF")
         _finalize_axis(ax, i)
-    fig.suptitle("Portfolio Performance by Year", fontsize=28, fontweight="bold", color="
+    fig.suptitle("Portfolio Performance by Year", fontsize=28, fontweight="bold", color="#1A1A1A")
     fig.tight_layout(rect=(0, 0, 0.92, 0.96))
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    fig.savefig(output_path, format=output_path.suffix.lstrip("."), dpi=150, facecolor="
+    fig.savefig(output_path, format=output_path.suffix.lstrip("."), dpi=150, facecolor="#FFFFFF")
     plt.close(fig)
     return output_path
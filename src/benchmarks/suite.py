@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import math
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Mapping
+
+import numpy as np
+import pandas as pd
+
+from ..analytics.optimizer import (
+    _metrics,
+    _select_training_returns,
+    _weight_sharpe,
+    build_yearly_portfolios,
+)
+from ..common.config import (
+    LOOKBACK_DAYS,
+    MAX_WEIGHT,
+    MIN_TRAINING_OBSERVATIONS,
+    PRICE_STORE_FORMAT,
+    SOLVER,
+    TIMEZONE,
+)
+from ..data_io.price_matrix import align_closes
+from ..data_io.price_store import load_frames, save_frames
+from ..data_io.yaml_store import CACHE_DIRNAME
+from ..reporting.yaml_reporter import write_reports
+from .synthetic import evaluation_years, synthetic_names, synthetic_universe
+
+OPERATIONS = (
+    "save_frames",
+    "load_frames",
+    "load_frames_warm",
+    "select_training_returns",
+    "weight_sharpe",
+    "metrics",
+    "build_yearly_portfolios",
+    "write_reports",
+)
+
+# これより短い差は計測誤差として回帰に数えない。
+NOISE_FLOOR_SECONDS = 0.005
+
+
+def _timed(
+    function: Callable[[], object], repeat: int, setup: Callable[[], object] | None = None
+) -> tuple[dict[str, object], object]:
+    """`setup`は各回の前に計測の外で呼ぶ。"""
+    seconds = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        value = function()
+        seconds.append(time.perf_counter() - started)
+    return {"best": min(seconds), "median": statistics.median(seconds), "runs": seconds}, value
+
+
+def environment() -> dict[str, object]:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_case(
+    tickers: int,
+    years: int,
+    directory: Path,
+    repeat: int = 3,
+    seed: int = 0,
+    store_format: str = PRICE_STORE_FORMAT,
+    solver: str = SOLVER,
+    executor: str = "serial",
+    jobs: int | None = None,
+) -> dict[str, object]:
+    """1つの大きさの合成宇宙で各処理を`repeat`回ずつ計り、最短と中央値を返す。
+
+    学習窓の選択・重み・評価指標は最後の評価年の1回分を計る。年次構築は
+    結果キャッシュを使わず、全評価年を毎回解く。
+    """
+    frames = synthetic_universe(tickers, years, seed)
+    names = synthetic_names(frames)
+    years_list = evaluation_years(years)
+    timings = {}
+
+    store = directory / "store"
+    store.mkdir(parents=True, exist_ok=True)
+    timings["save_frames"], _ = _timed(lambda: save_frames(frames, store, store_format), repeat)
+    # 2回目以降はYAMLの解析キャッシュを読むだけになるので、毎回消して解析から計る。
+    # キャッシュが効いた読み込みは別の指標として計る。
+    timings["load_frames"], loaded = _timed(
+        lambda: load_frames(list(frames), store),
+        repeat,
+        setup=lambda: shutil.rmtree(store / CACHE_DIRNAME, ignore_errors=True),
+    )
+    timings["load_frames_warm"], _ = _timed(lambda: load_frames(list(frames), store), repeat)
+
+    returns = align_closes(loaded).pct_change(fill_method=None)
+    year_start = pd.Timestamp(year=years_list[-1], month=1, day=1, tz=TIMEZONE)
+    split = int(returns.index.searchsorted(year_start))
+    training = returns.iloc[max(0, split - LOOKBACK_DAYS) : split]
+    timings["select_training_returns"], (selected, _) = _timed(
+        lambda: _select_training_returns(training, MIN_TRAINING_OBSERVATIONS, MAX_WEIGHT), repeat
+    )
+    timings["weight_sharpe"], weights = _timed(
+        lambda: _weight_sharpe(selected, MAX_WEIGHT, solver), repeat
+    )
+    evaluation = returns.iloc[split:].loc[:, selected.columns]
+    timings["metrics"], _ = _timed(lambda: _metrics(evaluation, weights), repeat)
+
+    timings["build_yearly_portfolios"], results = _timed(
+        lambda: build_yearly_portfolios(
+            loaded,
+            years_list,
+            MAX_WEIGHT,
+            LOOKBACK_DAYS,
+            MIN_TRAINING_OBSERVATIONS,
+            lambda year: names,
+            names,
+            solver=solver,
+            executor=executor,
+            jobs=jobs,
+        ),
+        repeat,
+    )
+    timings["write_reports"], _ = _timed(
+        lambda: write_reports(results, directory / "reports", executor, jobs), repeat
+    )
+    return {
+        "tickers": tickers,
+        "years": years,
+        "rows": len(returns),
+        "observations": int(sum(len(frame) for frame in frames.values())),
+        "eligible_assets": selected.shape[1],
+        "timings": timings,
+    }
+
+
+def run_benchmarks(
+    tickers: Iterable[int],
+    years: Iterable[int],
+    repeat: int = 3,
+    seed: int = 0,
+    store_format: str = PRICE_STORE_FORMAT,
+    solver: str = SOLVER,
+    executor: str = "serial",
+    jobs: int | None = None,
+    progress: Callable[[dict], None] | None = None,
+) -> dict[str, object]:
+    """銘柄数と年数の全組み合わせを計り、JSONにできる結果を返す。"""
+    if repeat < 1:
+        raise ValueError("repeat must be at least 1")
+    cases = []
+    for ticker_count in sorted(set(tickers)):
+        for year_count in sorted(set(years)):
+            with tempfile.TemporaryDirectory() as directory:
+                case = run_case(
+                    ticker_count, year_count, Path(directory), repeat, seed,
+                    store_format, solver, executor, jobs,
+                )
+            cases.append(case)
+            if progress is not None:
+                progress(case)
+    return {
+        "environment": environment(),
+        "settings": {
+            "repeat": repeat,
+            "seed": seed,
+            "store_format": store_format,
+            "solver": solver,
+            "executor": executor,
+            "jobs": jobs,
+            "max_weight": MAX_WEIGHT,
+            "lookback_days": LOOKBACK_DAYS,
+            "min_training_observations": MIN_TRAINING_OBSERVATIONS,
+        },
+        "cases": cases,
+        "scaling": scaling(cases),
+    }
+
+
+def _slope(points: list[tuple[float, float]]) -> float:
+    x = np.log([size for size, _ in points])
+    y = np.log([max(seconds, 1e-9) for _, seconds in points])
+    return float(np.polyfit(x, y, 1)[0])
+
+
+def scaling(cases: Iterable[Mapping]) -> list[dict[str, object]]:
+    """処理ごとに、片方の大きさを固定したときの最短時間の両対数の傾きを返す。
+
+    傾き1なら線形、2なら2乗で伸びる。大きさが2通り以上ある軸だけを出す。
+    """
+    cases = list(cases)
+    rows = []
+    for axis, fixed in (("tickers", "years"), ("years", "tickers")):
+        for value in sorted({case[fixed] for case in cases}):
+            group = sorted(
+                (case for case in cases if case[fixed] == value), key=lambda case: case[axis]
+            )
+            if len(group) < 2:
+                continue
+            for operation in OPERATIONS:
+                points = [(case[axis], case["timings"][operation]["best"]) for case in group]
+                rows.append(
+                    {
+                        "operation": operation,
+                        "axis": axis,
+                        fixed: value,
+                        "exponent": _slope(points),
+                    }
+                )
+    return rows
+
+
+def compare(
+    current: Mapping, baseline: Mapping, tolerance: float
+) -> list[dict[str, object]]:
+    """基準と同じ大きさの各処理について最短時間の比を返す。
+
+    比が`1 + tolerance`を超え、差が計測誤差の下限より大きいものを回帰とする。
+    基準にない大きさは比べない。
+    """
+    if tolerance < 0:
+        raise ValueError("tolerance must be non-negative")
+    reference = {(case["tickers"], case["years"]): case for case in baseline["cases"]}
+    rows = []
+    for case in current["cases"]:
+        before = reference.get((case["tickers"], case["years"]))
+        if before is None:
+            continue
+        for operation in OPERATIONS:
+            if operation not in before["timings"]:
+                continue
+            old = before["timings"][operation]["best"]
+            new = case["timings"][operation]["best"]
+            ratio = new / old if old > 0 else math.inf
+            rows.append(
+                {
+                    "operation": operation,
+                    "tickers": case["tickers"],
+                    "years": case["years"],
+                    "baseline": old,
+                    "current": new,
+                    "ratio": ratio,
+                    "regressed": ratio > 1 + tolerance and new - old > NOISE_FLOOR_SECONDS,
+                }
+            )
+    return rows
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from ..common.config import TIMEZONE, TRADING_DAYS, YEARS
+
+SECTORS = 10
+
+
+def _seed(seed: int, tickers: int, years: int) -> np.random.Generator:
+    # 大きさごとに独立した乱数列にし、別の大きさを足しても既存の宇宙を変えない。
+    return np.random.default_rng([seed, tickers, years])
+
+
+def synthetic_tickers(count: int) -> list[str]:
+    return [f"S{position:04d}.T" for position in range(count)]
+
+
+def evaluation_years(years: int, end_year: int = max(YEARS)) -> list[int]:
+    return list(range(end_year - years + 1, end_year + 1))
+
+
+def synthetic_universe(
+    tickers: int,
+    years: int,
+    seed: int = 0,
+    end_year: int = max(YEARS),
+    missing_rate: float = 0.01,
+    listing_fraction: float = 0.1,
+    delisting_fraction: float = 0.02,
+    suspension_fraction: float = 0.05,
+) -> dict[str, pd.DataFrame]:
+    """保存層と同じ列（close・volume）と東京時間9時の日付の合成価格を返す。
+
+    期間は評価年`years`年と、その前の訓練用の1年。リターンは市場・業種の因子と
+    個別ショックから作る。欠損は散発的な1日欠け（`missing_rate`）、数週間の
+    売買停止、期間途中の上場（`listing_fraction`）と上場廃止で再現する。
+    同じ引数なら常に同じ価格になる。
+    """
+    if tickers < 1 or years < 1:
+        raise ValueError("tickers and years must be positive")
+    rng = _seed(seed, tickers, years)
+    first_year = end_year - years
+    index = (
+        pd.bdate_range(f"{first_year}-01-01", f"{end_year}-12-31", tz=TIMEZONE, name="timestamp")
+        + pd.Timedelta(hours=9)
+    ).as_unit("us")
+    rows = len(index)
+
+    market = rng.normal(0.0003, 0.011, rows)
+    sectors = rng.normal(0.0, 0.007, (rows, SECTORS))
+    sector_of = rng.integers(0, SECTORS, tickers)
+    beta = rng.uniform(0.5, 1.5, tickers)
+    drift = rng.normal(0.0, 0.0004, tickers)
+    noise = rng.normal(0.0, 1.0, (rows, tickers)) * rng.uniform(0.008, 0.025, tickers)
+    log_returns = market[:, None] * beta + sectors[:, sector_of] + noise + drift
+    closes = rng.uniform(100.0, 5000.0, tickers) * np.exp(np.cumsum(log_returns, axis=0))
+    volumes = np.round(rng.lognormal(13.0, 1.0, (rows, tickers)), -2)
+
+    present = rng.random((rows, tickers)) >= missing_rate
+    for column in np.flatnonzero(rng.random(tickers) < suspension_fraction):
+        start = int(rng.integers(0, rows))
+        present[start : start + int(rng.integers(5, 40)), column] = False
+    # 上場と廃止は最初の1年より後に置き、途中から・途中までの系列を作る。
+    # 上場から廃止までは最低1年（期間末で打ち切り）残す。
+    listed = np.zeros(tickers, dtype=int)
+    delisted = np.full(tickers, rows, dtype=int)
+    late = rng.random(tickers) < listing_fraction
+    listed[late] = rng.integers(TRADING_DAYS, rows - 21, int(late.sum()))
+    gone = rng.random(tickers) < delisting_fraction
+    delisted[gone] = rng.integers(TRADING_DAYS, rows, int(gone.sum()))
+    delisted = np.maximum(delisted, np.minimum(listed + TRADING_DAYS, rows))
+
+    frames = {}
+    for column, ticker in enumerate(synthetic_tickers(tickers)):
+        keep = present[:, column].copy()
+        keep[: listed[column]] = False
+        keep[delisted[column] :] = False
+        keep[listed[column]] = True
+        frames[ticker] = pd.DataFrame(
+            {"close": closes[keep, column], "volume": volumes[keep, column]},
+            index=index[keep],
+        )
+    return frames
+
+
+def synthetic_names(frames) -> dict[str, str]:
+    return {ticker: f"Synthetic {ticker[:-2]}" for ticker in frames}
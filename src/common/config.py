@@ -2,7 +2,15 @@ from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parents[2]
 DATA_RAW = BASE_DIR / "data" / "raw"
+PRICE_MATRIX_DIR = BASE_DIR / "data" / "matrix"
+RESULT_CACHE_DIR = BASE_DIR / "data" / "cache" / "results"
+PIPELINE_MANIFEST_FILE = BASE_DIR / "data" / "cache" / "pipeline" / "manifest.json"
+PIPELINE_RESULTS_FILE = BASE_DIR / "data" / "cache" / "pipeline" / "portfolios.json"
 REPORT_DIR = BASE_DIR / "reports" / "portfolio"
+SWEEP_REPORT_FILE = BASE_DIR / "reports" / "sweep" / "parameter_sweep.csv"
+RUN_PROFILE_FILE = BASE_DIR / "reports" / "profile" / "run_profile.json"
+BENCHMARK_REPORT_FILE = BASE_DIR / "reports" / "benchmark" / "results.json"
+BENCHMARK_BASELINE_FILE = BASE_DIR / "reports" / "benchmark" / "baseline.json"
 REFERENCE_DIR = BASE_DIR / "data" / "reference"
 TICKER_NAMES_FILE = REFERENCE_DIR / "ticker_names.yaml"
 UNIVERSE_SNAPSHOTS_FILE = REFERENCE_DIR / "nikkei225_memberships.yaml"
@@ -17,3 +25,23 @@ MAX_WEIGHT = 0.2
 TRADING_DAYS = 252
 LOOKBACK_DAYS = 252
 MIN_TRAINING_OBSERVATIONS = 120
+SOLVER = "qp"
+REBALANCE_FREQUENCY = "annual"
+PORTFOLIO_EXECUTOR = "processes"
+PORTFOLIO_JOBS = None
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+ROBUSTNESS_RESAMPLES = 10000
+ROBUSTNESS_BLOCK_LENGTH = 21
+ROBUSTNESS_CONFIDENCE = 0.95
+ROBUSTNESS_SEED = 225
+TRANSACTION_COST_BPS = 10.0
+BENCHMARK_TICKERS = (50, 500, 3000)
+BENCHMARK_YEARS = (1, 10, 30)
+BENCHMARK_REPEAT = 3
+BENCHMARK_TOLERANCE = 0.25
+PRICE_STORE_FORMAT = "yaml"
+INGESTION_BATCH_SIZE = 20
+INGESTION_WORKERS = 4
+INGESTION_RETRIES = 3
+INGESTION_BACKOFF_SECONDS = 1.0
+INGESTION_RATE_PER_SECOND = 2.0
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import datetime as dt
+from bisect import bisect_right
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Iterable, Mapping
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class MembershipStore:
+    """スナップショットを銘柄ごとの[採用日, 除外日)区間として保持する。
+
+    ある日の構成銘柄と、ある銘柄がある日に構成銘柄だったかを二分探索で
+    答える。返すマッピングは読み取り専用で、呼び出し間で共有される。
+    """
+
+    def __init__(self, snapshots: Mapping[dt.date, Mapping[str, str]]) -> None:
+        if not snapshots:
+            raise ValueError("membership store requires at least one snapshot")
+        self.dates: list[dt.date] = sorted(snapshots)
+        self._views = [
+            MappingProxyType(dict(snapshots[date])) for date in self.dates
+        ]
+        self.intervals: dict[str, list[tuple[dt.date, dt.date | None]]] = {}
+        opened: dict[str, dt.date] = {}
+        for date, members in zip(self.dates, self._views):
+            for ticker in [ticker for ticker in opened if ticker not in members]:
+                self.intervals.setdefault(ticker, []).append((opened.pop(ticker), date))
+            for ticker in members:
+                opened.setdefault(ticker, date)
+        for ticker, joined in opened.items():
+            self.intervals.setdefault(ticker, []).append((joined, None))
+        self._joins = {
+            ticker: [joined for joined, _ in spans]
+            for ticker, spans in self.intervals.items()
+        }
+
+    def _position(self, target: dt.date) -> int:
+        position = bisect_right(self.dates, target) - 1
+        if position < 0:
+            raise ValueError(
+                f"no universe snapshot on or before {target.isoformat()}; "
+                f"earliest available snapshot is {self.dates[0].isoformat()}"
+            )
+        return position
+
+    def snapshot_date(self, target: dt.date) -> dt.date:
+        return self.dates[self._position(target)]
+
+    def members_on(self, target: dt.date) -> Mapping[str, str]:
+        return self._views[self._position(target)]
+
+    def is_member(self, ticker: str, target: dt.date) -> bool:
+        self._position(target)
+        joins = self._joins.get(ticker)
+        if not joins:
+            return False
+        position = bisect_right(joins, target) - 1
+        if position < 0:
+            return False
+        left = self.intervals[ticker][position][1]
+        return left is None or target < left
+
+    def mask(self, index: pd.DatetimeIndex, tickers: Iterable[str]) -> pd.DataFrame:
+        """価格カレンダーに揃えた日付×銘柄の構成銘柄ブール行列を作る。
+
+        各行はその取引日（インデックスのタイムゾーンでの日付）時点の構成を表す。
+        最初のスナップショットより前の行はすべて偽になる。
+        """
+        # 出典検証CIはPyYAMLだけで動くため、numpy/pandasはここで読み込む。
+        import numpy as np
+        import pandas as pd
+
+        tickers = list(tickers)
+        index = pd.DatetimeIndex(index)
+        local = index.tz_localize(None) if index.tz is not None else index
+        days = local.normalize().to_numpy(dtype="datetime64[D]")
+        values = np.zeros((len(days), len(tickers)), dtype=bool)
+        for column, ticker in enumerate(tickers):
+            for joined, left in self.intervals.get(ticker, ()):
+                first = np.searchsorted(days, np.datetime64(joined, "D"), side="left")
+                last = (
+                    len(days)
+                    if left is None
+                    else np.searchsorted(days, np.datetime64(left, "D"), side="left")
+                )
+                values[first:last, column] = True
+        return pd.DataFrame(values, index=index, columns=tickers)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Iterable, TypeVar
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+
+EXECUTORS = ("serial", "threads", "processes")
+
+_Item = TypeVar("_Item")
+_Result = TypeVar("_Result")
+
+# ワーカープロセス内で接続済みの共有メモリと、それを参照するSharedFrameの数。
+# 同じブロックへの再接続を避け、参照がなくなれば閉じて外す。
+_ATTACHED: dict[str, list] = {}
+
+
+def _attach(name: str) -> SharedMemory:
+    entry = _ATTACHED.get(name)
+    if entry is None:
+        entry = _ATTACHED[name] = [SharedMemory(name=name), 0]
+    entry[1] += 1
+    return entry[0]
+
+
+def _detach(name: str) -> None:
+    entry = _ATTACHED[name]
+    entry[1] -= 1
+    if entry[1] == 0:
+        del _ATTACHED[name]
+        entry[0].close()
+
+
+def resolve_jobs(jobs: int | None) -> int:
+    if jobs is None:
+        return os.cpu_count() or 1
+    if jobs < 1:
+        raise ValueError("jobs must be at least 1")
+    return int(jobs)
+
+
+def parallel_map(
+    function: Callable[[_Item], _Result],
+    items: Iterable[_Item],
+    jobs: int | None = None,
+    executor: str = "processes",
+) -> list[_Result]:
+    """入力順を保ったまま`function`を適用する。
+
+    1件以下、`jobs=1`、`executor="serial"`のときはプールを作らない。
+    計測中のプロセス実行では、各ワーカーの計測値を呼び出し側へ合算する。
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"unknown executor: {executor!r}")
+    items = list(items)
+    workers = min(resolve_jobs(jobs), len(items))
+    if executor == "serial" or workers <= 1:
+        return [function(item) for item in items]
+    profile = profiling.active()
+    if executor == "threads" or profile is None:
+        pool = ProcessPoolExecutor if executor == "processes" else ThreadPoolExecutor
+        with pool(max_workers=workers) as executor_pool:
+            return list(executor_pool.map(function, items))
+    with ProcessPoolExecutor(max_workers=workers) as executor_pool:
+        measured = list(
+            executor_pool.map(partial(profiling.call_profiled, function), items)
+        )
+    for _, snapshot in measured:
+        profile.merge(snapshot)
+    return [result for result, _ in measured]
+
+
+class SharedFrame:
+    """単一dtypeのDataFrameを共有メモリへ一度だけ複製する。
+
+    pickleされるのは共有メモリ名と形状、インデックス、列名だけで、値は
+    各ワーカーが同じブロックを読み取り専用で参照する。作成側は`with`を
+    抜けるときにブロックを解放する。ワーカー側の接続は、復元したSharedFrameと
+    `frame`の返した値がすべて不要になった時点で閉じる。
+    """
+
+    def __init__(self, frame: pd.DataFrame) -> None:
+        values = np.ascontiguousarray(frame.to_numpy())
+        self._memory = SharedMemory(create=True, size=max(values.nbytes, 1))
+        self._owner = True
+        self.name = self._memory.name
+        self.shape = values.shape
+        self.dtype = values.dtype.str
+        self.index = frame.index
+        self.columns = frame.columns
+        np.ndarray(self.shape, self.dtype, buffer=self._memory.buf)[...] = values
+
+    def __getstate__(self) -> dict:
+        return {
+            "name": self.name,
+            "shape": self.shape,
+            "dtype": self.dtype,
+            "index": self.index,
+            "columns": self.columns,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._memory = _attach(self.name)
+        self._owner = False
+        weakref.finalize(self, _detach, self.name)
+
+    @property
+    def __array_interface__(self) -> dict:
+        # 値の基底をこのオブジェクトにし、値が残る間は接続を閉じさせない。
+        address = np.frombuffer(self._memory.buf, dtype=np.uint8).ctypes.data
+        return {"shape": self.shape, "typestr": self.dtype, "data": (address, True), "version": 3}
+
+    def frame(self) -> pd.DataFrame:
+        if self._owner:
+            values = np.ndarray(self.shape, self.dtype, buffer=self._memory.buf)
+            values.flags.writeable = False
+        else:
+            values = np.asarray(self)
+        return pd.DataFrame(values, index=self.index, columns=self.columns, copy=False)
+
+    def close(self) -> None:
+        if self._owner:
+            self._memory.close()
+            self._memory.unlink()
+            self._owner = False
+
+    def __enter__(self) -> "SharedFrame":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
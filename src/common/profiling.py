@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import functools
+import io
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Mapping
+
+from ..data_io.atomic import atomic_output
+
+CAPTURES = ("cprofile", "tracemalloc")
+
+# 計測中だけ設定する。Noneの間、計測点は分岐1回だけで素通りする。
+_ACTIVE: Profile | None = None
+
+
+class Profile:
+    """区間ごとの呼び出し回数・経過秒と、名前付きカウンタの合計を持つ。"""
+
+    def __init__(self) -> None:
+        self.timings: dict[str, dict[str, float]] = {}
+        self.counters: dict[str, dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add_time(self, name: str, seconds: float, calls: int = 1) -> None:
+        with self._lock:
+            entry = self.timings.setdefault(name, {"calls": 0, "seconds": 0.0})
+            entry["calls"] += calls
+            entry["seconds"] += seconds
+
+    def add_counts(self, name: str, **values: float) -> None:
+        with self._lock:
+            entry = self.counters.setdefault(name, {})
+            for field, value in values.items():
+                entry[field] = entry.get(field, 0) + value
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                "timings": {name: dict(entry) for name, entry in self.timings.items()},
+                "counters": {name: dict(entry) for name, entry in self.counters.items()},
+            }
+
+    def merge(self, snapshot: Mapping[str, Mapping]) -> None:
+        for name, entry in snapshot["timings"].items():
+            self.add_time(name, entry["seconds"], entry["calls"])
+        for name, entry in snapshot["counters"].items():
+            self.add_counts(name, **entry)
+
+
+def active() -> Profile | None:
+    return _ACTIVE
+
+
+def profiled(name: str) -> Callable[[Callable], Callable]:
+    """関数の呼び出し回数と経過秒を`name`で記録するデコレータ。"""
+
+    def decorate(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profile = _ACTIVE
+            if profile is None:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profile.add_time(name, time.perf_counter() - started)
+
+        return wrapper
+
+    return decorate
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    profile = _ACTIVE
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_time(name, time.perf_counter() - started)
+
+
+def count(name: str, **values: float) -> None:
+    if _ACTIVE is not None:
+        _ACTIVE.add_counts(name, **values)
+
+
+def call_profiled(function: Callable, item):
+    """ワーカープロセスで`function(item)`を計測し、(結果, 計測値)を返す。"""
+    global _ACTIVE
+    previous, _ACTIVE = _ACTIVE, Profile()
+    try:
+        return function(item), _ACTIVE.snapshot()
+    finally:
+        _ACTIVE = previous
+
+
+def peak_rss() -> dict[str, int | None]:
+    """このプロセスと終了済み子プロセスの最大常駐メモリ（バイト）。"""
+    try:
+        import resource
+    except ImportError:
+        return {"self": None, "children": None}
+    # Linuxはキロバイト、macOSはバイトで返す。
+    unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit,
+    }
+
+
+class Session:
+    def __init__(self, profile: Profile, capture: str | None) -> None:
+        self.profile = profile
+        self.capture = capture
+        self.seconds = 0.0
+        self.details: dict[str, object] = {}
+        self.cprofile = None
+
+
+@contextmanager
+def session(capture: str | None = None) -> Iterator[Session]:
+    """計測を有効にする。`capture`でcProfileかtracemallocの詳細採取も行う。
+
+    詳細採取は計測対象を大きく遅くするので、明示したときだけ使う。
+    """
+    global _ACTIVE
+    if capture is not None and capture not in CAPTURES:
+        raise ValueError(f"unknown profile capture: {capture!r}")
+    current = Session(Profile(), capture)
+    previous, _ACTIVE = _ACTIVE, current.profile
+    started = time.perf_counter()
+    if capture == "cprofile":
+        import cProfile
+
+        current.cprofile = cProfile.Profile()
+        current.cprofile.enable()
+    elif capture == "tracemalloc":
+        import tracemalloc
+
+        tracemalloc.start(25)
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - started
+        if capture == "cprofile":
+            current.cprofile.disable()
+            current.details = _cprofile_details(current.cprofile)
+        elif capture == "tracemalloc":
+            current.details = _tracemalloc_details()
+        _ACTIVE = previous
+
+
+def _cprofile_details(profiler, limit: int = 30) -> dict[str, object]:
+    import pstats
+
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, function), (calls, _, own, cumulative, _) in stats.stats.items():
+        rows.append(
+            {
+                "function": f"{filename}:{line}({function})",
+                "calls": calls,
+                "own_seconds": own,
+                "cumulative_seconds": cumulative,
+            }
+        )
+    rows.sort(key=lambda row: row["cumulative_seconds"], reverse=True)
+    return {"capture": "cprofile", "top_cumulative": rows[:limit]}
+
+
+def _tracemalloc_details(limit: int = 30) -> dict[str, object]:
+    import tracemalloc
+
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    top = snapshot.statistics("lineno")[:limit]
+    return {
+        "capture": "tracemalloc",
+        "traced_current_bytes": current,
+        "traced_peak_bytes": peak,
+        "top_allocations": [
+            {"location": str(stat.traceback[0]), "bytes": stat.size, "blocks": stat.count}
+            for stat in top
+        ],
+    }
+
+
+def write_run_profile(
+    current: Session, path: Path, extra: Mapping[str, object] | None = None
+) -> dict[str, object]:
+    """計測結果を機械可読なJSONで書き、cProfileの生データは隣の`.prof`へ残す。"""
+    payload = {
+        "wall_seconds": current.seconds,
+        **current.profile.snapshot(),
+        "peak_rss_bytes": peak_rss(),
+        **(dict(extra) if extra else {}),
+    }
+    if current.details:
+        payload["capture"] = current.details
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_output(path, mode="w", encoding="utf-8") as stream:
+        json.dump(payload, stream, indent=1, sort_keys=True, default=str)
+    if current.cprofile is not None:
+        current.cprofile.dump_stats(str(path.with_suffix(".prof")))
+    return payload
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Callable, Iterable, Mapping
+
+from ..data_io.atomic import atomic_output
+from .profiling import timed
+
+
+def fingerprint(value) -> str:
+    """JSONにできる値（キー順は問わない）のSHA-256を返す。"""
+    text = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_digests(
+    paths: Iterable[Path], previous: Mapping[str, Mapping] | None = None
+) -> dict[str, dict]:
+    """ファイル名ごとのサイズ・更新時刻・SHA-256を返す。
+
+    サイズと更新時刻が`previous`（前回の戻り値）と同じファイルは読み直さない。
+    """
+    previous = previous or {}
+    digests = {}
+    for path in sorted(paths):
+        stat = path.stat()
+        known = previous.get(path.name)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            digests[path.name] = dict(known)
+            continue
+        digests[path.name] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": hashlib.sha256(path.read_bytes()).hexdigest(),
+        }
+    return digests
+
+
+class Stage:
+    """パイプラインの1段。
+
+    `run`は`depends`の各段の値を順に受け取り、この段の値を返す。`inputs`は
+    設定値など上流以外の入力、`complete`は成果物が揃っているか、`load`は
+    飛ばした段の値を下流が必要としたときに成果物から読み直す関数。
+
+    `outputs`を渡すと、成果物そのものから出力の指紋を作る。前回の記録を受け取り、
+    (指紋にする内容, 次回へ渡す記録)を返す。渡さなければ入力の指紋をそのまま使う。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[..., object],
+        depends: tuple[str, ...] = (),
+        inputs: Callable[[], object] | None = None,
+        complete: Callable[[], bool] | None = None,
+        load: Callable[[], object] | None = None,
+        outputs: Callable[[object], tuple[object, object]] | None = None,
+    ) -> None:
+        self.name = name
+        self.run = run
+        self.depends = depends
+        self.inputs = inputs or (lambda: None)
+        self.complete = complete or (lambda: True)
+        self.load = load
+        self.outputs = outputs
+
+
+class StageGraph:
+    """段を追加順（上流が先）に実行し、入力の指紋が前回と同じ段を飛ばす。
+
+    段の指紋は自身の入力と上流の出力の指紋から作り、`manifest`（JSON）へ
+    段ごとに書き足す。値はメモリ上で下流へ渡し、飛ばした段の値は下流が
+    実際に走るときだけ`load`で読む。
+    """
+
+    def __init__(self, manifest: Path) -> None:
+        self.manifest = manifest
+        try:
+            self.records: dict[str, dict] = json.loads(manifest.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.records = {}
+        self.stages: dict[str, Stage] = {}
+        self._values: dict[str, object] = {}
+
+    def add(self, stage: Stage) -> None:
+        missing = [name for name in stage.depends if name not in self.stages]
+        if missing:
+            raise ValueError(f"{stage.name}: unknown upstream stages {missing}")
+        if stage.name in self.stages:
+            raise ValueError(f"duplicate stage: {stage.name}")
+        self.stages[stage.name] = stage
+
+    def value(self, name: str):
+        if name not in self._values:
+            stage = self.stages[name]
+            if stage.load is None:
+                raise RuntimeError(f"{name}: skipped stage has no loader")
+            self._values[name] = stage.load()
+        return self._values[name]
+
+    def _save(self) -> None:
+        self.manifest.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_output(self.manifest, mode="w", encoding="utf-8") as stream:
+            json.dump(self.records, stream, indent=1, sort_keys=True)
+
+    def run(self, force: Iterable[str] = ()) -> dict[str, str]:
+        """全段を評価し、段名から"ran"または"skipped"への対応を返す。"""
+        force = set(force)
+        unknown = force - set(self.stages)
+        if unknown:
+            raise ValueError(f"unknown stages: {sorted(unknown)}")
+        statuses = {}
+        for name, stage in self.stages.items():
+            with timed(f"stage.{name}"):
+                statuses[name] = self._run_stage(name, stage, name in force)
+        return statuses
+
+    def _run_stage(self, name: str, stage: Stage, forced: bool) -> str:
+        previous = self.records.get(name, {})
+        key = fingerprint(
+            {
+                "inputs": stage.inputs(),
+                "upstream": {
+                    upstream: self.records[upstream]["output"]
+                    for upstream in stage.depends
+                },
+            }
+        )
+        if not forced and previous.get("fingerprint") == key and stage.complete():
+            status = "skipped"
+        else:
+            # 途中で失敗した段の成果物を、次回に完成品と取り違えないようにする。
+            self.records.pop(name, None)
+            self._save()
+            self._values[name] = stage.run(
+                *(self.value(upstream) for upstream in stage.depends)
+            )
+            status = "ran"
+        output, memo = key, None
+        if stage.outputs is not None:
+            content, memo = stage.outputs(previous.get("outputs"))
+            output = fingerprint(content)
+        self.records[name] = {"fingerprint": key, "output": output, "outputs": memo}
+        self._save()
+        return status
@@ -2,7 +2,6 @@ from __future__ import annotations
 
 import datetime as dt
 import re
-from functools import lru_cache
 from typing import Dict, Iterable, Mapping, MutableMapping
 
 import yaml
@@ -12,6 +11,7 @@ from .config import (
     UNIVERSE_PROVENANCE_FILE,
     UNIVERSE_SNAPSHOTS_FILE,
 )
+from .membership import MembershipStore
 
 _SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
 
@@ -39,8 +39,8 @@ def _load_yaml_mapping(path, label: str) -> dict:
     return raw
 
 
-def _load_snapshots() -> MutableMapping[dt.date, Dict[str, str]]:
-    raw = _load_yaml_mapping(UNIVERSE_SNAPSHOTS_FILE, "universe snapshot")
+def _load_snapshots(path=UNIVERSE_SNAPSHOTS_FILE) -> MutableMapping[dt.date, Dict[str, str]]:
+    raw = _load_yaml_mapping(path, "universe snapshot")
     if not raw:
         raise ValueError("Nikkei 225 membership snapshot file is empty")
 
@@ -55,8 +55,8 @@ def _load_snapshots() -> MutableMapping[dt.date, Dict[str, str]]:
     return snapshots
 
 
-def _load_provenance() -> dict:
-    return _load_yaml_mapping(UNIVERSE_PROVENANCE_FILE, "universe provenance")
+def _load_provenance(path=UNIVERSE_PROVENANCE_FILE) -> dict:
+    return _load_yaml_mapping(path, "universe provenance")
 
 
 def _validate_provenance(
@@ -119,37 +119,82 @@ def _validate_provenance(
     return errors
 
 
-_SNAPSHOTS = _load_snapshots()
-_PROVENANCE = _load_provenance()
-_PROVENANCE_ERRORS = _validate_provenance(_SNAPSHOTS, _PROVENANCE)
-_SNAPSHOT_DATES = sorted(_SNAPSHOTS)
+class _UniverseDataset:
+    """構成銘柄スナップショットと出典情報を一度だけ読み、検証結果と共に保持する。"""
+
+    def __init__(self, snapshots_file, provenance_file) -> None:
+        self.snapshots = _load_snapshots(snapshots_file)
+        self.provenance = _load_provenance(provenance_file)
+        self.errors = _validate_provenance(self.snapshots, self.provenance)
+        self.dates = sorted(self.snapshots)
+        self.membership = MembershipStore(self.snapshots)
+
+
+_FILES = {
+    "snapshots": UNIVERSE_SNAPSHOTS_FILE,
+    "provenance": UNIVERSE_PROVENANCE_FILE,
+}
+_DATASET: _UniverseDataset | None = None
+
+
+def _dataset() -> _UniverseDataset:
+    # importだけではファイルを読まない。最初の参照時に読み込んでキャッシュする。
+    global _DATASET
+    if _DATASET is None:
+        _DATASET = _UniverseDataset(_FILES["snapshots"], _FILES["provenance"])
+    return _DATASET
+
+
+def reload_universe(snapshots_file=None, provenance_file=None) -> None:
+    """キャッシュを捨て、次の参照時に読み直す。
+
+    パスを渡すとそのファイルへ切り替える（テスト用の小さなデータセットなど）。
+    両方省略すると設定ファイルのパスへ戻す。
+    """
+    global _DATASET
+    if snapshots_file is None and provenance_file is None:
+        _FILES["snapshots"] = UNIVERSE_SNAPSHOTS_FILE
+        _FILES["provenance"] = UNIVERSE_PROVENANCE_FILE
+    if snapshots_file is not None:
+        _FILES["snapshots"] = snapshots_file
+    if provenance_file is not None:
+        _FILES["provenance"] = provenance_file
+    _DATASET = None
+
+
+def provenance_errors() -> list[str]:
+    return list(_dataset().errors)
 
 
 def assert_verified_universe() -> None:
     """未検証または出典不明の構成銘柄表を分析へ渡さない。"""
-    if _PROVENANCE_ERRORS:
-        details = "; ".join(_PROVENANCE_ERRORS)
+    errors = _dataset().errors
+    if errors:
+        details = "; ".join(errors)
         raise RuntimeError(
             "historical Nikkei 225 universe is quarantined because its "
             f"provenance is not verified: {details}"
         )
 
 
-@lru_cache(maxsize=None)
-def universe_for_date(as_of) -> Dict[str, str]:
+def universe_for_date(as_of) -> Mapping[str, str]:
+    """as_of以前で最新のスナップショットを読み取り専用の共有ビューで返す。"""
     assert_verified_universe()
-    target = _to_date(as_of)
-    eligible_dates = [date for date in _SNAPSHOT_DATES if date <= target]
-    if not eligible_dates:
-        first = _SNAPSHOT_DATES[0].isoformat()
-        raise ValueError(
-            f"no universe snapshot on or before {target.isoformat()}; "
-            f"earliest available snapshot is {first}"
-        )
-    return dict(_SNAPSHOTS[eligible_dates[-1]])
+    return _dataset().membership.members_on(_to_date(as_of))
+
+
+def is_member(ticker: str, as_of) -> bool:
+    assert_verified_universe()
+    return _dataset().membership.is_member(ticker, _to_date(as_of))
+
+
+def membership_mask(index, tickers) -> "pd.DataFrame":
+    """`MembershipStore.mask`の検証済みデータセット版。"""
+    assert_verified_universe()
+    return _dataset().membership.mask(index, tickers)
 
 
-def universe_for_year(year: int) -> Dict[str, str]:
+def universe_for_year(year: int) -> Mapping[str, str]:
     return universe_for_date(dt.date(int(year), 1, 1))
 
 
@@ -159,24 +204,38 @@ def tickers_for_year(year: int) -> Iterable[str]:
 
 def all_tickers() -> list[str]:
     assert_verified_universe()
-    return sorted({ticker for members in _SNAPSHOTS.values() for ticker in members})
+    snapshots = _dataset().snapshots
+    return sorted({ticker for members in snapshots.values() for ticker in members})
 
 
-ALL_TICKERS = all_tickers() if not _PROVENANCE_ERRORS else []
-TICKER_NAMES: Dict[str, str] = (
-    {
+def ticker_names() -> Dict[str, str]:
+    assert_verified_universe()
+    return {
         ticker: name
-        for members in _SNAPSHOTS.values()
+        for members in _dataset().snapshots.values()
         for ticker, name in members.items()
     }
-    if not _PROVENANCE_ERRORS
-    else {}
-)
 
 
 def union_names() -> Mapping[str, str]:
-    assert_verified_universe()
-    return dict(TICKER_NAMES)
+    return ticker_names()
+
+
+_LAZY_ATTRIBUTES = {
+    "ALL_TICKERS": lambda: all_tickers() if not _dataset().errors else [],
+    "TICKER_NAMES": lambda: ticker_names() if not _dataset().errors else {},
+    "_SNAPSHOTS": lambda: _dataset().snapshots,
+    "_PROVENANCE": lambda: _dataset().provenance,
+    "_PROVENANCE_ERRORS": lambda: _dataset().errors,
+    "_SNAPSHOT_DATES": lambda: _dataset().dates,
+}
+
+
+def __getattr__(name: str):
+    # 旧来のモジュール定数は参照時に計算する（import時のファイルI/Oを避ける）。
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def load_names() -> Dict[str, str]:
@@ -2,15 +2,15 @@ import matplotlib.pyplot as plt
 def apply_design_system():
     """Human-Centric & Borderless Design System (Digital Agency x Serendie)"""
     plt.rcParams.update({
-        'axes.facecolor': '
-        'figure.facecolor': '
-        'axes.edgecolor': '
-        'text.color': '
-        'axes.labelcolor': '
-        'xtick.color': '
-        'ytick.color': '
-        'grid.color': '
+        'axes.facecolor': '#FFFFFF',
+        'figure.facecolor': '#FFFFFF',
+        'axes.edgecolor': '#DDDDDD',
+        'text.color': '#1A1A1A',
+        'axes.labelcolor': '#1A1A1A',
+        'xtick.color': '#333333',
+        'ytick.color': '#333333',
+        'grid.color': '#CCCCCC',
         'grid.alpha': 0.1,
         'font.family': 'sans-serif',
     })
-    plt.rcParams['axes.prop_cycle'] = plt.cycler(color=['
+    plt.rcParams['axes.prop_cycle'] = plt.cycler(color=['#0017C1', '#00A3BF', '#E25100', '#259D63', '#8843F8', '#D2000F'])
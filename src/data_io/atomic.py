@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+# mkstempは0600で作るので、置き換え前にopen()で作った場合と同じ権限へ戻す。
+# umaskは読むと書き換わるため、スレッドから呼ばれる前の読み込み時に1回だけ読む。
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextmanager
+def atomic_output(path: Path, mode: str = "wb", encoding: str | None = None):
+    """同じディレクトリの一時ファイルへ書き、成功時だけrenameで置き換える。"""
+    handle, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(handle, mode, encoding=encoding) as stream:
+            yield stream
+        os.chmod(temporary, 0o666 & ~_UMASK)
+        os.replace(temporary, path)
+    except BaseException:
+        Path(temporary).unlink(missing_ok=True)
+        raise
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import datetime as dt
+from pathlib import Path
+from typing import Iterable, Mapping
+
+import numpy as np
+import pandas as pd
+
+from .atomic import atomic_output
+
+SUFFIX = ".npz"
+COLUMNS = ("close", "volume")
+
+
+def _timezone_text(tz) -> str:
+    if tz is None:
+        return ""
+    if isinstance(tz, dt.timezone):
+        offset = int(tz.utcoffset(None).total_seconds())
+        sign = "-" if offset < 0 else "+"
+        hours, minutes = divmod(abs(offset) // 60, 60)
+        return f"{sign}{hours:02d}:{minutes:02d}"
+    return str(tz)
+
+
+def _timezone_from_text(text: str):
+    if not text:
+        return None
+    if text[0] in "+-":
+        hours, minutes = text[1:].split(":")
+        offset = dt.timedelta(hours=int(hours), minutes=int(minutes))
+        return dt.timezone(-offset if text[0] == "-" else offset)
+    return text
+
+
+def localize_bound(value, tz):
+    """範囲指定の日時を保存済みインデックスと比較できる形へそろえる。"""
+    if value is None:
+        return None
+    bound = pd.Timestamp(value)
+    if tz is not None and bound.tz is None:
+        return bound.tz_localize(tz)
+    if tz is None and bound.tz is not None:
+        return bound.tz_localize(None)
+    return bound
+
+
+def restrict(frame: pd.DataFrame, start=None, end=None, columns=None) -> pd.DataFrame:
+    tz = getattr(frame.index, "tz", None)
+    start, end = localize_bound(start, tz), localize_bound(end, tz)
+    if start is not None:
+        frame = frame.loc[frame.index >= start]
+    if end is not None:
+        frame = frame.loc[frame.index <= end]
+    if columns is not None:
+        frame = frame.loc[:, list(columns)]
+    return frame
+
+
+def path_for(ticker: str, directory: Path) -> Path:
+    return directory / f"{ticker}{SUFFIX}"
+
+
+def write_frame(frame: pd.DataFrame, path: Path) -> None:
+    """型付き列としてnpzへ書き、途中状態のファイルを残さない。"""
+
+    index = pd.DatetimeIndex(frame.index)
+    arrays = {
+        "timestamp": index.asi8.astype(np.int64, copy=False),
+        "timestamp_unit": np.array(index.unit),
+        "timezone": np.array(_timezone_text(index.tz)),
+    }
+    for column in COLUMNS:
+        arrays[column] = frame[column].to_numpy(dtype=np.float64)
+
+    with atomic_output(path) as stream:
+        np.savez(stream, **arrays)
+
+
+def read_frame(path: Path, start=None, end=None, columns=None) -> pd.DataFrame:
+    """必要な列と期間だけを読み出す。npzの各列は参照時にのみ展開される。"""
+    columns = COLUMNS if columns is None else tuple(columns)
+    unknown = [column for column in columns if column not in COLUMNS]
+    if unknown:
+        raise ValueError(f"unknown price columns: {', '.join(unknown)}")
+    with np.load(path, allow_pickle=False) as archive:
+        unit = str(archive["timestamp_unit"])
+        timezone = _timezone_from_text(str(archive["timezone"]))
+        stamps = archive["timestamp"]
+        rows = slice(
+            0 if start is None else _position(stamps, start, unit, timezone, "left"),
+            None if end is None else _position(stamps, end, unit, timezone, "right"),
+        )
+        stamps = stamps[rows]
+        data = {column: archive[column][rows].copy() for column in columns}
+    index = pd.to_datetime(stamps, unit=unit, utc=True)
+    index = index.tz_convert(timezone) if timezone else index.tz_localize(None)
+    return pd.DataFrame(data, index=index.rename("timestamp"), columns=list(columns))
+
+
+def _position(stamps: np.ndarray, value, unit: str, timezone, side: str) -> int:
+    bound = localize_bound(value, timezone or None)
+    if bound.tz is None:
+        bound = bound.tz_localize("UTC")
+    epoch = np.datetime64(bound.tz_convert("UTC").tz_localize(None), unit).astype(np.int64)
+    return int(np.searchsorted(stamps, epoch, side=side))
+
+
+def save_frames(frames: Mapping[str, pd.DataFrame], directory: Path) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    for ticker, frame in frames.items():
+        write_frame(frame.sort_index(), path_for(ticker, directory))
+
+
+def load_frames(
+    tickers: Iterable[str],
+    directory: Path,
+    start=None,
+    end=None,
+    columns: Iterable[str] | None = None,
+) -> dict[str, pd.DataFrame]:
+    return {
+        ticker: read_frame(path_for(ticker, directory), start, end, columns)
+        for ticker in tickers
+    }
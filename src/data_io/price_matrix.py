@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterable, Mapping
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from ..common.profiling import profiled
+from .atomic import atomic_output
+from .columnar_store import _timezone_from_text, _timezone_text, localize_bound
+
+_META_FILE = "meta.yaml"
+_FIELDS = ("closes", "returns")
+
+
+def align_closes(frames: Mapping[str, pd.DataFrame]) -> pd.DataFrame:
+    """銘柄ごとの終値を共通の取引カレンダーへ外部結合する。"""
+    return pd.DataFrame(
+        {
+            ticker: frame["close"]
+            for ticker, frame in frames.items()
+            if "close" in frame.columns and not frame.empty
+        }
+    ).sort_index()
+
+
+def _save_array(array: np.ndarray, path: Path) -> None:
+    with atomic_output(path) as stream:
+        np.save(stream, np.ascontiguousarray(array))
+
+
+class PriceMatrix:
+    """日付×銘柄の終値・リターン行列をメモリマップで読む。
+
+    行は日付順に連続しているため、期間の切り出しはコピーを伴わない。
+    """
+
+    def __init__(self, directory: Path) -> None:
+        meta = yaml.safe_load((directory / _META_FILE).read_text(encoding="utf-8"))
+        self.directory = directory
+        self.tickers: list[str] = list(meta["tickers"])
+        self.columns: dict[str, int] = {
+            ticker: position for position, ticker in enumerate(self.tickers)
+        }
+        timezone = _timezone_from_text(meta["timezone"])
+        calendar = pd.to_datetime(
+            np.load(directory / "calendar.npy"), unit=meta["unit"], utc=True
+        )
+        self.calendar = (
+            calendar.tz_convert(timezone) if timezone else calendar.tz_localize(None)
+        ).rename("timestamp")
+        self.closes = np.load(directory / "closes.npy", mmap_mode="r")
+        self.returns = np.load(directory / "returns.npy", mmap_mode="r")
+
+    def rows(self, start=None, end=None) -> slice:
+        """[start, end]を含む行範囲を二分探索で求める。"""
+        tz = self.calendar.tz
+        first = (
+            0
+            if start is None
+            else self.calendar.searchsorted(localize_bound(start, tz), side="left")
+        )
+        last = (
+            len(self.calendar)
+            if end is None
+            else self.calendar.searchsorted(localize_bound(end, tz), side="right")
+        )
+        return slice(int(first), int(last))
+
+    def frame(
+        self,
+        field: str = "returns",
+        start=None,
+        end=None,
+        tickers: Iterable[str] | None = None,
+    ) -> pd.DataFrame:
+        if field not in _FIELDS:
+            raise ValueError(f"unknown price matrix field: {field!r}")
+        rows = self.rows(start, end)
+        values = getattr(self, field)[rows]
+        columns = self.tickers
+        if tickers is not None:
+            columns = [ticker for ticker in tickers if ticker in self.columns]
+            values = values[:, [self.columns[ticker] for ticker in columns]]
+        return pd.DataFrame(
+            values, index=self.calendar[rows], columns=columns, copy=False
+        )
+
+    def is_current(self, raw_directory: Path) -> bool:
+        """行列作成後に対象銘柄の生データが更新されていなければ真。"""
+        built = (self.directory / _META_FILE).stat().st_mtime_ns
+        for ticker in self.tickers:
+            for path in raw_directory.glob(f"{ticker}.*"):
+                if path.stat().st_mtime_ns > built:
+                    return False
+        return True
+
+
+@profiled("price_matrix.build")
+def build_price_matrix(
+    frames: Mapping[str, pd.DataFrame], directory: Path
+) -> PriceMatrix:
+    closes = align_closes(frames)
+    returns = closes.pct_change(fill_method=None)
+    index = pd.DatetimeIndex(closes.index)
+
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / _META_FILE).unlink(missing_ok=True)
+    _save_array(index.asi8.astype(np.int64, copy=False), directory / "calendar.npy")
+    _save_array(closes.to_numpy(dtype=np.float64), directory / "closes.npy")
+    _save_array(returns.to_numpy(dtype=np.float64), directory / "returns.npy")
+    # メタデータを最後に書き、配列が揃う前の行列を開かせない。
+    meta = {
+        "tickers": [str(ticker) for ticker in closes.columns],
+        "unit": index.unit,
+        "timezone": _timezone_text(index.tz),
+    }
+    with atomic_output(directory / _META_FILE, "w", "utf-8") as stream:
+        yaml.safe_dump(meta, stream, sort_keys=False)
+    return PriceMatrix(directory)
+
+
+def open_price_matrix(directory: Path) -> PriceMatrix | None:
+    if not (directory / _META_FILE).exists():
+        return None
+    return PriceMatrix(directory)
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterable, Mapping
+
+import pandas as pd
+
+from ..common import profiling
+from ..common.config import PRICE_STORE_FORMAT
+from . import columnar_store, yaml_store
+
+_YAML_SUFFIX = ".yaml"
+FORMATS = ("yaml", "columnar")
+
+
+def _yaml_path(ticker: str, directory: Path) -> Path:
+    return directory / f"{ticker}{_YAML_SUFFIX}"
+
+
+def stored_tickers(directory: Path) -> list[str]:
+    """どちらかの形式で保存済みの銘柄を返す。"""
+    names = {
+        path.name[: -len(suffix)]
+        for suffix in (_YAML_SUFFIX, columnar_store.SUFFIX)
+        for path in directory.glob(f"*{suffix}")
+    }
+    return sorted(names)
+
+
+def exists(ticker: str, directory: Path) -> bool:
+    return (
+        columnar_store.path_for(ticker, directory).exists()
+        or _yaml_path(ticker, directory).exists()
+    )
+
+
+def save_frames(
+    frames: Mapping[str, pd.DataFrame],
+    directory: Path,
+    store_format: str = PRICE_STORE_FORMAT,
+) -> None:
+    """指定形式で保存し、同じ銘柄の別形式ファイルを削除する。
+
+    1銘柄につき正本は常に1つだけにして、古い形式が新しい価格を隠さないようにする。
+    """
+    if store_format not in FORMATS:
+        raise ValueError(f"unknown price store format: {store_format!r}")
+    if store_format == "columnar":
+        columnar_store.save_frames(frames, directory)
+        stale = [_yaml_path(ticker, directory) for ticker in frames]
+    else:
+        yaml_store.save_frames(frames, directory)
+        stale = [columnar_store.path_for(ticker, directory) for ticker in frames]
+    for path in stale:
+        path.unlink(missing_ok=True)
+
+
+@profiling.profiled("price_store.load_frames")
+def load_frames(
+    tickers: Iterable[str],
+    directory: Path,
+    start=None,
+    end=None,
+    columns: Iterable[str] | None = None,
+) -> dict[str, pd.DataFrame]:
+    """列指向ファイルがあればそれを、なければYAMLを読む。
+
+    `start`/`end`（両端含む）と`columns`は保存層へ渡し、不要な行と列を読まない。
+    """
+    tickers = list(tickers)
+    columns = None if columns is None else list(columns)
+    columnar = [
+        ticker
+        for ticker in tickers
+        if columnar_store.path_for(ticker, directory).exists()
+    ]
+    frames = columnar_store.load_frames(columnar, directory, start, end, columns)
+    frames.update(
+        yaml_store.load_frames(
+            [ticker for ticker in tickers if ticker not in frames],
+            directory,
+            start,
+            end,
+            columns,
+        )
+    )
+    if profiling.active() is not None:
+        profiling.count(
+            "price_store.load_frames",
+            tickers=len(tickers),
+            rows=sum(len(frame) for frame in frames.values()),
+            bytes=sum(int(frame.memory_usage(index=True).sum()) for frame in frames.values()),
+        )
+    return {ticker: frames[ticker] for ticker in tickers}
+
+
+def frames_equal(left: pd.DataFrame, right: pd.DataFrame) -> bool:
+    left = left.loc[:, list(columnar_store.COLUMNS)]
+    right = right.loc[:, list(columnar_store.COLUMNS)]
+    return (
+        left.index.equals(right.index)
+        and str(left.index.tz) == str(right.index.tz)
+        and left.dtypes.equals(right.dtypes)
+        and left.equals(right)
+    )
+
+
+def verify_round_trip(tickers: Iterable[str], directory: Path) -> list[str]:
+    """YAMLと列指向ファイルが同じフレームへ復元されない銘柄を返す。"""
+    mismatched = []
+    for ticker in tickers:
+        expected = yaml_store.parse_frame(_yaml_path(ticker, directory))
+        actual = columnar_store.load_frames([ticker], directory)[ticker]
+        if not frames_equal(expected, actual):
+            mismatched.append(ticker)
+    return mismatched
+
+
+def migrate_yaml_store(
+    directory: Path,
+    tickers: Iterable[str] | None = None,
+    remove_source: bool = False,
+) -> list[str]:
+    """`*.T.yaml`を列指向形式へ一括変換し、往復一致を確認する。
+
+    一致しない銘柄があればYAMLを残したまま列指向ファイルを削除して失敗する。
+    """
+    tickers = list(tickers) if tickers is not None else [
+        path.name[: -len(_YAML_SUFFIX)]
+        for path in sorted(directory.glob(f"*{_YAML_SUFFIX}"))
+    ]
+    mismatched = []
+    # 解析キャッシュを通すと、npz同士を比べることになりYAMLとの一致を確かめられない。
+    for ticker, frame in yaml_store.load_frames(tickers, directory, cache=False).items():
+        columnar_store.save_frames({ticker: frame}, directory)
+        restored = columnar_store.load_frames([ticker], directory)[ticker]
+        if not frames_equal(frame, restored):
+            mismatched.append(ticker)
+
+    if mismatched:
+        for ticker in mismatched:
+            columnar_store.path_for(ticker, directory).unlink(missing_ok=True)
+        raise ValueError(
+            f"columnar round trip does not match YAML for: {', '.join(mismatched)}"
+        )
+    if remove_source:
+        for ticker in tickers:
+            _yaml_path(ticker, directory).unlink()
+    return tickers
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .atomic import atomic_output
+
+_SUFFIX = ".json"
+
+
+def content_key(*parts) -> str:
+    """文字列・数値・DataFrameの並びから内容アドレス（SHA-256の16進）を作る。
+
+    DataFrameは日付（ナノ秒）・列名・float64の値のバイト列を順に入れる。
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, pd.DataFrame):
+            digest.update(b"frame\0")
+            digest.update(pd.DatetimeIndex(part.index).as_unit("ns").asi8.tobytes())
+            digest.update("\0".join(map(str, part.columns)).encode("utf-8") + b"\0")
+            digest.update(np.ascontiguousarray(part.to_numpy(dtype=float)).tobytes())
+        else:
+            digest.update(f"{type(part).__name__}:{part!r}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """最適化結果をキーごとに1つのJSONファイルとして保存する。
+
+    読み出すたびに更新時刻を進め、`prune`で合計サイズが`max_bytes`を超えた分を
+    更新時刻の古い順（最近使われていない順）に消す。書き込みは一時ファイルから
+    置き換えるので、並列のワーカーが同時に書いても壊れたファイルは残らない。
+    """
+
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        if max_bytes < 0:
+            raise ValueError("max_bytes must be non-negative")
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{_SUFFIX}"
+
+    def get(self, key: str) -> dict | None:
+        path = self._path(key)
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return payload
+
+    def put(self, key: str, payload: dict) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with atomic_output(self._path(key), mode="w", encoding="utf-8") as stream:
+            json.dump(payload, stream, sort_keys=True)
+
+    def _entries(self) -> list[tuple[int, int, Path]]:
+        if not self.directory.is_dir():
+            return []
+        entries = []
+        for path in self.directory.glob(f"*{_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return sorted(entries)
+
+    def stats(self) -> dict[str, int]:
+        entries = self._entries()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
+
+    def prune(self) -> int:
+        """最近使われていない順に消して合計サイズを上限以下にし、消した件数を返す。"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self) -> int:
+        entries = self._entries()
+        for _, _, path in entries:
+            path.unlink(missing_ok=True)
+        return len(entries)
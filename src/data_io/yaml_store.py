@@ -1,16 +1,86 @@
+import hashlib
+import numpy as np
 import pandas as pd
 import yaml
-def save_frames(frames, directory):
+from ..common.parallel import parallel_map
+from . import columnar_store
+from .atomic import atomic_output
+from .columnar_store import restrict
+_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+CACHE_DIRNAME = ".cache"
+_RECORD = "- timestamp: '{}'\n  close: {}\n  volume: {}\n"
+def _float_texts(values):
+    # yaml.SafeRepresenter.represent_floatと同じ表記を列単位で作る。
+    texts = list(map(float.__repr__, values.tolist()))
+    for position, text in enumerate(texts):
+        if "n" in text or "e" in text:
+            value = values[position]
+            if value != value:
+                texts[position] = ".nan"
+            elif value in (float("inf"), float("-inf")):
+                texts[position] = ".inf" if value > 0 else "-.inf"
+            elif "." not in text:
+                texts[position] = text.replace("e", ".0e", 1)
+    return texts
+def _offset_text(seconds):
+    sign = "-" if seconds < 0 else "+"
+    hours, minutes = divmod(abs(int(seconds)) // 60, 60)
+    return f"{sign}{hours:02d}:{minutes:02d}"
+def _timestamp_texts(index):
+    index = pd.DatetimeIndex(index)
+    if (index.microsecond != 0).any() or (index.nanosecond != 0).any():
+        return [stamp.isoformat() for stamp in index]
+    local = index.tz_localize(None) if index.tz is not None else index
+    texts = np.datetime_as_string(local.to_numpy(dtype="datetime64[s]"), unit="s")
+    if index.tz is None:
+        return texts.tolist()
+    offsets = ((local - index.tz_convert("UTC").tz_localize(None)) // pd.Timedelta(seconds=1)).to_numpy()
+    suffixes = {seconds: _offset_text(seconds) for seconds in np.unique(offsets).tolist()}
+    return [text + suffixes[seconds] for text, seconds in zip(texts.tolist(), offsets.tolist())]
+def dump_frame(frame):
+    """yaml.safe_dump(records, sort_keys=False)とバイト単位で同じ文書を列ごとに組み立てる。"""
+    if frame.empty:
+        return "[]\n"
+    closes = _float_texts(frame["close"].to_numpy(dtype=float))
+    volumes = _float_texts(frame["volume"].to_numpy(dtype=float))
+    return "".join(map(_RECORD.format, _timestamp_texts(frame.index), closes, volumes))
+def _write_one(task):
+    ticker, frame, directory = task
+    with atomic_output(directory / f"{ticker}.yaml", "w", "utf-8") as stream:
+        stream.write(dump_frame(frame))
+def save_frames(frames, directory, jobs=None):
     directory.mkdir(parents=True, exist_ok=True)
-    for ticker, frame in frames.items():
-        records = [{"timestamp": str(index.isoformat()), "close": float(row["close"]), "volume": float(row["volume"])} for index, row in frame.iterrows()]
-        (directory / f"{ticker}.yaml").write_text(yaml.safe_dump(records, sort_keys=False), encoding="utf-8")
-def load_frames(tickers, directory):
+    parallel_map(_write_one, [(ticker, frame, directory) for ticker, frame in frames.items()], jobs)
+def parse_frame(path):
+    records = yaml.load(path.read_text(encoding="utf-8"), Loader=_LOADER)
+    frame = pd.DataFrame(records or [], columns=["timestamp", "close", "volume"]).astype({"close": float, "volume": float})
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"])
+    return frame.set_index("timestamp").sort_index()
+def _cache_path(ticker, path, cache_directory):
+    # パス・サイズ・mtimeが同じYAMLは再解析しない。キーが変われば別名になる。
+    stat = path.stat()
+    key = f"{path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+    return cache_directory / f"{ticker}.{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}{columnar_store.SUFFIX}"
+def _parse_and_cache(task):
+    ticker, path, cache_path, start, end, columns = task
+    frame = parse_frame(path)
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        for stale in cache_path.parent.glob(f"{ticker}.*{columnar_store.SUFFIX}"):
+            stale.unlink(missing_ok=True)
+        columnar_store.write_frame(frame, cache_path)
+    return restrict(frame, start, end, columns)
+def load_frames(tickers, directory, start=None, end=None, columns=None, jobs=None, cache=True):
+    """キャッシュ済みの銘柄はnpzから読み、残りをプロセスプールで並列に解析する。"""
     frames = {}
+    tasks = []
     for ticker in tickers:
-        records = yaml.safe_load((directory / f"{ticker}.yaml").read_text(encoding="utf-8"))
-        frame = pd.DataFrame(records)
-        frame["timestamp"] = pd.to_datetime(frame["timestamp"])
-        frame = frame.set_index("timestamp").sort_index()
-        frames[ticker] = frame
-    return frames
+        path = directory / f"{ticker}.yaml"
+        cache_path = _cache_path(ticker, path, directory / CACHE_DIRNAME) if cache else None
+        if cache_path is not None and cache_path.exists():
+            frames[ticker] = columnar_store.read_frame(cache_path, start, end, columns)
+        else:
+            tasks.append((ticker, path, cache_path, start, end, columns))
+    for task, frame in zip(tasks, parallel_map(_parse_and_cache, tasks, jobs)):
+        frames[task[0]] = frame
+    return {ticker: frames[ticker] for ticker in tickers}
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Mapping
+
+import pandas as pd
+
+BatchFetcher = Callable[[list[str], str, str, str], Mapping[str, pd.DataFrame]]
+
+
+class IngestionError(RuntimeError):
+    """再試行後も取得できない銘柄が残った場合に送出する。
+
+    `frames`には取得できた銘柄のフレームが入る。呼び出し側はこれを保存してから
+    失敗を伝え、再実行で取り直す銘柄を失敗分だけにできる。
+    """
+
+    def __init__(
+        self,
+        report: "IngestionReport",
+        frames: Mapping[str, pd.DataFrame] | None = None,
+    ) -> None:
+        details = "; ".join(
+            f"{ticker}: {message}" for ticker, message in sorted(report.failures.items())
+        )
+        if report.empty:
+            details += f" ({len(report.empty)} other tickers had no new rows)"
+        super().__init__(f"failed to download {len(report.failures)} tickers: {details}")
+        self.report = report
+        self.frames = dict(report.frames if frames is None else frames)
+
+
+class IngestionReport:
+    def __init__(self) -> None:
+        self.frames: dict[str, pd.DataFrame] = {}
+        self.failures: dict[str, str] = {}
+        # `empty_ok`で受け取った空の応答。失敗には数えない。
+        self.empty: set[str] = set()
+        self.attempts: dict[str, int] = {}
+        self.requests = 0
+
+    def raise_for_failures(self, frames: Mapping[str, pd.DataFrame] | None = None) -> None:
+        """失敗があれば送出する。`frames`を渡すと取得分の代わりに例外へ載せる。
+
+        `empty`の銘柄だけなら送出しない。定期的な差分更新を失敗で終わらせない。
+        """
+        if self.failures:
+            raise IngestionError(self, frames)
+
+
+class RateLimiter:
+    """全スレッド共通で、取得要求の間隔を`1 / rate_per_second`秒以上にする。"""
+
+    def __init__(
+        self,
+        rate_per_second: float | None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if rate_per_second is not None and rate_per_second <= 0:
+            raise ValueError("rate_per_second must be positive")
+        self._interval = 0.0 if rate_per_second is None else 1.0 / rate_per_second
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None:
+        if not self._interval:
+            return
+        with self._lock:
+            now = self._clock()
+            delay = self._next - now
+            self._next = max(now, self._next) + self._interval
+        if delay > 0:
+            self._sleep(delay)
+
+
+def _batches(
+    tickers: Iterable[str], start: str | Mapping[str, str], batch_size: int
+) -> list[tuple[list[str], str]]:
+    groups: dict[str, list[str]] = {}
+    for ticker in tickers:
+        ticker_start = start if isinstance(start, str) else start[ticker]
+        groups.setdefault(ticker_start, []).append(ticker)
+    return [
+        (members[offset : offset + batch_size], ticker_start)
+        for ticker_start, members in groups.items()
+        for offset in range(0, len(members), batch_size)
+    ]
+
+
+def _unusable(frame: pd.DataFrame | None, empty_ok: bool = False) -> str | None:
+    """取得結果を使えない理由を返す。使えるならNone。"""
+    if frame is None:
+        return "missing from response"
+    if frame.empty and not empty_ok:
+        return "empty response"
+    return None
+
+
+def download(
+    tickers: Iterable[str],
+    start: str | Mapping[str, str],
+    end: str,
+    timezone: str,
+    fetch_batch: BatchFetcher,
+    batch_size: int = 20,
+    max_workers: int = 4,
+    retries: int = 3,
+    backoff: float = 1.0,
+    rate_per_second: float | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+    empty_ok: Iterable[str] = (),
+) -> IngestionReport:
+    """銘柄をまとめて取得し、失敗分だけを銘柄単位で指数バックオフ再試行する。
+
+    `start`は共通の開始日、または銘柄ごとの開始日。開始日が同じ銘柄だけを
+    同じバッチへ入れる。応答にない銘柄と行が空の銘柄を失敗とみなし、
+    失敗は例外にせず`IngestionReport.failures`へ残す。`empty_ok`の銘柄は
+    空の応答も「新しい行がない」結果として受け取る（差分取得で最新の銘柄など）。
+    """
+    if batch_size < 1 or max_workers < 1 or retries < 0:
+        raise ValueError("batch_size and max_workers must be positive, retries >= 0")
+    tickers = list(dict.fromkeys(tickers))
+    empty_ok = set(empty_ok)
+    report = IngestionReport()
+    limiter = RateLimiter(rate_per_second, sleep=sleep)
+    lock = threading.Lock()
+
+    def request(batch: list[str], batch_start: str) -> Mapping[str, pd.DataFrame]:
+        limiter.wait()
+        with lock:
+            report.requests += 1
+            for ticker in batch:
+                report.attempts[ticker] = report.attempts.get(ticker, 0) + 1
+        return fetch_batch(batch, batch_start, end, timezone)
+
+    def accept(ticker: str, frame: pd.DataFrame) -> None:
+        with lock:
+            report.frames[ticker] = frame
+            if frame.empty:
+                report.empty.add(ticker)
+
+    def retry(ticker: str, batch_start: str, error: str) -> None:
+        for attempt in range(retries):
+            sleep(backoff * 2**attempt)
+            try:
+                frame = request([ticker], batch_start).get(ticker)
+            except Exception as exc:
+                error = f"{type(exc).__name__}: {exc}"
+                continue
+            error = _unusable(frame, ticker in empty_ok)
+            if error is None:
+                accept(ticker, frame)
+                return
+        with lock:
+            report.failures[ticker] = error
+
+    def run(batch: list[str], batch_start: str) -> None:
+        try:
+            fetched = request(batch, batch_start)
+        except Exception as exc:
+            fetched, error = {}, f"{type(exc).__name__}: {exc}"
+        else:
+            error = None
+        for ticker in batch:
+            frame = fetched.get(ticker)
+            reason = _unusable(frame, ticker in empty_ok)
+            if reason is not None:
+                retry(ticker, batch_start, error or reason)
+            else:
+                accept(ticker, frame)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for future in [
+            pool.submit(run, batch, batch_start)
+            for batch, batch_start in _batches(tickers, start, batch_size)
+        ]:
+            future.result()
+
+    report.frames = {
+        ticker: report.frames[ticker] for ticker in tickers if ticker in report.frames
+    }
+    return report
+
+
+def per_ticker(fetch: Callable[[str, str, str, str], pd.DataFrame]) -> BatchFetcher:
+    """銘柄単位の取得関数をバッチ取得関数として使えるようにする。"""
+
+    def fetch_batch(
+        tickers: list[str], start: str, end: str, timezone: str
+    ) -> dict[str, pd.DataFrame]:
+        return {ticker: fetch(ticker, start, end, timezone) for ticker in tickers}
+
+    return fetch_batch
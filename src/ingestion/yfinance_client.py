@@ -1,7 +1,16 @@
 import pandas as pd
-import yfinance as yf
 from zoneinfo import ZoneInfo
+from ..common.profiling import profiled
+from ..common.config import INGESTION_BACKOFF_SECONDS, INGESTION_BATCH_SIZE, INGESTION_RATE_PER_SECOND, INGESTION_RETRIES, INGESTION_WORKERS
+from .engine import download, per_ticker
+def _normalize(data, timezone):
+    data = data[["Adj Close", "Volume"]]
+    data.columns = ["close", "volume"]
+    index = pd.DatetimeIndex(data.index).tz_localize("UTC").tz_convert(ZoneInfo(timezone))
+    data.index = index
+    return data.dropna()
 def fetch_series(ticker, start, end, timezone):
+    import yfinance as yf
     data = yf.download(
         ticker,
         start=start,
@@ -9,10 +18,91 @@ def fetch_series(ticker, start, end, timezone):
         interval="1d",
         auto_adjust=False,
         progress=False,
-    )[["Adj Close", "Volume"]]
-    data.columns = ["close", "volume"]
-    index = pd.DatetimeIndex(data.index).tz_localize("UTC").tz_convert(ZoneInfo(timezone))
-    data.index = index
-    return data.dropna()
-def collect(tickers, start, end, timezone):
-    return {ticker: fetch_series(ticker, start, end, timezone) for ticker in tickers}
+    )
+    return _normalize(data, timezone)
+def fetch_batch(tickers, start, end, timezone):
+    """1回の要求で複数銘柄を取得する。応答に列がない銘柄は結果から除く。
+
+    yfinanceは取得に失敗した銘柄も全行欠損の列で返すため、欠損を除くと空になる。
+    空のフレームはエンジンが失敗として再試行し、残れば報告する（差分取得で保存済みの銘柄は除く）。
+    """
+    import yfinance as yf
+    data = yf.download(
+        list(tickers),
+        start=start,
+        end=end,
+        interval="1d",
+        auto_adjust=False,
+        progress=False,
+        group_by="ticker",
+        threads=False,
+    )
+    available = set(data.columns.get_level_values(0)) if isinstance(data.columns, pd.MultiIndex) else set()
+    return {ticker: _normalize(data[ticker].copy(), timezone) for ticker in tickers if ticker in available}
+def _download(tickers, start, end, timezone, fetch, empty_ok=()):
+    report = download(
+        tickers,
+        start,
+        end,
+        timezone,
+        per_ticker(fetch) if fetch is not None else fetch_batch,
+        batch_size=INGESTION_BATCH_SIZE,
+        max_workers=INGESTION_WORKERS,
+        retries=INGESTION_RETRIES,
+        backoff=INGESTION_BACKOFF_SECONDS,
+        rate_per_second=INGESTION_RATE_PER_SECOND,
+        empty_ok=empty_ok,
+    )
+    return report
+@profiled("ingestion.collect")
+def collect(tickers, start, end, timezone, fetch=None):
+    """既定ではyfinanceからバッチ取得する。`fetch`には銘柄単位の取得関数を渡せる。
+
+    取得できない銘柄が残ればIngestionErrorを送出し、取得できた分は例外の`frames`に載せる。
+    """
+    report = _download(list(tickers), start, end, timezone, fetch)
+    report.raise_for_failures()
+    return report.frames
+def merge_frames(existing, fresh):
+    """時刻で重複を除き、同じ時刻は新しく取得した行を採用する。"""
+    if fresh.empty:
+        return existing
+    if existing.empty:
+        return fresh.sort_index()
+    fresh = fresh.loc[:, list(existing.columns)]
+    if existing.index.tz is not None and fresh.index.tz is not None:
+        fresh = fresh.set_axis(fresh.index.tz_convert(existing.index.tz))
+    combined = pd.concat([existing, fresh])
+    return combined.loc[~combined.index.duplicated(keep="last")].sort_index()
+@profiled("ingestion.collect_incremental")
+def collect_incremental(tickers, start, end, timezone, existing, fetch=None):
+    """保存済みの最終日以降だけを取得して既存フレームへ結合する。
+
+    最終日自体も取り直して重複除去で置き換える。調整後終値は配当・分割で
+    過去分も改訂されるため、その場合は`collect`で全期間を取り直す。
+    保存済みの銘柄の空の応答（最新・上場廃止・売買停止など）は新しい行なしとして扱う。
+    取得できない銘柄が残ればIngestionErrorを送出し、それ以外の銘柄の結合後の
+    フレームを例外の`frames`に載せる。
+    """
+    frames = {}
+    resume = {}
+    tails = []
+    for ticker in tickers:
+        stored = existing.get(ticker)
+        if stored is None or stored.empty:
+            resume[ticker] = start
+            continue
+        ticker_start = max(stored.index.max().date().isoformat(), start)
+        if ticker_start >= end:
+            frames[ticker] = stored
+        else:
+            resume[ticker] = ticker_start
+            tails.append(ticker)
+    report = _download(list(resume), resume, end, timezone, fetch, tails) if resume else None
+    for ticker, frame in (report.frames if report is not None else {}).items():
+        stored = existing.get(ticker)
+        frames[ticker] = frame if stored is None or stored.empty else merge_frames(stored, frame)
+    frames = {ticker: frames[ticker] for ticker in tickers if ticker in frames}
+    if report is not None:
+        report.raise_for_failures(frames)
+    return frames
@@ -43,17 +43,17 @@ def render_summary_report(
     end_year = rows[-1]["year"]
     holdings_by_year = top_holdings or {}
     lines: List[str] = [
-        f"
+        f"# ポートフォリオ年次パフォーマンス概要（{start_year}-{end_year}）",
         "",
         "視聴者がすぐに押さえたい要点をミニマルに整理した、最適ポートフォリオの年次サマリーです。",
         "",
-        "
+        "## ハイライト",
         f"- **最高リターン:** {best_return['year']}年が年率{_percent(best_return['annual_return'])}でトップ。シャープレシオは{_ratio(best_return['sharpe_ratio'])}。",
         f"- **最低リターン:** {worst_return['year']}年は年率{_percent(worst_return['annual_return'])}で最も低調でした。",
         f"- **安定性:** ボラティリティ最小は{lowest_volatility['year']}年の{_percent(lowest_volatility['volatility'])}。最大ドローダウンは{_percent(lowest_volatility['max_drawdown'])}でした。",
         f"- **リスクイベント:** 最大ドローダウンは{deepest_drawdown['year']}年の{_percent(deepest_drawdown['max_drawdown'])}。",
         "",
-        "
+        "## 年次指標一覧",
         "| 年 | 年率リターン | ボラティリティ | シャープレシオ | 最大ドローダウン |",
         "|---|-------------|----------------|-----------------|-------------------|",
     ]
@@ -70,13 +70,13 @@ def render_summary_report(
     lines.extend(
         [
             "",
-            "
+            "## トレンドの掘り下げ",
             f"- 平均では年率リターン{_percent(avg_return)}, ボラティリティ{_percent(avg_volatility)}, シャープレシオ{_ratio(avg_sharpe)}, 最大ドローダウン{_percent(avg_drawdown)}。",
             f"- {start_year}年〜{split_year}年は平均リターン{_percent(early_return)} / ボラティリティ{_percent(early_volatility)}で安定推移。",
             f"- 最低リターンだった{worst_return['year']}年はボラティリティ{_percent(worst_return['volatility'])}、シャープレシオ{_ratio(worst_return['sharpe_ratio'])}。",
             f"- 直近の{latest_year['year']}年は年率{_percent(latest_year['annual_return'])}ながら、最大ドローダウン{_percent(latest_year['max_drawdown'])}と振れ幅が大きい点に留意。",
             "",
-            "
+            "## 今後の着目点",
             f"- リスク許容度を確認し、{deepest_drawdown['year']}年の下落幅{_percent(deepest_drawdown['max_drawdown'])}を想定したドローダウン管理を整備しましょう。",
             f"- 安定性が際立った{lowest_volatility['year']}年の運用要因を分析し、再現可能性を検証します。",
             f"- マイナスリターンとなった{worst_return['year']}年の市場環境とポジションを振り返り、防衛的な戦略に反映させます。",
@@ -86,7 +86,7 @@ def render_summary_report(
     years = sorted(holdings_by_year, key=int)
     for year in years:
         holdings = list(holdings_by_year.get(year, []))
-        lines.extend([f"
+        lines.extend([f"## {year}年ポートフォリオ上位10銘柄", ""])
         for default_rank, holding in enumerate(holdings[:10], start=1):
             ticker = holding.get("ticker", "")
             name = holding.get("name") or ticker
@@ -0,0 +1,51 @@
+from __future__ import annotations
+import json
+from ..data_io.atomic import atomic_output
+RESULTS_FILE_NAME = "results.jsonl"
+FORMAT = "portfolio_results"
+VERSION = 1
+def _line(record):
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+def _columns(weights):
+    """{銘柄: 重み}を銘柄と重みの並んだ2列にする。"""
+    return {"tickers": list(weights), "weights": [float(weight) for weight in weights.values()]}
+def _record(year, payload):
+    portfolio = payload["portfolio"]
+    entries = portfolio["weights"]
+    record = {
+        "year": int(year),
+        "status": payload.get("status", ""),
+        "period": payload.get("period", {}),
+        "training_window": portfolio.get("training_window", {}),
+        "evaluation_window": portfolio.get("evaluation_window", {}),
+        "risk_metrics": portfolio.get("risk_metrics", {}),
+        "tickers": list(entries),
+        "names": [data.get("name", "") for data in entries.values()],
+        "weights": [float(data.get("weight", 0.0)) for data in entries.values()],
+    }
+    if "rebalances" in portfolio:
+        record["rebalances"] = [
+            {**{key: value for key, value in item.items() if key != "weights"}, **_columns(item["weights"])}
+            for item in portfolio["rebalances"]
+        ]
+    return record
+def write_results(results, directory):
+    """全年の重み・指標・期間を1ファイルのJSON Linesへ書く。1行目は形式と版、以降は1年1行。"""
+    path = directory / RESULTS_FILE_NAME
+    with atomic_output(path, mode="w", encoding="utf-8") as stream:
+        stream.write(_line({"format": FORMAT, "version": VERSION}))
+        for year, payload in results.items():
+            stream.write(_line(_record(year, payload)))
+    return path
+def read_results(path):
+    """`write_results`の出力を年から記録への辞書として読む。形式か版が違えばValueError。"""
+    with open(path, encoding="utf-8") as stream:
+        header = json.loads(stream.readline() or "{}")
+        if header.get("format") != FORMAT or header.get("version") != VERSION:
+            raise ValueError(f"unsupported results file: {path} ({header})")
+        records = (json.loads(line) for line in stream if line.strip())
+        return {record["year"]: record for record in records}
+def top_holdings(record, count=10):
+    """重みの大きい順（同じ重みは保存順）に上位`count`銘柄を返す。YAMLのtop_holdingsと同じ並び。"""
+    ranked = sorted(zip(record["tickers"], record["names"], record["weights"]), key=lambda item: item[2], reverse=True)
+    return [{"rank": position, "ticker": ticker, "name": name, "weight": weight} for position, (ticker, name, weight) in enumerate(ranked[:count], start=1)]
@@ -1,5 +1,14 @@
 from __future__ import annotations
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterator
+from functools import partial
+from heapq import nsmallest
+from operator import itemgetter
+from ..common.parallel import parallel_map
+from ..common.profiling import profiled
+from ..data_io.atomic import atomic_output
 from .markdown_reporter import render_summary_report
+from .results_file import write_results
 def _round_numbers(data):
     if isinstance(data, float):
         return round(data, 6)
@@ -10,110 +19,94 @@ def _round_numbers(data):
     return data
 def _scalar(value):
     if isinstance(value, float):
-        return f"{value:.6f}"
+        # 文書全体を丸めてから書いていた頃と同じ値になるよう、書く直前に丸める。
+        return f"{round(value, 6):.6f}"
     return str(value)
-def _yaml_lines(data, indent=0):
+class _Items:
+    """dictと同じ形で書き出す(キー, 値)の遅延列。大きな写像を作らずに書くために使う。"""
+    def __init__(self, pairs):
+        self.pairs = pairs
+_NESTED = (dict, _Items, list, Iterator)
+def _write_yaml(write, data, indent=0):
+    """`data`を1行ずつ`write`へ渡す。dictと_Itemsは写像、listと反復子は列として書く。"""
     prefix = "  " * indent
-    if isinstance(data, dict):
-        return [
-            line
-            for key, value in data.items()
-            for line in (
-                [f"{prefix}{key}:"] + _yaml_lines(value, indent + 1)
-                if isinstance(value, (dict, list))
-                else [f"{prefix}{key}: {_scalar(value)}"]
-            )
-        ]
-    if isinstance(data, list):
-        return [
-            line
-            for value in data
-            for line in (
-                [f"{prefix}-"] + _yaml_lines(value, indent + 1)
-                if isinstance(value, (dict, list))
-                else [f"{prefix}- {_scalar(value)}"]
-            )
-        ]
-    return [f"{prefix}{_scalar(data)}"]
+    if isinstance(data, (dict, _Items)):
+        for key, value in data.items() if isinstance(data, dict) else data.pairs:
+            if isinstance(value, _NESTED):
+                write(f"{prefix}{key}:\n")
+                _write_yaml(write, value, indent + 1)
+            else:
+                write(f"{prefix}{key}: {_scalar(value)}\n")
+    elif isinstance(data, (list, Iterator)):
+        for value in data:
+            if isinstance(value, _NESTED):
+                write(f"{prefix}-\n")
+                _write_yaml(write, value, indent + 1)
+            else:
+                write(f"{prefix}- {_scalar(value)}\n")
+    else:
+        write(f"{prefix}{_scalar(data)}\n")
+def _write_document(path, data):
+    with atomic_output(path, mode="w", encoding="utf-8") as stream:
+        _write_yaml(stream.write, data)
 def _sort_universe(universe):
-    return sorted(
-        (
-            {
-                "ticker": item.get("ticker", ""),
-                "name": item.get("name", ""),
-            }
-            for item in universe
-        ),
-        key=lambda item: item["ticker"],
+    # 構成銘柄はふつう銘柄コード順に届くので、安定ソートはほぼ1回の走査で終わる。
+    return (
+        {"ticker": ticker, "name": name}
+        for ticker, name in sorted(
+            ((item.get("ticker", ""), item.get("name", "")) for item in universe),
+            key=itemgetter(0),
+        )
     )
+def _basic(entries):
+    return [{"ticker": ticker, "name": name, "weight": weight} for ticker, name, weight in entries]
 def _describe_weights(weights):
+    """配分の要約。重みの降順ソートは1回だけで、上位・帯・最小はその並びから切り出す（同じ重みは入力順）。"""
     entries = [
-        {
-            "ticker": ticker,
-            "name": data.get("name", ""),
-            "weight": float(data.get("weight", 0.0)),
-        }
+        (ticker, data.get("name", ""), float(data.get("weight", 0.0)))
         for ticker, data in weights.items()
     ]
-    ranked = sorted(entries, key=lambda item: item["weight"], reverse=True)
-    active = [entry for entry in ranked if entry["weight"] > 0]
-    def _basic(entries):
-        return [
-            {
-                "ticker": entry["ticker"],
-                "name": entry["name"],
-                "weight": entry["weight"],
-            }
-            for entry in entries
-        ]
+    ranked = sorted(entries, key=itemgetter(2), reverse=True)
+    descending = [-weight for _, _, weight in ranked]
+    invested = bisect_left(descending, 0.0)
+    active = ranked[:invested]
     buckets = [
         ("10%以上", 0.10, None),
         ("5%-10%", 0.05, 0.10),
         ("1%-5%", 0.01, 0.05),
         ("1%未満", 0.0, 0.01),
     ]
-    weight_buckets = [
-        {
-            "label": label,
-            "count": len(
-                members := [
-                    entry
-                    for entry in ranked
-                    if entry["weight"] >= lower
-                    and (upper is None or entry["weight"] < upper)
-                ]
-            ),
-            "weight_share": sum(entry["weight"] for entry in members),
-            "sample": _basic(members[:5]),
-        }
-        for label, lower, upper in buckets
-    ]
-    by_ticker = {
-        entry["ticker"]: {"name": entry["name"], "weight": entry["weight"]}
-        for entry in sorted(entries, key=lambda item: item["ticker"])
-    }
+    weight_buckets = []
+    for label, lower, upper in buckets:
+        first = 0 if upper is None else bisect_right(descending, -upper)
+        members = ranked[first : bisect_right(descending, -lower)]
+        weight_buckets.append(
+            {
+                "label": label,
+                "count": len(members),
+                "weight_share": sum(weight for _, _, weight in members),
+                "sample": _basic(members[:5]),
+            }
+        )
     return {
         "summary": {
             "total_constituents": len(entries),
             "invested_constituents": len(active),
             "zero_weight_constituents": len(entries) - len(active),
-            "top3_weight": sum(entry["weight"] for entry in ranked[:3]),
-            "top10_weight": sum(entry["weight"] for entry in ranked[:10]),
+            "top3_weight": sum(weight for _, _, weight in ranked[:3]),
+            "top10_weight": sum(weight for _, _, weight in ranked[:10]),
         },
         "top_holdings": [
-            {
-                "rank": position,
-                "ticker": entry["ticker"],
-                "name": entry["name"],
-                "weight": entry["weight"],
-            }
-            for position, entry in enumerate(ranked[:10], start=1)
+            {"rank": position, "ticker": ticker, "name": name, "weight": weight}
+            for position, (ticker, name, weight) in enumerate(ranked[:10], start=1)
         ],
-        "smallest_active_weights": _basic(
-            sorted(active, key=lambda item: item["weight"])[:5]
-        ),
+        "smallest_active_weights": _basic(nsmallest(5, active, key=itemgetter(2))),
         "weight_buckets": weight_buckets,
-        "by_ticker": by_ticker,
+        # 重みはふつう銘柄コード順に並んでおり、この安定ソートはほぼ1回の走査で済む。
+        "by_ticker": _Items(
+            (ticker, {"name": name, "weight": weight})
+            for ticker, name, weight in sorted(entries, key=itemgetter(0))
+        ),
     }
 def _format_year_report(year, payload):
     portfolio = payload["portfolio"]
@@ -134,27 +127,37 @@ def _format_year_report(year, payload):
             "members": _sort_universe(payload.get("universe", [])),
         },
     }
-def write_reports(results, directory):
+def _write_year_report(directory, item):
+    """1年分を書き、要約表に使う指標と上位銘柄（丸め済み）を返す。"""
+    year, payload = item
+    report = _format_year_report(year, payload)
+    _write_document(directory / f"{year}.yaml", report)
+    portfolio = report["portfolio"]
+    return _round_numbers(portfolio["risk_metrics"]), _round_numbers(portfolio["allocations"]["top_holdings"])
+@profiled("reporting.write_reports")
+def write_reports(results, directory, executor="serial", jobs=None):
+    """年ごとのYAMLを1行ずつファイルへ書き、要約・概要Markdown・全年分の機械可読な結果を添える。年は`executor`と`jobs`で並列に書く。"""
     directory.mkdir(parents=True, exist_ok=True)
-    formatted = {
-        year: _round_numbers(_format_year_report(year, payload))
-        for year, payload in results.items()
-    }
-    for year, payload in formatted.items():
-        (directory / f"{year}.yaml").write_text(
-            "\n".join(_yaml_lines(payload)) + "\n", encoding="utf-8"
-        )
-    summary = {
-        str(year): payload["portfolio"]["risk_metrics"]
-        for year, payload in formatted.items()
-    }
-    holdings = {
-        str(year): payload["portfolio"]["allocations"]["top_holdings"]
-        for year, payload in formatted.items()
-    }
-    (directory / "summary.yaml").write_text(
-        "\n".join(_yaml_lines({"years": summary})) + "\n",
-        encoding="utf-8",
-    )
+    written = parallel_map(partial(_write_year_report, directory), list(results.items()), jobs, executor)
+    summary = {str(year): metrics for year, (metrics, _) in zip(results, written)}
+    holdings = {str(year): top for year, (_, top) in zip(results, written)}
+    _write_document(directory / "summary.yaml", {"years": summary})
+    write_results(results, directory)
     report = render_summary_report(summary, holdings)
     (directory / "summary_report.md").write_text(report, encoding="utf-8")
+def write_robustness_report(robustness, directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    payload = {"years": {str(year): summary for year, summary in robustness.items()}}
+    _write_document(directory / "robustness.yaml", payload)
+def write_simulation_report(simulation, cost_bps, directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "transaction_cost_bps": float(cost_bps),
+        "years": {str(year): summary for year, summary in simulation.yearly.items()},
+        "rebalances": (
+            {"date": row.Index.date().isoformat(), "turnover": float(row.turnover), "cost": float(row.cost)}
+            for row in simulation.trades.itertuples()
+        ),
+    }
+    _write_document(directory / "simulation.yaml", payload)
+    simulation.equity.to_csv(directory / "equity_curve.csv", lineterminator="\n")
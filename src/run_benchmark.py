@@ -0,0 +1,48 @@
+import argparse
+import json
+from pathlib import Path
+from .common.config import BENCHMARK_BASELINE_FILE, BENCHMARK_REPEAT, BENCHMARK_REPORT_FILE, BENCHMARK_TICKERS, BENCHMARK_TOLERANCE, BENCHMARK_YEARS, PRICE_STORE_FORMAT, SOLVER
+from .common.parallel import EXECUTORS
+from .data_io.atomic import atomic_output
+from .data_io.price_store import FORMATS
+from .analytics.optimizer import SOLVERS
+from .benchmarks.suite import compare, run_benchmarks
+def _write(payload, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_output(path, mode="w", encoding="utf-8") as stream:
+        json.dump(payload, stream, indent=1, sort_keys=True)
+def _report(case):
+    timings = ", ".join(f"{operation}={timing['best']:.4f}s" for operation, timing in case["timings"].items())
+    print(f"{case['tickers']} tickers x {case['years']} years: {timings}", flush=True)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time storage, optimization and reporting on reproducible synthetic universes.")
+    parser.add_argument("--tickers", type=int, nargs="+", default=list(BENCHMARK_TICKERS), help="universe sizes to generate")
+    parser.add_argument("--years", type=int, nargs="+", default=list(BENCHMARK_YEARS), help="evaluation years per universe (one training year is added)")
+    parser.add_argument("--repeat", type=int, default=BENCHMARK_REPEAT, help="runs per operation; the fastest is compared")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--store-format", choices=FORMATS, default=PRICE_STORE_FORMAT)
+    parser.add_argument("--solver", choices=SOLVERS, default=SOLVER)
+    parser.add_argument("--executor", choices=EXECUTORS, default="serial")
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--output", type=Path, default=BENCHMARK_REPORT_FILE, help="JSON path of the measured results")
+    parser.add_argument("--baseline", type=Path, default=BENCHMARK_BASELINE_FILE, help="stored results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="also store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=BENCHMARK_TOLERANCE, help="allowed slowdown before an operation counts as a regression")
+    args = parser.parse_args(argv)
+    results = run_benchmarks(args.tickers, args.years, args.repeat, args.seed, args.store_format, args.solver, args.executor, args.jobs, progress=_report)
+    if args.baseline.exists() and not args.save_baseline:
+        results["comparison"] = {"baseline": str(args.baseline), "tolerance": args.tolerance, "operations": compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)}
+    _write(results, args.output)
+    if args.save_baseline:
+        _write(results, args.baseline)
+    return results
+if __name__ == "__main__":
+    results = main()
+    for row in results["scaling"]:
+        fixed = "years" if row["axis"] == "tickers" else "tickers"
+        print(f"{row['operation']}: time ~ {row['axis']}^{row['exponent']:.2f} at {fixed}={row[fixed]}")
+    regressions = [row for row in results.get("comparison", {}).get("operations", []) if row["regressed"]]
+    for row in regressions:
+        print(f"regression: {row['operation']} at {row['tickers']} tickers x {row['years']} years: {row['baseline']:.4f}s -> {row['current']:.4f}s ({row['ratio']:.2f}x)")
+    if regressions:
+        raise SystemExit(1)
@@ -0,0 +1,17 @@
+import argparse
+from .common.config import RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES
+from .data_io.result_cache import ResultCache
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the cache of optimized portfolio weights.")
+    parser.add_argument("action", choices=("stats", "prune", "clear"), help="stats: show size; prune: evict least recently used entries over the limit; clear: delete every entry")
+    parser.add_argument("--max-bytes", type=int, default=RESULT_CACHE_MAX_BYTES, help="size limit used by prune")
+    args = parser.parse_args(argv)
+    cache = ResultCache(RESULT_CACHE_DIR, args.max_bytes)
+    if args.action == "prune":
+        print(f"removed {cache.prune()} entries")
+    elif args.action == "clear":
+        print(f"removed {cache.clear()} entries")
+    return cache.stats()
+if __name__ == "__main__":
+    stats = main()
+    print(f"{stats['entries']} entries, {stats['bytes']} bytes")
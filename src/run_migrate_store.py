@@ -0,0 +1,11 @@
+import argparse
+from .common.config import DATA_RAW
+from .data_io.price_store import migrate_yaml_store
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert data/raw/*.yaml price files to the columnar store.")
+    parser.add_argument("--remove-yaml", action="store_true", help="delete YAML sources after a verified round trip")
+    args = parser.parse_args(argv)
+    return migrate_yaml_store(DATA_RAW, remove_source=args.remove_yaml)
+if __name__ == "__main__":
+    migrated = main()
+    print(f"migrated {len(migrated)} tickers")
@@ -1,5 +1,11 @@
+import argparse
+import json
+
 from .common.config import (
     DATA_RAW,
+    PIPELINE_MANIFEST_FILE,
+    PIPELINE_RESULTS_FILE,
+    PRICE_MATRIX_DIR,
     REPORT_DIR,
     TIMELINE_START,
     TIMELINE_END,
@@ -8,39 +14,333 @@ from .common.config import (
     MAX_WEIGHT,
     LOOKBACK_DAYS,
     MIN_TRAINING_OBSERVATIONS,
+    ROBUSTNESS_BLOCK_LENGTH,
+    ROBUSTNESS_CONFIDENCE,
+    ROBUSTNESS_RESAMPLES,
+    ROBUSTNESS_SEED,
+    SOLVER,
+    TICKER_NAMES_FILE,
+    UNIVERSE_PROVENANCE_FILE,
+    UNIVERSE_SNAPSHOTS_FILE,
+    PORTFOLIO_EXECUTOR,
+    PORTFOLIO_JOBS,
+    REBALANCE_FREQUENCY,
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_MAX_BYTES,
+    RUN_PROFILE_FILE,
+    TRANSACTION_COST_BPS,
 )
 from .common.universe import (
-    ALL_TICKERS,
+    all_tickers,
     assert_verified_universe,
     load_names,
+    membership_mask,
     universe_for_year,
 )
-from .ingestion.yfinance_client import collect
-from .data_io.yaml_store import save_frames, load_frames
-from .analytics.optimizer import build_yearly_portfolios
-from .reporting.yaml_reporter import write_reports
+from .ingestion.engine import IngestionError
+from .ingestion.yfinance_client import collect, collect_incremental
+from .common import profiling
+from .common.parallel import EXECUTORS
+from .common.stages import Stage, StageGraph, file_digests
+from .data_io.atomic import atomic_output
+from .data_io.price_store import exists, frames_equal, load_frames, save_frames
+from .data_io.price_matrix import build_price_matrix, open_price_matrix
+from .data_io.result_cache import ResultCache
+from .analytics.optimizer import (
+    REBALANCE_FREQUENCIES,
+    SOLVER_VERSION,
+    build_yearly_portfolios_from_returns,
+    history_bounds,
+)
+from .analytics.robustness import resample_portfolios
+from .analytics.simulation import simulate_results
+from .reporting.results_file import RESULTS_FILE_NAME
+from .reporting.yaml_reporter import (
+    write_reports,
+    write_robustness_report,
+    write_simulation_report,
+)
+
+
+STAGES = ("prices", "matrix", "portfolios", "reports", "robustness", "simulation")
+
+
+def _save_changed(frames, existing):
+    changed = {
+        ticker: frame
+        for ticker, frame in frames.items()
+        if ticker not in existing or not frames_equal(existing[ticker], frame)
+    }
+    save_frames(changed, DATA_RAW)
+
+
+def _refresh_prices(tickers, incremental):
+    existing = {}
+    try:
+        if not incremental:
+            frames = collect(tickers, TIMELINE_START, TIMELINE_END, TIMEZONE)
+        else:
+            stored = [ticker for ticker in tickers if exists(ticker, DATA_RAW)]
+            existing = load_frames(stored, DATA_RAW)
+            frames = collect_incremental(
+                tickers, TIMELINE_START, TIMELINE_END, TIMEZONE, existing
+            )
+    except IngestionError as error:
+        # 取得できた銘柄は捨てずに保存してから失敗を伝える（--incrementalの再実行で差分だけ取る）。
+        _save_changed(error.frames, existing)
+        raise
+    _save_changed(frames, existing)
+    return frames
+
+
+def _raw_files(tickers):
+    return [path for ticker in tickers for path in DATA_RAW.glob(f"{ticker}.*")]
 
 
-def main():
+def _file_hashes(*paths, previous=None):
+    digests = file_digests(paths, previous)
+    return {name: entry["sha256"] for name, entry in digests.items()}, digests
+
+
+def _returns(matrix):
+    return matrix.frame("returns", *history_bounds(YEARS, LOOKBACK_DAYS, TIMEZONE))
+
+
+def _save_portfolios(portfolios):
+    PIPELINE_RESULTS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_output(PIPELINE_RESULTS_FILE, mode="w", encoding="utf-8") as stream:
+        json.dump(portfolios, stream)
+
+
+def _load_portfolios():
+    payload = json.loads(PIPELINE_RESULTS_FILE.read_text(encoding="utf-8"))
+    return {int(year): result for year, result in payload.items()}
+
+
+def _pipeline(args, tickers, names):
+    """価格取得からレポートまでを、入力が変わった段だけ走る段の列として組む。"""
+    graph = StageGraph(PIPELINE_MANIFEST_FILE)
+    graph.add(
+        Stage(
+            "prices",
+            lambda: _refresh_prices(tickers, args.incremental),
+            inputs=lambda: {
+                "tickers": tickers,
+                "start": TIMELINE_START,
+                "end": TIMELINE_END,
+                "timezone": TIMEZONE,
+            },
+            complete=lambda: all(exists(ticker, DATA_RAW) for ticker in tickers),
+            load=lambda: load_frames(tickers, DATA_RAW, columns=["close"]),
+            outputs=lambda previous: _file_hashes(*_raw_files(tickers), previous=previous),
+        )
+    )
+    graph.add(
+        Stage(
+            "matrix",
+            lambda frames: build_price_matrix(frames, PRICE_MATRIX_DIR),
+            depends=("prices",),
+            complete=lambda: open_price_matrix(PRICE_MATRIX_DIR) is not None,
+            load=lambda: open_price_matrix(PRICE_MATRIX_DIR),
+        )
+    )
+
+    def portfolios(matrix):
+        returns = _returns(matrix)
+        cache = None if args.no_cache else ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES)
+        built = build_yearly_portfolios_from_returns(
+            returns,
+            YEARS,
+            MAX_WEIGHT,
+            LOOKBACK_DAYS,
+            MIN_TRAINING_OBSERVATIONS,
+            universe_for_year,
+            names,
+            membership_mask(returns.index, returns.columns),
+            executor=args.executor,
+            jobs=args.jobs,
+            rebalance=args.rebalance,
+            cache=cache,
+        )
+        _save_portfolios(built)
+        return built
+
+    graph.add(
+        Stage(
+            "portfolios",
+            portfolios,
+            depends=("matrix",),
+            inputs=lambda: {
+                "years": list(YEARS),
+                "max_weight": MAX_WEIGHT,
+                "lookback_days": LOOKBACK_DAYS,
+                "min_training_observations": MIN_TRAINING_OBSERVATIONS,
+                "solver": SOLVER,
+                "solver_version": SOLVER_VERSION,
+                "rebalance": args.rebalance,
+                "reference": _file_hashes(
+                    UNIVERSE_SNAPSHOTS_FILE, UNIVERSE_PROVENANCE_FILE, TICKER_NAMES_FILE
+                )[0],
+            },
+            complete=PIPELINE_RESULTS_FILE.exists,
+            load=_load_portfolios,
+        )
+    )
+    graph.add(
+        Stage(
+            "reports",
+            lambda built: write_reports(built, REPORT_DIR, args.executor, args.jobs),
+            depends=("portfolios",),
+            complete=lambda: all(
+                (REPORT_DIR / name).exists()
+                for name in [
+                    "summary.yaml",
+                    "summary_report.md",
+                    RESULTS_FILE_NAME,
+                    *(f"{year}.yaml" for year in YEARS),
+                ]
+            ),
+        )
+    )
+    if args.robustness:
+        graph.add(
+            Stage(
+                "robustness",
+                lambda built, matrix: write_robustness_report(
+                    resample_portfolios(
+                        built, _returns(matrix), executor=args.executor, jobs=args.jobs
+                    ),
+                    REPORT_DIR,
+                ),
+                depends=("portfolios", "matrix"),
+                inputs=lambda: [
+                    ROBUSTNESS_RESAMPLES,
+                    ROBUSTNESS_BLOCK_LENGTH,
+                    ROBUSTNESS_CONFIDENCE,
+                    ROBUSTNESS_SEED,
+                ],
+                complete=(REPORT_DIR / "robustness.yaml").exists,
+            )
+        )
+    if args.simulate:
+        graph.add(
+            Stage(
+                "simulation",
+                lambda built, matrix: write_simulation_report(
+                    simulate_results(built, _returns(matrix), args.cost_bps),
+                    args.cost_bps,
+                    REPORT_DIR,
+                ),
+                depends=("portfolios", "matrix"),
+                inputs=lambda: {"cost_bps": args.cost_bps},
+                complete=lambda: (REPORT_DIR / "simulation.yaml").exists()
+                and (REPORT_DIR / "equity_curve.csv").exists(),
+            )
+        )
+    force = set(args.force)
+    if args.incremental:
+        force.add("prices")
+    return graph.run(force & set(graph.stages)), graph
+
+
+def _year_profile(portfolios):
+    """年ごとの解法の反復回数・収束と、差分更新の作り直し回数をまとめる。"""
+    years = {}
+    for year, payload in portfolios.items():
+        quality = payload["data_quality"]
+        years[str(year)] = {
+            "eligible_assets": quality["eligible_assets"],
+            "complete_training_observations": quality["complete_training_observations"],
+            "optimizer": quality["optimizer"],
+            **({"rebalance": quality["rebalance"]} if "rebalance" in quality else {}),
+        }
+    return years
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh prices and rebuild yearly portfolio reports.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="fetch only dates after the last stored timestamp of each ticker",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=EXECUTORS,
+        default=PORTFOLIO_EXECUTOR,
+        help="how yearly portfolios are built in parallel",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=PORTFOLIO_JOBS,
+        help="number of yearly portfolio workers (default: CPU count)",
+    )
+    parser.add_argument(
+        "--rebalance",
+        choices=REBALANCE_FREQUENCIES,
+        default=REBALANCE_FREQUENCY,
+        help="how often weights are re-estimated within each year",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="re-optimize every decision instead of reusing cached weights",
+    )
+    parser.add_argument(
+        "--force",
+        nargs="+",
+        choices=STAGES,
+        default=[],
+        help="re-run these stages even when their inputs are unchanged",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=f"record stage times, solver statistics and peak memory in {RUN_PROFILE_FILE.name}",
+    )
+    parser.add_argument(
+        "--profile-capture",
+        choices=profiling.CAPTURES,
+        help="also capture a cProfile or tracemalloc trace (implies --profile; slow)",
+    )
+    parser.add_argument(
+        "--robustness",
+        action="store_true",
+        help="also write bootstrap and Monte Carlo intervals to robustness.yaml",
+    )
+    parser.add_argument(
+        "--simulate",
+        action="store_true",
+        help="replay trades with drifting holdings and turnover costs into simulation.yaml",
+    )
+    parser.add_argument(
+        "--cost-bps",
+        type=float,
+        default=TRANSACTION_COST_BPS,
+        help="transaction cost per unit of turnover in basis points",
+    )
+    args = parser.parse_args(argv)
     # Price downloads are irreversible evidence inputs. Fail before any network
     # access when the historical constituent snapshots are not independently
     # sourced and verified.
     assert_verified_universe()
-    names = load_names()
-    frames = collect(ALL_TICKERS, TIMELINE_START, TIMELINE_END, TIMEZONE)
-    save_frames(frames, DATA_RAW)
-    loaded = load_frames(ALL_TICKERS, DATA_RAW)
-    portfolios = build_yearly_portfolios(
-        loaded,
-        YEARS,
-        MAX_WEIGHT,
-        LOOKBACK_DAYS,
-        MIN_TRAINING_OBSERVATIONS,
-        universe_for_year,
-        names,
-    )
-    write_reports(portfolios, REPORT_DIR)
+    if not (args.profile or args.profile_capture):
+        return _pipeline(args, all_tickers(), load_names())[0]
+    with profiling.session(args.profile_capture) as current:
+        statuses, graph = _pipeline(args, all_tickers(), load_names())
+    profiling.write_run_profile(
+        current,
+        RUN_PROFILE_FILE,
+        {
+            "arguments": vars(args),
+            "stages": statuses,
+            "years": _year_profile(graph.value("portfolios")),
+        },
+    )
+    return statuses
 
 
 if __name__ == "__main__":
-    main()
+    statuses = main()
+    print(", ".join(f"{name}: {status}" for name, status in statuses.items()))
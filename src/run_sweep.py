@@ -0,0 +1,39 @@
+import argparse
+from pathlib import Path
+from .common.config import DATA_RAW, LOOKBACK_DAYS, MAX_WEIGHT, MIN_TRAINING_OBSERVATIONS, PORTFOLIO_EXECUTOR, PORTFOLIO_JOBS, PRICE_MATRIX_DIR, SOLVER, SWEEP_REPORT_FILE, TIMEZONE, YEARS
+from .common.parallel import EXECUTORS
+from .common.universe import all_tickers, assert_verified_universe, membership_mask, universe_for_year
+from .data_io.atomic import atomic_output
+from .data_io.price_store import exists, load_frames
+from .data_io.price_matrix import build_price_matrix, open_price_matrix
+from .analytics.optimizer import SOLVERS, history_bounds
+from .analytics.sweep import parameter_grid, sweep_parameters
+def _load_returns(lookback_days):
+    tickers = [ticker for ticker in all_tickers() if exists(ticker, DATA_RAW)]
+    matrix = open_price_matrix(PRICE_MATRIX_DIR)
+    if matrix is None or not set(tickers) <= set(matrix.columns) or not matrix.is_current(DATA_RAW):
+        matrix = build_price_matrix(load_frames(tickers, DATA_RAW, columns=["close"]), PRICE_MATRIX_DIR)
+    return matrix.frame("returns", *history_bounds(YEARS, lookback_days, TIMEZONE))
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate yearly portfolios over a grid of construction parameters.")
+    parser.add_argument("--max-weight", type=float, nargs="+", default=[MAX_WEIGHT])
+    parser.add_argument("--lookback", type=int, nargs="+", default=[LOOKBACK_DAYS], help="training window lengths in trading observations")
+    parser.add_argument("--min-observations", type=int, nargs="+", default=[MIN_TRAINING_OBSERVATIONS])
+    parser.add_argument("--solver", choices=SOLVERS, default=SOLVER)
+    parser.add_argument("--executor", choices=EXECUTORS, default=PORTFOLIO_EXECUTOR)
+    parser.add_argument("--jobs", type=int, default=PORTFOLIO_JOBS)
+    parser.add_argument("--output", type=Path, default=SWEEP_REPORT_FILE, help="CSV path of the tidy results table")
+    args = parser.parse_args(argv)
+    grid = parameter_grid(args.max_weight, args.lookback, args.min_observations)
+    # 既存のパイプラインと同じく、出典未検証の構成銘柄では価格を読む前に停止する。
+    assert_verified_universe()
+    returns = _load_returns(max(lookback for _, lookback, _ in grid))
+    table = sweep_parameters(returns, YEARS, grid, universe_for_year, membership_mask(returns.index, returns.columns), args.solver, args.executor, args.jobs)
+    output = args.output
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_output(output, mode="w", encoding="utf-8") as stream:
+        table.to_csv(stream, index=False, lineterminator="\n")
+    return table
+if __name__ == "__main__":
+    results = main()
+    print(f"evaluated {len(results)} parameter-year combinations")
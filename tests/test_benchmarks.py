@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.benchmarks.synthetic import evaluation_years, synthetic_universe
+from src.data_io.price_store import load_frames, save_frames
+
+
+class SyntheticUniverseTests(unittest.TestCase):
+    def test_same_arguments_give_the_same_prices(self) -> None:
+        first = synthetic_universe(40, 2, seed=3)
+        second = synthetic_universe(40, 2, seed=3)
+        other = synthetic_universe(40, 2, seed=4)
+        self.assertEqual(list(first), list(second))
+        self.assertTrue(all(first[ticker].equals(second[ticker]) for ticker in first))
+        self.assertFalse(first["S0000.T"].equals(other["S0000.T"]))
+
+    def test_missing_days_and_late_listings_are_present(self) -> None:
+        frames = synthetic_universe(200, 3, listing_fraction=0.2)
+        full = max(len(frame) for frame in frames.values())
+        starts = pd.Series({ticker: frame.index[0] for ticker, frame in frames.items()})
+        self.assertEqual(evaluation_years(3), [2018, 2019, 2020])
+        self.assertEqual(starts.min().year, 2017)
+        self.assertGreater(int((starts.dt.year > 2017).sum()), 20)
+        self.assertGreater(sum(len(frame) < full for frame in frames.values()), 150)
+        for frame in frames.values():
+            self.assertEqual(list(frame.columns), ["close", "volume"])
+            self.assertTrue(frame.index.is_monotonic_increasing)
+            self.assertGreater(len(frame), 0)
+            self.assertTrue(np.isfinite(frame.to_numpy()).all())
+
+    def test_universe_round_trips_through_the_price_store(self) -> None:
+        frames = synthetic_universe(5, 1)
+        with tempfile.TemporaryDirectory() as directory:
+            for store_format in ("yaml", "columnar"):
+                save_frames(frames, Path(directory), store_format)
+                loaded = load_frames(list(frames), Path(directory))
+                for ticker, frame in frames.items():
+                    # YAMLは時差だけを残すので、時刻は瞬間として比べる。
+                    self.assertTrue((loaded[ticker].index == frame.index).all(), ticker)
+                    np.testing.assert_array_equal(loaded[ticker].to_numpy(), frame.to_numpy())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.frontier import (
+    _qp_points,
+    build_frontiers,
+    equal_risk_contribution,
+    trace_frontier,
+)
+from src.analytics.optimizer import _best_capped_return, _weight_sharpe_from_moments
+from src.common.config import TRADING_DAYS
+
+
+def _moments(count: int = 30, seed: int = 8) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    loadings = rng.normal(0.0, 0.01, (count, 3))
+    covariance = loadings @ loadings.T + np.diag(rng.uniform(1e-5, 4e-4, count))
+    return rng.normal(0.0006, 0.0008, count), covariance
+
+
+class FrontierTests(unittest.TestCase):
+    def test_points_match_independent_qp_solves(self) -> None:
+        means, covariance = _moments()
+        tickers = [f"T{i}" for i in range(len(means))]
+        result = trace_frontier(means, covariance, tickers, 0.1, points=20)
+        annual_means = means * TRADING_DAYS
+        annual_covariance = covariance * TRADING_DAYS
+        targets = result.frontier["annual_return"].to_numpy()
+        expected, _ = _qp_points(annual_covariance, annual_means, 0.1, targets)
+
+        self.assertEqual(result.info["method"], "critical_line")
+        weights = result.weights.to_numpy()
+        # 内点法は許容誤差の分だけ劣るので、分散が同等以下であることを確かめる。
+        variance = np.einsum("kn,nm,km->k", weights, annual_covariance, weights)
+        reference = np.einsum("kn,nm,km->k", expected, annual_covariance, expected)
+        self.assertTrue((variance <= reference + 1e-12).all())
+        np.testing.assert_allclose(weights, expected, atol=1e-4)
+        np.testing.assert_allclose(weights @ annual_means, targets, atol=1e-12)
+        np.testing.assert_allclose(result.weights.sum(axis=1), 1.0, atol=1e-10)
+        self.assertLessEqual(result.weights.to_numpy().max(), 0.1 + 1e-12)
+        np.testing.assert_allclose(result.min_variance, result.weights.iloc[0], atol=1e-12)
+        self.assertAlmostEqual(
+            targets[-1], _best_capped_return(annual_means, 0.1), places=10
+        )
+
+    def test_dense_frontier_contains_max_sharpe_portfolio(self) -> None:
+        means, covariance = _moments(seed=3)
+        tickers = [f"T{i}" for i in range(len(means))]
+        result = trace_frontier(means, covariance, tickers, 0.15, points=4000)
+        weights = _weight_sharpe_from_moments(means, covariance, tickers, 0.15, "qp")
+        sharpe = (weights @ means) / np.sqrt(weights @ covariance @ weights)
+        self.assertAlmostEqual(
+            result.frontier["sharpe_ratio"].max(), sharpe * np.sqrt(TRADING_DAYS), places=5
+        )
+
+    def test_equal_risk_contribution_equalizes_contributions(self) -> None:
+        _, covariance = _moments()
+        weights, cold = equal_risk_contribution(covariance)
+        contributions = weights * (covariance @ weights)
+        np.testing.assert_allclose(contributions, contributions.mean(), rtol=1e-8)
+        self.assertAlmostEqual(weights.sum(), 1.0, places=12)
+        again, warm = equal_risk_contribution(covariance, initial=weights)
+        np.testing.assert_allclose(again, weights, atol=1e-12)
+        self.assertLess(warm, cold)
+
+    def test_build_frontiers_per_decision_date(self) -> None:
+        index = pd.date_range("2019-01-01", "2020-12-31", freq="B", tz="Asia/Tokyo")
+        rng = np.random.default_rng(4)
+        returns = pd.DataFrame(
+            rng.normal(0.0004, 0.01, (len(index), 8)),
+            index=index,
+            columns=[f"T{i}" for i in range(8)],
+        )
+        universe = {ticker: ticker for ticker in returns.columns}
+        annual = build_frontiers(returns, [2020], 0.3, 200, 150, lambda year: universe)
+        monthly = build_frontiers(
+            returns, [2020], 0.3, 200, 150, lambda year: universe, points=10,
+            rebalance="monthly",
+        )
+        self.assertEqual(len(annual[2020]), 1)
+        self.assertEqual(annual[2020][0].date, "2020-01-01")
+        self.assertEqual(len(annual[2020][0].frontier), 50)
+        self.assertEqual(len(monthly[2020]), 12)
+        self.assertEqual(monthly[2020][1].date, "2020-02-03")
+        np.testing.assert_allclose(
+            monthly[2020][0].min_variance, annual[2020][0].min_variance, atol=1e-12
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,253 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from src.ingestion import yfinance_client
+from src.ingestion.engine import IngestionError, RateLimiter, download
+from src.ingestion.yfinance_client import collect_incremental
+
+
+class _FakeSource:
+    """全期間の価格を持ち、要求された範囲だけを返すローカル取得元。"""
+
+    def __init__(self, periods: int = 30) -> None:
+        index = pd.date_range("2020-01-01", periods=periods, freq="B")
+        self.history = pd.DataFrame(
+            {
+                "close": np.linspace(100.0, 130.0, periods),
+                "volume": np.full(periods, 1_000.0),
+            },
+            index=index.tz_localize("UTC").tz_convert("Asia/Tokyo"),
+        )
+        self.requests: list[tuple[str, str, str]] = []
+
+    def __call__(self, ticker, start, end, timezone):
+        self.requests.append((ticker, start, end))
+        dates = self.history.index.tz_convert(timezone).normalize().tz_localize(None)
+        mask = (dates >= pd.Timestamp(start)) & (dates < pd.Timestamp(end))
+        return self.history.loc[mask]
+
+
+class IncrementalCollectTests(unittest.TestCase):
+    def test_only_missing_tail_is_requested_and_merged(self) -> None:
+        source = _FakeSource()
+        stored = source.history.iloc[:20].copy()
+        stored.iloc[-1, 0] = -1.0
+        frames = collect_incremental(
+            ["A.T", "B.T"],
+            "2020-01-01",
+            "2020-03-01",
+            "Asia/Tokyo",
+            {"A.T": stored},
+            fetch=source,
+        )
+        last_stored = stored.index.max().tz_convert("Asia/Tokyo").date().isoformat()
+        self.assertCountEqual(
+            source.requests,
+            [
+                ("A.T", last_stored, "2020-03-01"),
+                ("B.T", "2020-01-01", "2020-03-01"),
+            ],
+        )
+        pd.testing.assert_frame_equal(frames["A.T"], source.history, check_freq=False)
+        self.assertFalse(frames["A.T"].index.has_duplicates)
+        self.assertEqual(len(frames["B.T"]), 30)
+
+    def test_up_to_date_ticker_is_not_fetched(self) -> None:
+        source = _FakeSource()
+        frames = collect_incremental(
+            ["A.T"],
+            "2020-01-01",
+            source.history.index.max().date().isoformat(),
+            "Asia/Tokyo",
+            {"A.T": source.history},
+            fetch=source,
+        )
+        self.assertEqual(source.requests, [])
+        self.assertIs(frames["A.T"], source.history)
+
+    def test_empty_tail_of_stored_ticker_means_no_new_rows(self) -> None:
+        # 保存済みの最終日より後に取引日がない（売買停止・上場廃止など）と応答が空になる。
+        source = _FakeSource()
+        requests = []
+
+        def fetch(ticker, start, end, timezone):
+            requests.append(ticker)
+            return source.history.iloc[:0]
+
+        with mock.patch.multiple(
+            yfinance_client, INGESTION_BACKOFF_SECONDS=0.0, INGESTION_RATE_PER_SECOND=None
+        ):
+            frames = collect_incremental(
+                ["A.T"],
+                "2020-01-01",
+                "2020-03-01",
+                "Asia/Tokyo",
+                {"A.T": source.history},
+                fetch=fetch,
+            )
+        self.assertEqual(requests, ["A.T"])
+        self.assertIs(frames["A.T"], source.history)
+
+    def test_failure_keeps_merged_frames_of_other_tickers(self) -> None:
+        source = _FakeSource()
+
+        def fetch(ticker, start, end, timezone):
+            if ticker == "B.T":
+                raise ConnectionError("unavailable")
+            return source(ticker, start, end, timezone)
+
+        with mock.patch.multiple(
+            yfinance_client, INGESTION_BACKOFF_SECONDS=0.0, INGESTION_RATE_PER_SECOND=None
+        ), self.assertRaises(IngestionError) as raised:
+            collect_incremental(
+                ["A.T", "B.T"],
+                "2020-01-01",
+                "2020-03-01",
+                "Asia/Tokyo",
+                {"A.T": source.history.iloc[:20]},
+                fetch=fetch,
+            )
+        self.assertEqual(list(raised.exception.frames), ["A.T"])
+        pd.testing.assert_frame_equal(
+            raised.exception.frames["A.T"], source.history, check_freq=False
+        )
+        self.assertEqual(
+            raised.exception.report.failures, {"B.T": "ConnectionError: unavailable"}
+        )
+
+
+    def test_only_real_failures_are_raised_next_to_empty_tails(self) -> None:
+        source = _FakeSource()
+
+        def fetch(ticker, start, end, timezone):
+            if ticker == "A.T":
+                return source.history.iloc[:0]
+            if ticker == "B.T":
+                raise ConnectionError("unavailable")
+            return source(ticker, start, end, timezone)
+
+        stored = {"A.T": source.history, "B.T": source.history.iloc[:20]}
+        with mock.patch.multiple(
+            yfinance_client, INGESTION_BACKOFF_SECONDS=0.0, INGESTION_RATE_PER_SECOND=None
+        ), self.assertRaises(IngestionError) as raised:
+            collect_incremental(
+                ["A.T", "B.T", "C.T"],
+                "2020-01-01",
+                "2020-03-01",
+                "Asia/Tokyo",
+                stored,
+                fetch=fetch,
+            )
+        error = raised.exception
+        self.assertEqual(error.report.failures, {"B.T": "ConnectionError: unavailable"})
+        self.assertEqual(error.report.empty, {"A.T"})
+        self.assertIn("failed to download 1 tickers: B.T:", str(error))
+        self.assertIn("1 other tickers had no new rows", str(error))
+        self.assertEqual(list(error.frames), ["A.T", "C.T"])
+        self.assertIs(error.frames["A.T"], source.history)
+
+
+class _FlakyBatchSource:
+    def __init__(
+        self,
+        failures: dict[str, int],
+        broken: set[str] = frozenset(),
+        empty: dict[str, int] | None = None,
+    ):
+        self.failures = dict(failures)
+        self.broken = set(broken)
+        self.empty = dict(empty or {})
+        self.batches: list[list[str]] = []
+
+    def __call__(self, tickers, start, end, timezone):
+        self.batches.append(list(tickers))
+        if len(tickers) > 1 and any(self.failures.get(t, 0) for t in tickers):
+            raise ConnectionError("batch failed")
+        frames = {}
+        for ticker in tickers:
+            if self.failures.get(ticker, 0):
+                self.failures[ticker] -= 1
+                raise ConnectionError(f"{ticker} failed")
+            if self.empty.get(ticker, 0):
+                self.empty[ticker] -= 1
+                frames[ticker] = pd.DataFrame({"close": [], "volume": []})
+            elif ticker not in self.broken:
+                frames[ticker] = pd.DataFrame({"close": [1.0], "volume": [1.0]})
+        return frames
+
+
+class IngestionEngineTests(unittest.TestCase):
+    def test_batches_retry_and_partial_failures(self) -> None:
+        source = _FlakyBatchSource({"B": 1}, broken={"E"})
+        delays: list[float] = []
+        report = download(
+            ["A", "B", "C", "D", "E"],
+            "2020-01-01",
+            "2020-02-01",
+            "Asia/Tokyo",
+            source,
+            batch_size=3,
+            max_workers=1,
+            retries=2,
+            backoff=0.5,
+            sleep=delays.append,
+        )
+        self.assertEqual(list(report.frames), ["A", "B", "C", "D"])
+        self.assertEqual(report.failures, {"E": "missing from response"})
+        self.assertEqual(report.attempts["E"], 3)
+        self.assertEqual(source.batches[:2], [["A", "B", "C"], ["A"]])
+        self.assertEqual(delays, [0.5, 0.5, 1.0, 0.5, 0.5, 1.0])
+
+    def test_empty_frames_are_retried_and_reported(self) -> None:
+        source = _FlakyBatchSource({}, empty={"B": 1, "C": 3})
+        report = download(
+            ["A", "B", "C"],
+            "2020-01-01",
+            "2020-02-01",
+            "Asia/Tokyo",
+            source,
+            max_workers=1,
+            retries=2,
+            backoff=0.0,
+            sleep=lambda seconds: None,
+        )
+        self.assertEqual(list(report.frames), ["A", "B"])
+        self.assertEqual(report.failures, {"C": "empty response"})
+        self.assertEqual(report.attempts, {"A": 1, "B": 2, "C": 3})
+
+    def test_empty_frames_of_empty_ok_tickers_are_accepted(self) -> None:
+        source = _FlakyBatchSource({}, broken={"C"}, empty={"A": 1, "B": 3})
+        report = download(
+            ["A", "B", "C"],
+            "2020-01-01",
+            "2020-02-01",
+            "Asia/Tokyo",
+            source,
+            max_workers=1,
+            retries=2,
+            backoff=0.0,
+            sleep=lambda seconds: None,
+            empty_ok={"A", "C"},
+        )
+        self.assertEqual(list(report.frames), ["A"])
+        self.assertTrue(report.frames["A"].empty)
+        self.assertEqual(report.empty, {"A"})
+        self.assertEqual(
+            report.failures, {"B": "empty response", "C": "missing from response"}
+        )
+        self.assertEqual(report.attempts, {"A": 1, "B": 3, "C": 3})
+
+    def test_rate_limiter_spaces_requests(self) -> None:
+        now = [0.0]
+        delays: list[float] = []
+        limiter = RateLimiter(4.0, clock=lambda: now[0], sleep=delays.append)
+        for _ in range(3):
+            limiter.wait()
+        self.assertEqual(delays, [0.25, 0.5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import datetime as dt
+import random
+import unittest
+
+import pandas as pd
+
+from src.common.membership import MembershipStore
+
+
+def _snapshots(seed: int = 7) -> dict[dt.date, dict[str, str]]:
+    rng = random.Random(seed)
+    tickers = [f"{code:04d}.T" for code in range(30)]
+    return {
+        dt.date(2013 + offset, 1 + rng.randrange(12), 1): {
+            ticker: ticker.lower() for ticker in tickers if rng.random() < 0.6
+        }
+        for offset in range(8)
+    }
+
+
+class MembershipStoreTests(unittest.TestCase):
+    def test_lookups_match_linear_scan(self) -> None:
+        snapshots = _snapshots()
+        store = MembershipStore(snapshots)
+        dates = sorted(snapshots)
+        probe = dates[0]
+        while probe < dates[-1] + dt.timedelta(days=400):
+            latest = [date for date in dates if date <= probe][-1]
+            self.assertEqual(dict(store.members_on(probe)), snapshots[latest])
+            for ticker in ("0000.T", "0013.T", "0029.T", "9999.T"):
+                self.assertEqual(
+                    store.is_member(ticker, probe), ticker in snapshots[latest]
+                )
+            probe += dt.timedelta(days=17)
+
+    def test_views_are_shared_and_read_only(self) -> None:
+        store = MembershipStore(_snapshots())
+        first = store.members_on(dt.date(2016, 6, 1))
+        self.assertIs(first, store.members_on(dt.date(2016, 6, 2)))
+        with self.assertRaises(TypeError):
+            first["NEW.T"] = "new"  # type: ignore[index]
+
+    def test_dates_before_first_snapshot_fail_closed(self) -> None:
+        store = MembershipStore(_snapshots())
+        with self.assertRaisesRegex(ValueError, "no universe snapshot"):
+            store.members_on(dt.date(2000, 1, 1))
+
+    def test_mask_matches_point_lookups(self) -> None:
+        store = MembershipStore(_snapshots())
+        index = pd.date_range(
+            "2012-06-01 09:00", "2021-06-01 09:00", freq="11D", tz="Asia/Tokyo"
+        )
+        tickers = ["0000.T", "0007.T", "0029.T", "9999.T"]
+        mask = store.mask(index, tickers)
+        first = store.dates[0]
+        for timestamp, row in mask.iterrows():
+            day = timestamp.date()
+            for ticker in tickers:
+                expected = day >= first and store.is_member(ticker, day)
+                self.assertEqual(bool(row[ticker]), expected, (ticker, day))
+
+
+if __name__ == "__main__":
+    unittest.main()
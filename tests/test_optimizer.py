@@ -1,14 +1,49 @@
+import gc
+import math
+import pickle
+import time
 import unittest
 
 import numpy as np
 import pandas as pd
+from scipy.linalg import lu_factor
 
 from src.analytics.optimizer import (
     PortfolioConstructionError,
     _metrics,
     _select_training_returns,
     _weight_sharpe,
+    build_yearly_portfolios_from_returns,
+    portfolio_metrics,
 )
+from src.analytics.rolling import RollingMoments
+from src.common import parallel
+from src.common.parallel import SharedFrame
+
+
+def _reference_select(returns, min_observations, max_weight):
+    """列を1本外すたびに欠損を数え直していた従来の選択。"""
+    excluded = {}
+    counts = returns.notna().sum()
+    candidates = [t for t in returns.columns if counts[t] >= min_observations]
+    for ticker in returns.columns:
+        if ticker not in candidates:
+            excluded[ticker] = f"insufficient_training_observations:{int(counts[ticker])}"
+    minimum_assets = math.ceil(1 / max_weight - 1e-12)
+    if len(candidates) < minimum_assets:
+        raise PortfolioConstructionError("not enough eligible assets")
+    while len(candidates) >= minimum_assets:
+        selected = returns.loc[:, candidates].dropna(how="any")
+        if len(selected) >= min_observations:
+            return selected, excluded
+        missing = returns.loc[:, candidates].isna().sum()
+        worst_missing = int(missing.max())
+        worst = sorted(t for t in candidates if int(missing[t]) == worst_missing)[0]
+        excluded[worst] = (
+            f"removed_to_restore_common_training_window:missing={worst_missing}"
+        )
+        candidates.remove(worst)
+    raise PortfolioConstructionError("unable to form a complete training matrix")
 
 
 class TrainingSelectionTests(unittest.TestCase):
@@ -43,6 +78,40 @@ class TrainingSelectionTests(unittest.TestCase):
                 max_weight=0.2,
             )
 
+    def test_matches_reference_selection_on_random_masks(self) -> None:
+        rng = np.random.default_rng(15)
+        index = pd.date_range("2020-01-01", periods=60, freq="B")
+        for trial in range(300):
+            width = int(rng.integers(3, 12))
+            values = rng.normal(0.0, 0.01, (60, width))
+            rates = rng.choice([0.0, 0.02, 0.1, 0.3], size=width)
+            values[rng.random((60, width)) < rates] = np.nan
+            # 同じ欠損数の列を作り、銘柄コード順の同点処理も確かめる。
+            if width > 4 and trial % 3 == 0:
+                values[:, 4] = np.where(np.isnan(values[:, 3]), np.nan, values[:, 4])
+            columns = [f"T{i}" for i in rng.permutation(width)]
+            returns = pd.DataFrame(values, index=index, columns=columns)
+            minimum = int(rng.integers(10, 50))
+            max_weight = float(rng.choice([0.2, 0.34, 0.5, 1.0]))
+            with self.subTest(trial=trial):
+                try:
+                    expected = _reference_select(returns, minimum, max_weight)
+                except PortfolioConstructionError:
+                    with self.assertRaises(PortfolioConstructionError):
+                        _select_training_returns(returns, minimum, max_weight)
+                    continue
+                selected, excluded = _select_training_returns(
+                    returns, minimum, max_weight
+                )
+                pd.testing.assert_frame_equal(selected, expected[0])
+                self.assertEqual(list(excluded.items()), list(expected[1].items()))
+
+
+def _seconds(function) -> float:
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
 
 class OptimizerTests(unittest.TestCase):
     def test_weights_respect_constraints(self) -> None:
@@ -57,6 +126,69 @@ class OptimizerTests(unittest.TestCase):
         self.assertGreaterEqual(float(weights.min()), 0.0)
         self.assertLessEqual(float(weights.max()), 0.25 + 1e-8)
 
+    def test_solver_backends_agree(self) -> None:
+        rng = np.random.default_rng(11)
+        factors = rng.normal(0.0004, 0.01, (250, 2))
+        loadings = rng.normal(0.0, 1.0, (2, 30))
+        returns = pd.DataFrame(
+            factors @ loadings * 0.5 + rng.normal(0.0003, 0.015, (250, 30)),
+            columns=[f"T{i}" for i in range(30)],
+        )
+        slsqp = _weight_sharpe(returns, max_weight=0.2, solver="slsqp")
+        qp = _weight_sharpe(returns, max_weight=0.2, solver="qp")
+        np.testing.assert_allclose(qp.to_numpy(), slsqp.to_numpy(), atol=1e-5)
+        self.assertEqual(qp.attrs["solver"]["solver"], "qp")
+        self.assertLessEqual(float(qp.max()), 0.2 + 1e-8)
+
+    def test_solver_backends_agree_on_ill_conditioned_covariance(self) -> None:
+        # 保存データの2013年のように、平均と分散が桁外れの銘柄が1つだけ混じる。
+        rng = np.random.default_rng(2)
+        returns = pd.DataFrame(
+            rng.normal(0.0005, 0.015, (250, 60)), columns=[f"T{i}" for i in range(60)]
+        )
+        returns["T0"] = rng.normal(7.6, 120.0, 250)
+        slsqp = _weight_sharpe(returns, max_weight=0.1, solver="slsqp")
+        qp = _weight_sharpe(returns, max_weight=0.1, solver="qp")
+        np.testing.assert_allclose(qp.to_numpy(), slsqp.to_numpy(), atol=1e-4)
+        means, covariance = returns.mean(), returns.cov()
+        sharpe = {
+            name: float(weights @ means) / math.sqrt(float(weights @ covariance @ weights))
+            for name, weights in (("slsqp", slsqp), ("qp", qp))
+        }
+        self.assertAlmostEqual(sharpe["slsqp"], sharpe["qp"], places=8)
+
+    def test_qp_cost_is_dominated_by_one_factorization_per_iteration(self) -> None:
+        # 箱制約の項G'diag(w)Gを密な積で作ると、1反復が分解数回分より重くなる。
+        count = 1000
+        rng = np.random.default_rng(8)
+        returns = pd.DataFrame(
+            rng.normal(0.0004, 0.01, (250, 3)) @ rng.normal(0.0, 1.0, (3, count)) * 0.3
+            + rng.normal(0.0003, 0.015, (250, count)),
+            columns=[f"T{i}" for i in range(count)],
+        )
+        # KKT行列は(y, κ)と等式制約2本の分の大きさ。
+        system = np.eye(count + 3) + rng.uniform(0.0, 0.01, (count + 3, count + 3))
+        factorization = min(
+            _seconds(lambda: lu_factor(system, check_finite=False)) for _ in range(3)
+        )
+        started = time.perf_counter()
+        weights = _weight_sharpe(returns, max_weight=0.02, solver="qp")
+        elapsed = time.perf_counter() - started
+        info = weights.attrs["solver"]
+        self.assertTrue(info["converged"])
+        self.assertAlmostEqual(float(weights.sum()), 1.0, places=7)
+        self.assertLessEqual(float(weights.max()), 0.02 + 1e-8)
+        self.assertLess(elapsed, 3 * info["iterations"] * factorization)
+
+    def test_qp_falls_back_without_positive_expected_return(self) -> None:
+        rng = np.random.default_rng(5)
+        returns = pd.DataFrame(
+            rng.normal(-0.002, 0.01, (120, 6)), columns=list("ABCDEF")
+        )
+        weights = _weight_sharpe(returns, max_weight=0.4, solver="qp")
+        self.assertEqual(weights.attrs["solver"]["fallback"], "slsqp")
+        self.assertAlmostEqual(float(weights.sum()), 1.0, places=7)
+
     def test_metrics_ignore_inactive_missing_asset(self) -> None:
         index = pd.date_range("2021-01-01", periods=20, freq="B")
         returns = pd.DataFrame(
@@ -73,6 +205,171 @@ class OptimizerTests(unittest.TestCase):
         self.assertEqual(metrics["evaluation_observations"], 20)
         self.assertTrue(np.isfinite(metrics["annual_return"]))
 
+    def test_batched_metrics_match_single_portfolio_metrics(self) -> None:
+        rng = np.random.default_rng(16)
+        returns = pd.DataFrame(
+            rng.normal(0.0005, 0.015, (120, 10)), columns=[f"T{i}" for i in range(10)]
+        )
+        returns[returns.abs() > 0.03] = np.nan
+        returns["T9"] = np.nan
+        weights = rng.random((40, 10)) * (rng.random((40, 10)) < 0.4)
+        weights[0] = 0.0
+        weights[1] = np.eye(10)[9]
+        weights = pd.DataFrame(weights, columns=returns.columns)
+
+        batched = portfolio_metrics(returns, weights)
+        self.assertTrue(batched.iloc[0].drop("evaluation_observations").isna().all())
+        self.assertEqual(int(batched.loc[1, "evaluation_observations"]), 0)
+        for row in range(2, len(weights)):
+            active = weights.iloc[row][weights.iloc[row] > 1e-10]
+            if active.empty or "T9" in active.index:
+                continue
+            available = returns.loc[:, active.index].dropna(how="any")
+            daily = available.mul(active, axis=1).sum(axis=1)
+            curve = (1 + daily).cumprod()
+            expected = _metrics(returns, weights.iloc[row])
+            self.assertEqual(expected["evaluation_observations"], len(available))
+            self.assertAlmostEqual(expected["annual_return"], daily.mean() * 252, places=12)
+            self.assertAlmostEqual(
+                expected["volatility"], daily.std(ddof=0) * np.sqrt(252), places=12
+            )
+            self.assertAlmostEqual(
+                expected["max_drawdown"], float((curve / curve.cummax() - 1).min()), places=12
+            )
+            self.assertAlmostEqual(
+                batched.loc[row, "sharpe_ratio"], expected["sharpe_ratio"], places=12
+            )
+
+
+class MembershipMaskTests(unittest.TestCase):
+    def test_mask_selects_members_and_records_departures(self) -> None:
+        index = pd.date_range("2019-01-01", "2020-12-31", freq="B", tz="Asia/Tokyo")
+        rng = np.random.default_rng(3)
+        tickers = [f"T{i}" for i in range(6)]
+        returns = pd.DataFrame(
+            rng.normal(0.0005, 0.01, (len(index), len(tickers))),
+            index=index,
+            columns=tickers,
+        )
+        membership = pd.DataFrame(True, index=index, columns=tickers)
+        membership["T5"] = False
+        membership.loc[index >= pd.Timestamp("2020-07-01", tz="Asia/Tokyo"), "T4"] = False
+        results = build_yearly_portfolios_from_returns(
+            returns,
+            [2020],
+            max_weight=0.5,
+            lookback_days=200,
+            min_training_observations=150,
+            universe_resolver=lambda year: {ticker: ticker for ticker in tickers},
+            fallback_names={},
+            membership=membership,
+        )
+        result = results[2020]
+        self.assertEqual(
+            [item["ticker"] for item in result["universe"]], tickers[:5]
+        )
+        self.assertEqual(
+            result["data_quality"]["members_left_during_evaluation"], ["T4"]
+        )
+
+
+class ParallelBuildTests(unittest.TestCase):
+    def test_executors_return_identical_results_in_year_order(self) -> None:
+        index = pd.date_range("2017-01-01", "2020-12-31", freq="B", tz="Asia/Tokyo")
+        rng = np.random.default_rng(8)
+        tickers = [f"T{i}" for i in range(8)]
+        returns = pd.DataFrame(
+            rng.normal(0.0004, 0.01, (len(index), len(tickers))),
+            index=index,
+            columns=tickers,
+        )
+        membership = pd.DataFrame(True, index=index, columns=tickers)
+        membership.loc[index >= pd.Timestamp("2019-06-01", tz="Asia/Tokyo"), "T7"] = False
+        names = {ticker: ticker for ticker in tickers}
+        arguments = (returns, [2020, 2018, 2019], 0.3, 200, 150, lambda year: names, {})
+        serial = build_yearly_portfolios_from_returns(*arguments, membership)
+        for executor in ("threads", "processes"):
+            with self.subTest(executor=executor):
+                parallel = build_yearly_portfolios_from_returns(
+                    *arguments, membership, executor=executor, jobs=2
+                )
+                self.assertEqual(list(parallel), [2020, 2018, 2019])
+                self.assertEqual(parallel, serial)
+
+    def test_worker_attachment_is_closed_when_its_frames_are_released(self) -> None:
+        returns = pd.DataFrame(np.arange(12.0).reshape(4, 3), columns=list("ABC"))
+        with SharedFrame(returns) as shared:
+            # ワーカーへ渡すときと同じく、pickleで復元した側が共有メモリへ接続する。
+            first = pickle.loads(pickle.dumps(shared))
+            second = pickle.loads(pickle.dumps(shared))
+            self.assertIs(first._memory, second._memory)
+            frame = first.frame()
+            column = frame["B"]
+            del first, second, frame
+            gc.collect()
+            self.assertIn(shared.name, parallel._ATTACHED)
+            self.assertEqual(list(column), [1.0, 4.0, 7.0, 10.0])
+            del column
+            gc.collect()
+            self.assertNotIn(shared.name, parallel._ATTACHED)
+
+
+class RebalanceTests(unittest.TestCase):
+    def test_rolling_moments_match_full_recomputation(self) -> None:
+        rng = np.random.default_rng(4)
+        values = rng.normal(0.0005, 0.02, (400, 6))
+        values[rng.random(values.shape) < 0.02] = np.nan
+        engine = RollingMoments(values)
+        for stop in range(60, 400, 7):
+            columns = [0, 1, 2, 3] if stop < 200 else [0, 2, 4, 5]
+            engine.advance(columns, stop - 60, stop)
+            means, covariance = engine.moments()
+            expected = pd.DataFrame(values[stop - 60 : stop, columns]).dropna()
+            np.testing.assert_allclose(means, expected.mean(), rtol=1e-10, atol=1e-15)
+            np.testing.assert_allclose(covariance, expected.cov(), rtol=1e-10, atol=1e-15)
+        self.assertGreater(engine.updates, engine.resets)
+
+    def test_monthly_rebalance_starts_from_annual_weights(self) -> None:
+        index = pd.date_range("2019-01-01", "2020-12-31", freq="B", tz="Asia/Tokyo")
+        rng = np.random.default_rng(9)
+        tickers = [f"T{i}" for i in range(6)]
+        returns = pd.DataFrame(
+            rng.normal(0.0005, 0.01, (len(index), len(tickers))),
+            index=index,
+            columns=tickers,
+        )
+        arguments = (returns, [2020], 0.5, 200, 150, lambda year: {t: t for t in tickers}, {})
+        annual = build_yearly_portfolios_from_returns(*arguments)[2020]
+        monthly = build_yearly_portfolios_from_returns(*arguments, rebalance="monthly")[2020]
+        rebalances = monthly["portfolio"]["rebalances"]
+        self.assertEqual(len(rebalances), 12)
+        self.assertEqual(rebalances[0]["date"], "2020-01-01")
+        self.assertEqual(rebalances[1]["date"], "2020-02-03")
+        for ticker, entry in annual["portfolio"]["weights"].items():
+            self.assertAlmostEqual(
+                monthly["portfolio"]["weights"][ticker]["weight"], entry["weight"], places=6
+            )
+        self.assertEqual(
+            monthly["portfolio"]["risk_metrics"]["evaluation_observations"],
+            annual["portfolio"]["risk_metrics"]["evaluation_observations"],
+        )
+        self.assertEqual(monthly["data_quality"]["rebalance"]["decisions"], 12)
+        # 年次の結果との違いはrebalanceとrebalancesの追加と、実現リターンだけ。
+        self.assertEqual(list(monthly), list(annual))
+        self.assertEqual(monthly["universe"], annual["universe"])
+        self.assertEqual(
+            [key for key in monthly["data_quality"] if key != "rebalance"],
+            list(annual["data_quality"]),
+        )
+        self.assertEqual(
+            [key for key in monthly["portfolio"] if key != "rebalances"],
+            list(annual["portfolio"]),
+        )
+        self.assertEqual(
+            monthly["portfolio"]["training_window"]["start"],
+            annual["portfolio"]["training_window"]["start"],
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,161 @@
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from src.data_io import columnar_store, price_store, yaml_store
+from src.data_io.price_matrix import build_price_matrix, open_price_matrix
+
+
+def _frame(periods: int = 5) -> pd.DataFrame:
+    index = pd.to_datetime(
+        [
+            timestamp.isoformat()
+            for timestamp in pd.date_range(
+                "2012-01-04 09:00", periods=periods, freq="B", tz="Asia/Tokyo"
+            )
+        ]
+    )
+    return pd.DataFrame(
+        {
+            "close": np.linspace(100.0, 101.0, periods) / 3,
+            "volume": np.arange(periods, dtype=float) * 1_000,
+        },
+        index=index.rename("timestamp"),
+    )
+
+
+class ColumnarStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self._tmp.name)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_columnar_round_trip_matches_yaml(self) -> None:
+        yaml_store.save_frames({"0000.T": _frame()}, self.directory)
+        migrated = price_store.migrate_yaml_store(self.directory)
+        self.assertEqual(migrated, ["0000.T"])
+        self.assertEqual(price_store.verify_round_trip(migrated, self.directory), [])
+        loaded = columnar_store.load_frames(migrated, self.directory)["0000.T"]
+        self.assertEqual(str(loaded.index.tz), "UTC+09:00")
+        self.assertTrue(loaded.index.is_monotonic_increasing)
+
+    def test_migration_reads_yaml_not_the_parse_cache(self) -> None:
+        yaml_store.save_frames({"0000.T": _frame(4)}, self.directory)
+        yaml_store.load_frames(["0000.T"], self.directory, jobs=1)
+        (cached,) = (self.directory / yaml_store.CACHE_DIRNAME).glob("0000.T.*")
+        columnar_store.write_frame(_frame(2), cached)
+        price_store.migrate_yaml_store(self.directory)
+        loaded = columnar_store.load_frames(["0000.T"], self.directory)["0000.T"]
+        self.assertEqual(len(loaded), 4)
+        self.assertEqual(price_store.verify_round_trip(["0000.T"], self.directory), [])
+
+    def test_save_replaces_other_format(self) -> None:
+        price_store.save_frames({"0000.T": _frame()}, self.directory, "yaml")
+        price_store.save_frames({"0000.T": _frame(3)}, self.directory, "columnar")
+        self.assertFalse((self.directory / "0000.T.yaml").exists())
+        self.assertEqual(price_store.stored_tickers(self.directory), ["0000.T"])
+        loaded = price_store.load_frames(["0000.T"], self.directory)["0000.T"]
+        self.assertEqual(len(loaded), 3)
+
+    def test_range_and_columns_are_pushed_down(self) -> None:
+        frame = _frame(10)
+        price_store.save_frames({"Y.T": frame}, self.directory, "yaml")
+        price_store.save_frames({"C.T": frame}, self.directory, "columnar")
+        start, end = "2012-01-06", frame.index[6]
+        loaded = price_store.load_frames(
+            ["Y.T", "C.T"], self.directory, start, end, ["close"]
+        )
+        expected = frame.loc[frame.index[2] : frame.index[6], ["close"]]
+        for ticker in ("Y.T", "C.T"):
+            pd.testing.assert_frame_equal(
+                loaded[ticker], expected, check_freq=False, check_index_type=False
+            )
+
+    def test_yaml_parse_cache_follows_file_changes(self) -> None:
+        yaml_store.save_frames({"0000.T": _frame(4)}, self.directory)
+        first = yaml_store.load_frames(["0000.T"], self.directory, jobs=1)
+        cached = list((self.directory / yaml_store.CACHE_DIRNAME).glob("0000.T.*"))
+        self.assertEqual(len(cached), 1)
+        again = yaml_store.load_frames(["0000.T"], self.directory, jobs=1)
+        self.assertTrue(price_store.frames_equal(first["0000.T"], again["0000.T"]))
+
+        yaml_store.save_frames({"0000.T": _frame(6)}, self.directory)
+        updated = yaml_store.load_frames(["0000.T"], self.directory, jobs=1)
+        self.assertEqual(len(updated["0000.T"]), 6)
+        cached = list((self.directory / yaml_store.CACHE_DIRNAME).glob("0000.T.*"))
+        self.assertEqual(len(cached), 1)
+
+    def test_vectorized_yaml_matches_safe_dump(self) -> None:
+        frame = pd.DataFrame(
+            {
+                "close": [np.nan, np.inf, -np.inf, 1e16, 1e-5, 0.0, -2.5, 3.0],
+                "volume": np.arange(8, dtype=float),
+            },
+            index=pd.date_range(
+                "2020-03-01", periods=8, freq="7D", tz="Europe/London"
+            ),
+        )
+        for index in (frame.index, frame.index.tz_localize(None)):
+            frame.index = index
+            records = [
+                {
+                    "timestamp": str(timestamp.isoformat()),
+                    "close": float(row["close"]),
+                    "volume": float(row["volume"]),
+                }
+                for timestamp, row in frame.iterrows()
+            ]
+            self.assertEqual(
+                yaml_store.dump_frame(frame),
+                yaml.safe_dump(records, sort_keys=False),
+            )
+        self.assertEqual(yaml_store.dump_frame(frame.iloc[:0]), "[]\n")
+
+    def test_atomic_writes_use_the_default_file_mode(self) -> None:
+        # open()で作った場合（umask適用後）と同じ権限になり、mkstempの0600が残らない。
+        reference = self.directory / "reference.txt"
+        reference.write_text("x", encoding="utf-8")
+        expected = stat.S_IMODE(reference.stat().st_mode)
+        paths = {
+            "yaml": self.directory / "0000.T.yaml",
+            "columnar": columnar_store.path_for("0000.T", self.directory),
+        }
+        for store_format, path in paths.items():
+            price_store.save_frames({"0000.T": _frame()}, self.directory, store_format)
+            self.assertEqual(stat.S_IMODE(path.stat().st_mode), expected, store_format)
+
+
+class PriceMatrixTests(unittest.TestCase):
+    def test_matrix_matches_outer_join_and_slices_without_copy(self) -> None:
+        frames = {"A": _frame(6), "B": _frame(4).iloc[1:]}
+        expected = pd.DataFrame(
+            {ticker: frame["close"] for ticker, frame in frames.items()}
+        ).sort_index()
+        with tempfile.TemporaryDirectory() as tmp:
+            build_price_matrix(frames, Path(tmp))
+            matrix = open_price_matrix(Path(tmp))
+            self.assertEqual(matrix.columns, {"A": 0, "B": 1})
+            pd.testing.assert_frame_equal(
+                matrix.frame("closes"), expected, check_freq=False
+            )
+            pd.testing.assert_frame_equal(
+                matrix.frame("returns"),
+                expected.pct_change(fill_method=None),
+                check_freq=False,
+            )
+            window = matrix.frame(
+                "returns", start=expected.index[2], end=expected.index[3]
+            )
+            self.assertEqual(len(window), 2)
+            self.assertTrue(np.shares_memory(window.to_numpy(), matrix.returns))
+
+
+if __name__ == "__main__":
+    unittest.main()
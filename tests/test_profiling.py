@@ -0,0 +1,64 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.common import profiling
+from src.common.parallel import parallel_map
+
+
+@profiling.profiled("tests.square")
+def _square(value: int) -> int:
+    profiling.count("tests.values", total=value)
+    return value * value
+
+
+class ProfilingTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self._tmp.name)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_probes_record_only_inside_a_session(self) -> None:
+        self.assertEqual(_square(3), 9)
+        self.assertIsNone(profiling.active())
+        with profiling.session() as current:
+            _square(2)
+            _square(3)
+            with profiling.timed("tests.block"):
+                pass
+        self.assertIsNone(profiling.active())
+        snapshot = current.profile.snapshot()
+        self.assertEqual(snapshot["timings"]["tests.square"]["calls"], 2)
+        self.assertEqual(snapshot["timings"]["tests.block"]["calls"], 1)
+        self.assertEqual(snapshot["counters"], {"tests.values": {"total": 5}})
+
+    def test_worker_measurements_are_merged(self) -> None:
+        with profiling.session() as current:
+            squares = parallel_map(_square, [1, 2, 3, 4], 2, "processes")
+        self.assertEqual(squares, [1, 4, 9, 16])
+        snapshot = current.profile.snapshot()
+        self.assertEqual(snapshot["timings"]["tests.square"]["calls"], 4)
+        self.assertEqual(snapshot["counters"]["tests.values"]["total"], 10)
+
+    def test_captures_are_written_with_the_run_profile(self) -> None:
+        for capture, field in (("cprofile", "top_cumulative"), ("tracemalloc", "top_allocations")):
+            path = self.directory / capture / "run_profile.json"
+            with profiling.session(capture) as current:
+                [_square(value) for value in range(50)]
+            profiling.write_run_profile(current, path, {"stages": {"prices": "ran"}})
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            self.assertEqual(payload["capture"]["capture"], capture)
+            self.assertTrue(payload["capture"][field])
+            self.assertEqual(payload["stages"], {"prices": "ran"})
+            self.assertEqual(payload["timings"]["tests.square"]["calls"], 50)
+            self.assertEqual(path.with_suffix(".prof").exists(), capture == "cprofile")
+        with self.assertRaises(ValueError):
+            with profiling.session("perf"):
+                pass
+
+
+if __name__ == "__main__":
+    unittest.main()
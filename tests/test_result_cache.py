@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.optimizer import build_yearly_portfolios_from_returns
+from src.data_io.result_cache import ResultCache
+
+
+def _returns() -> pd.DataFrame:
+    index = pd.date_range("2017-01-01", "2020-12-31", freq="B", tz="Asia/Tokyo")
+    rng = np.random.default_rng(12)
+    return pd.DataFrame(
+        rng.normal(0.0004, 0.01, (len(index), 6)),
+        index=index,
+        columns=[f"T{i}" for i in range(6)],
+    )
+
+
+class ResultCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self._tmp.name)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _build(self, returns, cache, **options):
+        names = {ticker: ticker for ticker in returns.columns}
+        return build_yearly_portfolios_from_returns(
+            returns, [2019, 2020], 0.4, 200, 150, lambda year: names, {},
+            cache=cache, **options,
+        )
+
+    def test_only_years_with_changed_training_data_are_recomputed(self) -> None:
+        returns = _returns()
+        cache = ResultCache(self.directory, 1 << 20)
+        first = self._build(returns, cache)
+        self.assertEqual(first, self._build(returns, None))
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertEqual(self._build(returns, cache), first)
+        self.assertEqual(cache.stats()["entries"], 2)
+
+        # 2019年の訓練窓だけに入る値を変える。
+        changed = returns.copy()
+        changed.loc["2018-06-01", "T0"] += 0.05
+        rebuilt = self._build(changed, cache)
+        self.assertEqual(cache.stats()["entries"], 3)
+        self.assertEqual(rebuilt, self._build(changed, None))
+        self.assertEqual(rebuilt[2020], first[2020])
+
+    def test_rebalanced_decisions_reuse_identical_weights(self) -> None:
+        returns = _returns()
+        cache = ResultCache(self.directory, 1 << 20)
+        cold = self._build(returns, None, rebalance="monthly")
+        self.assertEqual(self._build(returns, cache, rebalance="monthly"), cold)
+        entries = cache.stats()["entries"]
+        self.assertEqual(entries, 24)
+        self.assertEqual(self._build(returns, cache, rebalance="monthly"), cold)
+        self.assertEqual(cache.stats()["entries"], entries)
+
+    def test_rebalanced_keys_ignore_rows_outside_the_window(self) -> None:
+        returns = _returns()
+        cache = ResultCache(self.directory, 1 << 20)
+        built = self._build(returns, cache, rebalance="monthly")
+        changed = returns.copy()
+        changed.loc["2019-06-03", "T0"] += 0.05
+        self._build(changed, cache, rebalance="monthly")
+        # 変えた行を訓練窓に含む決定日だけが計算し直される。
+        row = returns.index.get_loc(pd.Timestamp("2019-06-03", tz="Asia/Tokyo"))
+        decisions = [
+            returns.index.searchsorted(pd.Timestamp(rebalance["date"], tz="Asia/Tokyo"))
+            for result in built.values()
+            for rebalance in result["portfolio"]["rebalances"]
+        ]
+        recomputed = sum(decision - 200 <= row < decision for decision in decisions)
+        self.assertEqual(cache.stats()["entries"], len(decisions) + recomputed)
+
+    def test_build_prunes_cache_to_its_limit(self) -> None:
+        returns = _returns()
+        cache = ResultCache(self.directory, 2_000)
+        self._build(returns, cache, rebalance="monthly")
+        self.assertLessEqual(cache.stats()["bytes"], 2_000)
+        self.assertGreater(cache.stats()["entries"], 0)
+
+    def test_prune_evicts_least_recently_used_entries(self) -> None:
+        cache = ResultCache(self.directory, 0)
+        for position, key in enumerate(["a", "b", "c"]):
+            cache.put(key, {"value": key})
+            os.utime(self.directory / f"{key}.json", ns=(position, position))
+        self.assertEqual(cache.get("a"), {"value": "a"})
+        cache.max_bytes = cache.stats()["bytes"] * 2 // 3
+        self.assertEqual(cache.prune(), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), {"value": "c"})
+        self.assertEqual(cache.clear(), 2)
+        self.assertEqual(cache.stats(), {"entries": 0, "bytes": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.optimizer import build_yearly_portfolios_from_returns
+from src.analytics.robustness import _block_indices, resample_portfolios
+
+
+def _results(rebalance: str = "annual"):
+    index = pd.date_range("2018-01-01", "2020-12-31", freq="B", tz="Asia/Tokyo")
+    rng = np.random.default_rng(17)
+    returns = pd.DataFrame(
+        rng.normal(0.0006, 0.012, (len(index), 6)),
+        index=index,
+        columns=[f"T{i}" for i in range(6)],
+    )
+    returns.iloc[300:305, 2] = np.nan
+    universe = {ticker: ticker for ticker in returns.columns}
+    results = build_yearly_portfolios_from_returns(
+        returns, [2019, 2020], 0.5, 200, 150, lambda year: universe, {}, rebalance=rebalance
+    )
+    return results, returns
+
+
+class RobustnessTests(unittest.TestCase):
+    def test_block_indices_wrap_contiguous_blocks(self) -> None:
+        indices = _block_indices(np.random.default_rng(0), 10, 50, 4)
+        self.assertEqual(indices.shape, (50, 10))
+        steps = (indices[:, 1:4] - indices[:, :3]) % 10
+        self.assertTrue((steps == 1).all())
+
+    def test_intervals_are_seeded_and_anchored_on_reported_metrics(self) -> None:
+        for rebalance in ("annual", "monthly"):
+            results, returns = _results(rebalance)
+            with self.subTest(rebalance=rebalance):
+                first = resample_portfolios(results, returns, resamples=500, seed=3)
+                again = resample_portfolios(
+                    results, returns, resamples=500, seed=3, executor="processes", jobs=2
+                )
+                self.assertEqual(first, again)
+                for year, summary in first.items():
+                    metrics = results[year]["portfolio"]["risk_metrics"]
+                    self.assertEqual(
+                        summary["evaluation_observations"], metrics["evaluation_observations"]
+                    )
+                    for method in ("block_bootstrap", "monte_carlo"):
+                        interval = summary[method]["sharpe_ratio"]
+                        self.assertAlmostEqual(
+                            interval["estimate"], metrics["sharpe_ratio"], places=12
+                        )
+                        self.assertLess(interval["lower"], interval["upper"])
+        other = resample_portfolios(results, returns, resamples=500, seed=4)
+        self.assertNotEqual(other, first)
+
+
+if __name__ == "__main__":
+    unittest.main()
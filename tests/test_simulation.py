@@ -0,0 +1,64 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.optimizer import build_yearly_portfolios_from_returns
+from src.analytics.simulation import drift_kernel, simulate_results
+
+
+def _loop(returns, decisions, targets, from_cash, cost_rate):
+    holdings = np.zeros(returns.shape[1])
+    wealth, turnover = [], []
+    positions = {row: position for position, row in enumerate(decisions)}
+    for row, daily in enumerate(returns):
+        if row in positions:
+            position = positions[row]
+            value = holdings.sum() if row else 1.0
+            current = np.zeros_like(holdings) if from_cash[position] else holdings / value
+            turnover.append(np.abs(targets[position] - current).sum())
+            holdings = targets[position] * value * (1 - cost_rate * turnover[-1])
+        holdings = holdings * (1 + daily)
+        wealth.append(holdings.sum())
+    return np.array(wealth), np.array(turnover)
+
+
+class DriftSimulationTests(unittest.TestCase):
+    def test_kernel_matches_day_by_day_simulation(self) -> None:
+        rng = np.random.default_rng(18)
+        returns = rng.normal(0.0005, 0.02, (300, 8))
+        decisions = np.array([0, 3, 4, 120, 200, 299])
+        targets = rng.dirichlet(np.ones(8), len(decisions))
+        from_cash = np.array([True, False, False, False, True, False])
+        wealth, turnover, costs = drift_kernel(returns, decisions, targets, from_cash, 0.002)
+        expected_wealth, expected_turnover = _loop(
+            returns, decisions, targets, from_cash, 0.002
+        )
+        np.testing.assert_allclose(wealth, expected_wealth, rtol=1e-12)
+        np.testing.assert_allclose(turnover, expected_turnover, rtol=1e-12)
+        np.testing.assert_allclose(costs, 0.002 * expected_turnover)
+
+    def test_costless_daily_rebalance_matches_constant_weight_metrics(self) -> None:
+        index = pd.date_range("2019-01-01", "2020-12-31", freq="B", tz="Asia/Tokyo")
+        rng = np.random.default_rng(19)
+        returns = pd.DataFrame(
+            rng.normal(0.0005, 0.01, (len(index), 5)),
+            index=index,
+            columns=[f"T{i}" for i in range(5)],
+        )
+        universe = {ticker: ticker for ticker in returns.columns}
+        results = build_yearly_portfolios_from_returns(
+            returns, [2020], 0.5, 200, 150, lambda year: universe, {}, rebalance="daily"
+        )
+        free = simulate_results(results, returns, cost_bps=0)
+        charged = simulate_results(results, returns, cost_bps=25)
+        metrics = results[2020]["portfolio"]["risk_metrics"]
+        self.assertAlmostEqual(free.yearly[2020]["sharpe_ratio"], metrics["sharpe_ratio"], places=10)
+        self.assertEqual(free.yearly[2020]["rebalances"], len(results[2020]["portfolio"]["rebalances"]))
+        self.assertTrue(charged.trades["from_cash"].iloc[0])
+        self.assertAlmostEqual(float(charged.trades["turnover"].iloc[0]), 1.0)
+        self.assertLess(charged.equity.iloc[-1], free.equity.iloc[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
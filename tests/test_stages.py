@@ -0,0 +1,79 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.common.stages import Stage, StageGraph, file_digests
+
+
+class StageGraphTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self._tmp.name)
+        self.source = self.directory / "source.txt"
+        self.source.write_text("1", encoding="utf-8")
+        self.setting = "a"
+        self.calls: list[str] = []
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _graph(self) -> StageGraph:
+        def read():
+            self.calls.append("read")
+            return self.source.read_text(encoding="utf-8")
+
+        def load():
+            self.calls.append("load")
+            return self.source.read_text(encoding="utf-8")
+
+        def combine(text):
+            self.calls.append("combine")
+            return text + self.setting
+
+        def digest(previous):
+            digests = file_digests([self.source], previous)
+            return {name: entry["sha256"] for name, entry in digests.items()}, digests
+
+        graph = StageGraph(self.directory / "manifest.json")
+        graph.add(Stage("read", read, load=load, outputs=digest))
+        graph.add(
+            Stage("combine", combine, depends=("read",), inputs=lambda: self.setting)
+        )
+        return graph
+
+    def test_unchanged_inputs_skip_every_stage(self) -> None:
+        graph = self._graph()
+        self.assertEqual(graph.run(), {"read": "ran", "combine": "ran"})
+        self.assertEqual(graph.value("combine"), "1a")
+        self.calls.clear()
+        self.assertEqual(self._graph().run(), {"read": "skipped", "combine": "skipped"})
+        self.assertEqual(self.calls, [])
+
+    def test_changed_setting_loads_skipped_upstream(self) -> None:
+        self._graph().run()
+        self.calls.clear()
+        self.setting = "b"
+        graph = self._graph()
+        self.assertEqual(graph.run(), {"read": "skipped", "combine": "ran"})
+        self.assertEqual(self.calls, ["load", "combine"])
+        self.assertEqual(graph.value("combine"), "1b")
+
+    def test_upstream_output_change_and_force_rerun_downstream(self) -> None:
+        self._graph().run()
+        self.source.write_text("2", encoding="utf-8")
+        self.assertEqual(self._graph().run(), {"read": "skipped", "combine": "ran"})
+        self.assertEqual(self._graph().run(force=["read"]), {"read": "ran", "combine": "skipped"})
+        with self.assertRaises(ValueError):
+            self._graph().run(force=["missing"])
+
+    def test_failed_stage_is_not_skipped_next_time(self) -> None:
+        self._graph().run()
+        graph = self._graph()
+        graph.stages["combine"].run = lambda text: 1 / 0
+        with self.assertRaises(ZeroDivisionError):
+            graph.run(force=["combine"])
+        self.assertEqual(self._graph().run(), {"read": "skipped", "combine": "ran"})
+
+
+if __name__ == "__main__":
+    unittest.main()
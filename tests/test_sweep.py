@@ -0,0 +1,76 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.optimizer import build_yearly_portfolios_from_returns
+from src.analytics.sweep import COLUMNS, parameter_grid, sweep_parameters
+
+
+def _returns() -> pd.DataFrame:
+    index = pd.date_range("2018-01-01", "2020-12-31", freq="B", tz="Asia/Tokyo")
+    rng = np.random.default_rng(21)
+    returns = pd.DataFrame(
+        rng.normal(0.0004, 0.01, (len(index), 8)),
+        index=index,
+        columns=[f"T{i}" for i in range(8)],
+    )
+    returns.iloc[: len(index) // 2, 7] = np.nan
+    return returns
+
+
+class SweepTests(unittest.TestCase):
+    def test_grid_skips_minimum_above_lookback(self) -> None:
+        grid = parameter_grid([0.3], [100, 200], [150])
+        self.assertEqual(grid, [(0.3, 200, 150)])
+
+    def test_rows_match_yearly_construction(self) -> None:
+        returns = _returns()
+        universe = {ticker: ticker for ticker in returns.columns}
+        grid = parameter_grid([0.2, 0.3], [120, 250], [100, 200])
+        table = sweep_parameters(returns, [2019, 2020], grid, lambda year: universe)
+        self.assertEqual(list(table.columns), list(COLUMNS))
+        self.assertEqual(len(table), len(grid) * 2)
+        for (max_weight, lookback_days, minimum), rows in table.groupby(
+            ["max_weight", "lookback_days", "min_training_observations"], sort=False
+        ):
+            expected = build_yearly_portfolios_from_returns(
+                returns, [2019, 2020], max_weight, lookback_days, minimum,
+                lambda year: universe, {},
+            )
+            for row in rows.itertuples():
+                metrics = expected[row.year]["portfolio"]["risk_metrics"]
+                self.assertEqual(row.status, "accepted")
+                self.assertAlmostEqual(row.sharpe_ratio, metrics["sharpe_ratio"], places=12)
+
+    def test_infeasible_combinations_are_rejected_not_raised(self) -> None:
+        returns = _returns()
+        universe = {ticker: ticker for ticker in returns.columns[:4]}
+        table = sweep_parameters(
+            returns, [2020], parameter_grid([0.2, 0.5], [200], [150]), lambda year: universe
+        )
+        self.assertEqual(list(table["status"]), ["rejected", "accepted"])
+        self.assertIn("max_weight", table.loc[0, "error"])
+        self.assertTrue(np.isnan(table.loc[0, "sharpe_ratio"]))
+
+
+    def test_year_without_eligible_tickers_rejects_every_combination(self) -> None:
+        returns = _returns()
+        universe = {ticker: ticker for ticker in returns.columns}
+        grid = parameter_grid([0.2, 0.3], [120, 250], [100])
+        table = sweep_parameters(
+            returns,
+            [2019, 2020],
+            grid,
+            lambda year: universe if year == 2019 else {"X.T": "unlisted"},
+        )
+        self.assertEqual(len(table), len(grid) * 2)
+        self.assertTrue((table.loc[table["year"] == 2019, "status"] == "accepted").all())
+        rejected = table.loc[table["year"] == 2020]
+        self.assertEqual(len(rejected), len(grid))
+        self.assertTrue((rejected["status"] == "rejected").all())
+        self.assertTrue(rejected["error"].str.contains("no universe members").all())
+
+
+if __name__ == "__main__":
+    unittest.main()
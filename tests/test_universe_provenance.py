@@ -1,5 +1,13 @@
+import importlib
+import sys
+import tempfile
 import unittest
+from pathlib import Path
+from unittest import mock
 
+import yaml
+
+from src import common
 from src.common import universe
 
 
@@ -28,5 +36,58 @@ class UniverseProvenanceTests(unittest.TestCase):
         self.assertEqual(universe._validate_provenance(snapshots, provenance), [])
 
 
+class LazyUniverseTests(unittest.TestCase):
+    def tearDown(self):
+        universe.reload_universe()
+
+    def test_import_reads_no_files(self):
+        # 読み込み済みのモジュールを外して取り込み直し、終わったら元へ戻す。
+        with mock.patch.dict(sys.modules), mock.patch.object(
+            common, "universe", universe
+        ), mock.patch.object(
+            Path, "read_text", side_effect=AssertionError("read during import")
+        ) as read_text:
+            del sys.modules["src.common.universe"]
+            fresh = importlib.import_module("src.common.universe")
+        self.assertIsNot(fresh, universe)
+        self.assertIsNone(fresh._DATASET)
+        read_text.assert_not_called()
+
+    def test_reload_defers_io_and_swaps_fixture_dataset(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            snapshots_file = Path(tmp) / "snapshots.yaml"
+            provenance_file = Path(tmp) / "provenance.yaml"
+            snapshots_file.write_text(
+                yaml.safe_dump({"2013-01-01": {"0000.T": "Example"}}),
+                encoding="utf-8",
+            )
+            provenance_file.write_text(
+                yaml.safe_dump(
+                    {
+                        "dataset_status": "verified",
+                        "snapshots": {
+                            "2013-01-01": {
+                                "as_of": "2013-01-01",
+                                "source_url": "https://example.invalid/a.xlsx",
+                                "published_at": "2012-12-28",
+                                "retrieved_at": "2026-08-02",
+                                "file_sha256": "0" * 64,
+                                "verified_by": "independent-reviewer",
+                            }
+                        },
+                    }
+                ),
+                encoding="utf-8",
+            )
+            universe.reload_universe(snapshots_file, provenance_file)
+            self.assertIsNone(universe._DATASET)
+            self.assertEqual(universe.universe_for_year(2014), {"0000.T": "Example"})
+            self.assertEqual(universe.ALL_TICKERS, ["0000.T"])
+
+        universe.reload_universe()
+        self.assertIsNone(universe._DATASET)
+        self.assertTrue(universe.provenance_errors())
+
+
 if __name__ == "__main__":
     unittest.main()
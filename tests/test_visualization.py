@@ -0,0 +1,147 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from src.data_io import price_store
+from src.data_io.price_matrix import build_price_matrix
+from src.reporting.results_file import RESULTS_FILE_NAME, write_results
+from src.reporting.yaml_reporter import write_reports
+
+HAS_MATPLOTLIB = importlib.util.find_spec("matplotlib") is not None
+if HAS_MATPLOTLIB:
+    from src.analytics import visualization
+
+
+def _frame(periods: int, offset: float = 0.0) -> pd.DataFrame:
+    index = pd.to_datetime(
+        [
+            timestamp.isoformat()
+            for timestamp in pd.date_range(
+                "2012-01-04 09:00", periods=periods, freq="B", tz="Asia/Tokyo"
+            )
+        ]
+    )
+    return pd.DataFrame(
+        {
+            "close": np.linspace(100.0, 110.0, periods) + offset,
+            "volume": np.arange(periods, dtype=float) * 1_000,
+        },
+        index=index.rename("timestamp"),
+    )
+
+
+def _payload(year: int, shift: float) -> dict:
+    weights = {"C.T": 0.05, "A.T": 0.5 - shift, "E.T": 0.0, "B.T": 0.45 + shift, "D.T": 0.0}
+    return {
+        "period": {"start": f"{year}-01-01", "end": f"{year}-12-31"},
+        "universe": [{"ticker": ticker, "name": ticker.lower()} for ticker in weights],
+        "portfolio": {
+            "weights": {
+                ticker: {"name": ticker.lower(), "weight": weight}
+                for ticker, weight in weights.items()
+            },
+            "risk_metrics": {
+                "annual_return": 0.1,
+                "volatility": 0.2,
+                "sharpe_ratio": 0.5,
+                "max_drawdown": -0.1,
+                "evaluation_observations": 245,
+            },
+            "training_window": {"start": f"{year - 1}-01-04", "end": f"{year - 1}-12-30"},
+            "evaluation_window": {"start": f"{year}-01-06", "end": f"{year}-12-30"},
+        },
+    }
+
+
+@unittest.skipUnless(HAS_MATPLOTLIB, "matplotlib is not installed")
+class LoadPortfoliosTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self._tmp.name)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _load(self, directory: Path) -> dict:
+        with mock.patch.object(visualization, "REPORT_DIR", directory):
+            return visualization._load_portfolios({"A.T": "Alpha"})
+
+    def test_results_file_matches_yearly_yaml_fallback(self) -> None:
+        results = {2019: _payload(2019, 0.1), 2020: _payload(2020, -0.05)}
+        yearly = self.directory / "yearly"
+        write_reports(results, yearly)
+        (yearly / RESULTS_FILE_NAME).unlink()
+        consolidated = self.directory / "consolidated"
+        consolidated.mkdir()
+        write_results(results, consolidated)
+
+        from_yaml = self._load(yearly)
+        from_results = self._load(consolidated)
+        self.assertEqual(sorted(from_results), [2019, 2020])
+        self.assertEqual(from_results, from_yaml)
+        holdings = from_results[2020]["holdings"]
+        self.assertEqual([item["ticker"] for item in holdings], ["A.T", "B.T", "C.T", "E.T", "D.T"])
+        self.assertEqual(holdings[0]["name"], "Alpha")
+        self.assertEqual(from_results[2020]["start"], pd.Timestamp("2020-01-06"))
+
+
+@unittest.skipUnless(HAS_MATPLOTLIB, "matplotlib is not installed")
+class LoadClosesTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        self.raw = root / "raw"
+        self.matrix_dir = root / "matrix"
+        self.frames = {"A": _frame(6), "B": _frame(5, 50.0).iloc[1:], "C": _frame(6, 20.0)}
+        price_store.save_frames(self.frames, self.raw)
+        build_price_matrix(self.frames, self.matrix_dir)
+        self._patch = mock.patch.multiple(
+            visualization, DATA_RAW=self.raw, PRICE_MATRIX_DIR=self.matrix_dir
+        )
+        self._patch.start()
+
+    def tearDown(self) -> None:
+        self._patch.stop()
+        self._tmp.cleanup()
+
+    def test_closes_come_from_the_price_matrix(self) -> None:
+        expected = pd.DataFrame(
+            {ticker: self.frames[ticker]["close"] for ticker in ("A", "B")}
+        ).sort_index()
+        with mock.patch.object(visualization, "load_frames") as load_frames:
+            closes = visualization._load_closes(["B", "A", "B"])
+        load_frames.assert_not_called()
+        self.assertEqual(list(closes.columns), ["A", "B"])
+        np.testing.assert_array_equal(closes.to_numpy(), expected.to_numpy())
+        np.testing.assert_array_equal(
+            closes.index.asi8, pd.DatetimeIndex(expected.index).asi8
+        )
+        window = visualization._load_closes(["C"], expected.index[1], expected.index[3])
+        self.assertEqual(len(window), 3)
+        np.testing.assert_array_equal(
+            window["C"].to_numpy(), self.frames["C"]["close"].iloc[1:4].to_numpy()
+        )
+
+    def test_stale_matrix_falls_back_to_the_raw_store(self) -> None:
+        updated = _frame(7, 5.0)
+        price_store.save_frames({"A": updated}, self.raw)
+        built = (self.matrix_dir / "meta.yaml").stat().st_mtime_ns
+        for path in self.raw.glob("A.*"):
+            os.utime(path, ns=(built + 1_000_000_000, built + 1_000_000_000))
+        with mock.patch.object(
+            visualization, "load_frames", wraps=visualization.load_frames
+        ) as load_frames:
+            closes = visualization._load_closes(["A", "B"])
+        load_frames.assert_called_once()
+        self.assertEqual(len(closes), 7)
+        np.testing.assert_array_equal(closes["A"].to_numpy(), updated["close"].to_numpy())
+
+
+if __name__ == "__main__":
+    unittest.main()
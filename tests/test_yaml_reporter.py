@@ -0,0 +1,146 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import yaml
+
+from src.reporting.results_file import RESULTS_FILE_NAME, read_results, top_holdings
+from src.reporting.yaml_reporter import write_reports
+
+
+def _payload(year: int, shift: float) -> dict:
+    names = {"A.T": "Alpha", "B.T": "Beta", "C.T": "Gamma", "D.T": "Delta", "E.T": "Epsilon"}
+    weights = {"C.T": 0.05, "A.T": 0.5 - shift, "E.T": 0.0, "B.T": 0.45 + shift, "D.T": 0.0}
+    return {
+        "period": {"start": f"{year}-01-01", "end": f"{year}-12-31"},
+        "universe": [{"ticker": ticker, "name": names[ticker]} for ticker in weights],
+        "portfolio": {
+            "weights": {
+                ticker: {"name": names[ticker], "weight": weight}
+                for ticker, weight in weights.items()
+            },
+            "risk_metrics": {
+                "annual_return": 0.1234565,
+                "volatility": 0.2,
+                "sharpe_ratio": 1.0,
+                "max_drawdown": -0.1,
+                "evaluation_observations": 245,
+            },
+            "training_window": {"start": f"{year - 1}-01-04", "end": f"{year - 1}-12-30"},
+            "evaluation_window": {"start": f"{year}-01-06", "end": f"{year}-12-30"},
+        },
+    }
+
+
+class YamlReporterTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self._tmp.name)
+        self.results = {2019: _payload(2019, 0.1), 2020: _payload(2020, 0.0)}
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_year_report_layout(self) -> None:
+        write_reports(self.results, self.directory)
+        text = (self.directory / "2020.yaml").read_text(encoding="utf-8")
+        self.assertTrue(
+            text.startswith(
+                "year: 2020\nperiod:\n  start: 2020-01-01\n  end: 2020-12-31\n"
+                "conditions:\n  training_window:\n    start: 2019-01-04\n"
+            )
+        )
+        self.assertIn("    annual_return: 0.123456\n    volatility: 0.200000\n", text)
+        # 同じ重みの銘柄は入力順のまま並ぶ。
+        self.assertIn(
+            "      -\n        rank: 4\n        ticker: E.T\n        name: Epsilon\n"
+            "        weight: 0.000000\n      -\n        rank: 5\n        ticker: D.T\n",
+            text,
+        )
+        self.assertIn(
+            "        label: 1%-5%\n        count: 0\n        weight_share: 0\n        sample:\n",
+            text,
+        )
+        self.assertIn(
+            "    by_ticker:\n      A.T:\n        name: Alpha\n        weight: 0.500000\n"
+            "      B.T:\n",
+            text,
+        )
+        self.assertTrue(
+            text.endswith(
+                "      ticker: D.T\n      name: Delta\n    -\n"
+                "      ticker: E.T\n      name: Epsilon\n"
+            )
+        )
+        summary = (self.directory / "summary.yaml").read_text(encoding="utf-8")
+        self.assertTrue(summary.startswith("years:\n  2019:\n    annual_return: 0.123456\n"))
+        report = (self.directory / "summary_report.md").read_text(encoding="utf-8")
+        self.assertTrue(report.startswith("# ポートフォリオ年次パフォーマンス概要（2019-2020）\n"))
+        self.assertIn("## 2020年ポートフォリオ上位10銘柄\n\n- 1. Alpha（A.T）: 50.0%\n", report)
+
+    def test_parallel_writes_match_serial(self) -> None:
+        serial = self.directory / "serial"
+        parallel = self.directory / "parallel"
+        write_reports(self.results, serial)
+        write_reports(self.results, parallel, executor="processes", jobs=2)
+        for path in sorted(serial.iterdir()):
+            self.assertEqual(path.read_bytes(), (parallel / path.name).read_bytes(), path.name)
+
+
+class ResultsFileTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self._tmp.name)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_reports_include_every_year_in_one_file(self) -> None:
+        results = {2019: _payload(2019, 0.1), 2020: _payload(2020, 0.0)}
+        results[2020]["portfolio"]["rebalances"] = [
+            {"date": "2020-01-06", "eligible_assets": 3, "weights": {"A.T": 0.6, "B.T": 0.4}}
+        ]
+        write_reports(results, self.directory)
+        records = read_results(self.directory / RESULTS_FILE_NAME)
+        self.assertEqual(list(records), [2019, 2020])
+        record = records[2019]
+        self.assertEqual(record["evaluation_window"], {"start": "2019-01-06", "end": "2019-12-30"})
+        self.assertEqual(record["risk_metrics"]["annual_return"], 0.1234565)
+        self.assertEqual(record["risk_metrics"]["evaluation_observations"], 245)
+        self.assertEqual(
+            dict(zip(record["tickers"], record["weights"])),
+            {
+                ticker: data["weight"]
+                for ticker, data in results[2019]["portfolio"]["weights"].items()
+            },
+        )
+        self.assertNotIn("rebalances", record)
+        self.assertEqual(
+            records[2020]["rebalances"],
+            [
+                {
+                    "date": "2020-01-06",
+                    "eligible_assets": 3,
+                    "tickers": ["A.T", "B.T"],
+                    "weights": [0.6, 0.4],
+                }
+            ],
+        )
+        # YAMLの上位銘柄と同じ並び（同じ重みは入力順）になる。
+        for year, record in records.items():
+            report = yaml.safe_load((self.directory / f"{year}.yaml").read_text(encoding="utf-8"))
+            expected = report["portfolio"]["allocations"]["top_holdings"]
+            self.assertEqual(
+                [(item["ticker"], item["rank"]) for item in top_holdings(record)],
+                [(item["ticker"], item["rank"]) for item in expected],
+            )
+
+    def test_unknown_version_is_rejected(self) -> None:
+        path = self.directory / RESULTS_FILE_NAME
+        path.write_text('{"format":"portfolio_results","version":99}\n', encoding="utf-8")
+        with self.assertRaises(ValueError):
+            read_results(path)
+
+
+if __name__ == "__main__":
+    unittest.main()